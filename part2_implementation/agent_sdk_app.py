@@ -1,11 +1,16 @@
 import asyncio
+import contextvars
 import json
 import os
-from typing import Any, Dict, List, Optional, Tuple
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from part2_implementation.gemini_provider import run_with_tools as gemini_run_with_tools
-from part2_implementation.servers.osm_server import OSMServer
-from part2_implementation.servers.ors_server import ORSServer
+from part2_implementation.prompt_layout import SYSTEM_PROMPT
+from part2_implementation.servers.records import GeocodeHit, Isochrone, to_json
+from part2_implementation.settings import Settings, get_settings
+
+# Providers, servers and HTTP/SDK libraries are imported on first use so that
+# importing this module (and the offline heuristic path) stays fast.
 
 
 # Tool schemas (Agents SDK-style via function calling)
@@ -55,6 +60,22 @@ TOOLS: List[Dict[str, Any]] = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "osm_search_poi_batch",
+            "description": "Search several POI queries across several cities at once (deduplicated, ranked).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "queries": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+                    "cities": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+                    "max_count": {"type": "integer", "minimum": 1, "maximum": 20, "default": 5},
+                },
+                "required": ["queries", "cities"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -87,7 +108,7 @@ TOOLS: List[Dict[str, Any]] = [
         "type": "function",
         "function": {
             "name": "ors_distance",
-            "description": "Compute distance only using OpenRouteService.",
+            "description": "Compute distance only using OpenRouteService (may be a calibrated estimate unless exact is set).",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -105,21 +126,75 @@ TOOLS: List[Dict[str, Any]] = [
                         "maxItems": 2,
                         "description": "[lon, lat]",
                     },
+                    "exact": {
+                        "type": "boolean",
+                        "default": False,
+                        "description": "Route for an exact road distance instead of an estimate",
+                    },
                 },
                 "required": ["origin", "destination"],
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "ors_optimize",
+            "description": "Plan the fastest visiting order for many stops (first stop is the start) and route through them.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "stops": {
+                        "type": "array",
+                        "items": {"type": "array", "items": {"type": "number"}, "minItems": 2, "maxItems": 2},
+                        "minItems": 2,
+                        "maxItems": 50,
+                        "description": "List of [lon, lat]; the first entry is the starting point",
+                    },
+                    "profile": {"type": "string", "default": "driving-car"},
+                    "roundtrip": {"type": "boolean", "default": False, "description": "Return to the start"},
+                },
+                "required": ["stops"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "ors_reachable_pois",
+            "description": "Find POIs in a city reachable from an origin within a travel-time budget (isochrone).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "origin": {
+                        "type": "array",
+                        "items": {"type": "number"},
+                        "minItems": 2,
+                        "maxItems": 2,
+                        "description": "[lon, lat]",
+                    },
+                    "query": {"type": "string", "description": "POI type, e.g. hospitals"},
+                    "city": {"type": "string"},
+                    "minutes": {"type": "number", "minimum": 1, "maximum": 60, "default": 15},
+                    "profile": {"type": "string", "default": "driving-car"},
+                },
+                "required": ["origin", "query", "city"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
             "name": "ors_nearby",
-            "description": "Find nearby POIs around a coordinate using OpenRouteService.",
+            "description": "Find the closest POIs around a coordinate (nearest first) using OpenRouteService.",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "lat": {"type": "number"},
                     "lon": {"type": "number"},
+                    "radius_m": {"type": "number", "minimum": 1, "maximum": 5000, "default": 1000},
+                    "k": {"type": "integer", "minimum": 1, "maximum": 50, "default": 10},
+                    "category": {"type": "string", "description": "Optional POI category, e.g. pharmacy"},
                 },
                 "required": ["lat", "lon"],
             },
@@ -135,6 +210,38 @@ TOOLS: List[Dict[str, Any]] = [
                 "properties": {
                     "origin_place": {"type": "string"},
                     "destination_place": {"type": "string"},
+                    "exact": {
+                        "type": "boolean",
+                        "default": False,
+                        "description": "Route for an exact road distance instead of an estimate",
+                    },
+                },
+                "required": ["origin_place", "destination_place"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "ors_compare_routes",
+            "description": "Compare driving, walking and cycling (or the given profiles) between two place names in one table.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "origin_place": {"type": "string"},
+                    "destination_place": {"type": "string"},
+                    "profiles": {
+                        "type": "array",
+                        "items": {
+                            "type": "string",
+                            "enum": ["driving-car", "driving-hgv", "foot-walking", "foot-hiking",
+                                     "cycling-regular", "cycling-road", "cycling-mountain",
+                                     "cycling-electric", "wheelchair"],
+                        },
+                        "minItems": 1,
+                        "maxItems": 6,
+                        "description": "ORS profiles; default driving-car, foot-walking, cycling-regular",
+                    },
                 },
                 "required": ["origin_place", "destination_place"],
             },
@@ -158,11 +265,99 @@ TOOLS: List[Dict[str, Any]] = [
 ]
 
 
+# Per-run event queue used by run_stream(); a ContextVar keeps concurrent runs apart
+_EVENT_SINK: contextvars.ContextVar[Optional[asyncio.Queue]] = contextvars.ContextVar("_EVENT_SINK", default=None)
+
+_VALIDATOR = None
+
+
+def tool_validator():
+    """Precompiled argument validator for ``TOOLS`` (built on first use)."""
+    global _VALIDATOR
+    if _VALIDATOR is None:
+        from part2_implementation.tool_schema import ToolValidator
+
+        _VALIDATOR = ToolValidator(TOOLS)
+    return _VALIDATOR
+
+
 class AgentsSDKMapAssistant:
-    def __init__(self):
-        self.osm = OSMServer()
-        self.ors = ORSServer()
+    def __init__(self, place_cache_path: Optional[str] = None, settings: Optional[Settings] = None):
+        # Injected settings are pinned (and passed on to servers/providers);
+        # otherwise everything follows the global, reloadable settings.
+        self._settings = settings
+        self._osm = None
+        self._ors = None
+        self._router = None
+        self._ollama = None
         self.place_cache: Dict[str, Tuple[float, float]] = {}
+        # Optional JSON file the place cache is loaded from and flushed to
+        self.place_cache_path = place_cache_path or self.settings.place_cache_path
+        if self.place_cache_path and os.path.exists(self.place_cache_path):
+            try:
+                with open(self.place_cache_path, encoding="utf-8") as f:
+                    self.place_cache.update({k: tuple(v) for k, v in json.load(f).items()})
+            except (OSError, ValueError, TypeError):
+                pass
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings or get_settings()
+
+    @property
+    def osm(self):
+        if self._osm is None:
+            from part2_implementation.servers.osm_server import OSMServer
+
+            self._osm = OSMServer(settings=self._settings)
+        return self._osm
+
+    @osm.setter
+    def osm(self, server) -> None:
+        self._osm = server
+
+    @property
+    def ors(self):
+        if self._ors is None:
+            from part2_implementation.servers.ors_server import ORSServer
+
+            self._ors = ORSServer(settings=self._settings)
+        return self._ors
+
+    @ors.setter
+    def ors(self, server) -> None:
+        self._ors = server
+
+    @property
+    def router(self):
+        """Per-provider latency/error tracker used by the ``auto``/``race`` provider modes."""
+        if self._router is None:
+            from part2_implementation.provider_router import ProviderRouter
+
+            self._router = ProviderRouter()
+        return self._router
+
+    @property
+    def ollama(self):
+        """Warm, batching Ollama client (created on first use)."""
+        if self._ollama is None:
+            from part2_implementation.ollama_client import OllamaClient
+
+            self._ollama = OllamaClient(tool_validator(), settings=self._settings)
+        return self._ollama
+
+    def flush_caches(self) -> None:
+        """Persist the place cache to ``place_cache_path`` (if configured)."""
+        if not self.place_cache_path:
+            return
+        tmp = self.place_cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.place_cache, f, ensure_ascii=False)
+        os.replace(tmp, self.place_cache_path)
+
+    async def autocomplete(self, prefix: str, k: int = 5) -> Any:
+        """Typeahead suggestions for ``prefix`` as JSON (no LLM or Nominatim call)."""
+        return to_json(await self.osm.autocomplete(prefix, k))
 
     def _heuristic_route(self, prompt: str) -> Optional[Tuple[str, Dict[str, Any]]]:
         p = prompt.lower()
@@ -181,6 +376,15 @@ class AgentsSDKMapAssistant:
                 "ors_distance",
                 {"origin": [35.5018, 33.8938], "destination": [35.8497, 34.4367]},
             )
+        if " vs " in p or "compare" in p or ("walk" in p and ("driv" in p or "cycl" in p or "bike" in p)):
+            import re
+            m = re.search(r"from\s+(.+?)\s+to\s+(.+?)(?:\s*[,;?.]|\s+(?:by|on|drive|driving|walk|walking|vs)\b|$)",
+                          prompt, flags=re.IGNORECASE)
+            if m:
+                return (
+                    "ors_compare_routes",
+                    {"origin_place": m.group(1).strip(), "destination_place": m.group(2).strip()},
+                )
         if "route" in p:
             import re
             m = re.search(r"from\s+(.+?)\s+to\s+(.+)$", prompt, flags=re.IGNORECASE)
@@ -200,73 +404,114 @@ class AgentsSDKMapAssistant:
         # default to geocoding
         return ("osm_geocode", {"place": prompt})
 
+    def _place_cache_key(self, place: str) -> str:
+        # Same normalization as the geocode cache, as a string for the JSON file
+        return "|".join(self.osm.place_key(place))
+
+    async def _place_coords(self, place: str) -> Tuple[float, float]:
+        """Resolve a place name to ``(lon, lat)``, using ``place_cache`` when possible."""
+        key = self._place_cache_key(place)
+        if key in self.place_cache:
+            return self.place_cache[key]
+        g = await self.osm.geocode(place)
+        if not isinstance(g, GeocodeHit):
+            raise ValueError(g.get("error", "geocoding failed"))
+        self.place_cache[key] = g.lonlat
+        return g.lonlat
+
     async def _dispatch_tool(self, name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one tool and return its result as provider-ready JSON.
+
+        Arguments are validated against the tool's schema first; invalid calls
+        return an error without contacting any upstream.
+        """
+        sink = _EVENT_SINK.get()
+        if sink is not None:
+            sink.put_nowait({"event": "tool_call", "tool": name, "arguments": args})
+        err = tool_validator().validate(name, args)
+        if err:
+            result = {"error": f"Invalid arguments for {name}: {err}"}
+        else:
+            result = to_json(await self._call_tool(name, args))
+        if sink is not None:
+            sink.put_nowait({"event": "tool_result", "tool": name, "content": result})
+        return result
+
+    async def _call_tool(self, name: str, args: Dict[str, Any]) -> Any:
         if name == "osm_geocode":
             res = await self.osm.geocode(args["place"])
-            try:
-                lat = float(res.get("lat"))
-                lon = float(res.get("lon"))
-                key = str(args["place"]).strip().lower()
-                self.place_cache[key] = (lon, lat)  # store as [lon, lat]
-            except Exception:
-                pass
+            if isinstance(res, GeocodeHit):
+                self.place_cache[self._place_cache_key(str(args["place"]))] = res.lonlat  # store as [lon, lat]
             return res
         if name == "osm_reverse":
             return await self.osm.reverse(args["lat"], args["lon"])
         if name == "osm_search_poi":
             return await self.osm.search_poi(args["query"], args["city"], args.get("max_count", 5))
+        if name == "osm_search_poi_batch":
+            pairs = [(q, c) for c in args["cities"] for q in args["queries"]]
+            return [
+                {"query": q, "city": c, "results": res}
+                async for q, c, res in self.osm.search_poi_batch(pairs, args.get("max_count", 5))
+            ]
         if name == "ors_route":
             return await self.ors.route(args["origin"], args["destination"], args.get("profile", "driving-car"))
         if name == "ors_distance":
-            return await self.ors.distance(args["origin"], args["destination"])
+            return await self.ors.distance(args["origin"], args["destination"], bool(args.get("exact", False)))
+        if name == "ors_optimize":
+            return await self.ors.optimize(
+                args["stops"], args.get("profile", "driving-car"), bool(args.get("roundtrip", False))
+            )
+        if name == "ors_reachable_pois":
+            lon, lat = args["origin"]
+            iso, pois = await asyncio.gather(
+                self.ors.isochrone(lon, lat, args.get("minutes", 15), args.get("profile", "driving-car")),
+                self.osm.search_poi(args["query"], args["city"], 20),
+            )
+            if not isinstance(iso, Isochrone):
+                return iso
+            if isinstance(pois, dict):
+                return pois
+            return {"isochrone": iso, "reachable": self.ors.within(iso, pois), "candidates": len(pois)}
         if name == "ors_distance_places":
-            async def _coords(place: str) -> Tuple[float, float]:
-                key = place.strip().lower()
-                if key in self.place_cache:
-                    return self.place_cache[key]
-                g = await self.osm.geocode(place)
-                if "error" in g:
-                    raise ValueError(g["error"])
-                lon = float(g["lon"])  # OSM returns strings
-                lat = float(g["lat"])  # keep as floats
-                self.place_cache[key] = (lon, lat)
-                return (lon, lat)
-
             try:
-                o = await _coords(args["origin_place"])
-                d = await _coords(args["destination_place"])
+                o = await self._place_coords(args["origin_place"])
+                d = await self._place_coords(args["destination_place"])
             except Exception as e:
                 return {"error": f"Geocoding failed: {e}"}
-            out = await self.ors.distance(list(o), list(d))
+            out = to_json(await self.ors.distance(list(o), list(d), bool(args.get("exact", False))))
             out.update({"origin": list(o), "destination": list(d)})
             return out
+        if name == "ors_compare_routes":
+            # Geocode both ends once, concurrently; every profile reuses them
+            o, d = await asyncio.gather(
+                self._place_coords(args["origin_place"]),
+                self._place_coords(args["destination_place"]),
+                return_exceptions=True,
+            )
+            for res in (o, d):
+                if isinstance(res, Exception):
+                    return {"error": f"Geocoding failed: {res}"}
+            return await self.ors.compare_routes(list(o), list(d), args.get("profiles"))
         if name == "ors_route_places":
-            async def _coords(place: str) -> Tuple[float, float]:
-                key = place.strip().lower()
-                if key in self.place_cache:
-                    return self.place_cache[key]
-                g = await self.osm.geocode(place)
-                if "error" in g:
-                    raise ValueError(g["error"])
-                lon = float(g["lon"])  # OSM returns strings
-                lat = float(g["lat"])  # keep as floats
-                self.place_cache[key] = (lon, lat)
-                return (lon, lat)
-
             try:
-                o = await _coords(args["origin_place"])
-                d = await _coords(args["destination_place"])
+                o = await self._place_coords(args["origin_place"])
+                d = await self._place_coords(args["destination_place"])
             except Exception as e:
                 return {"error": f"Geocoding failed: {e}"}
             return await self.ors.route(list(o), list(d), "driving-car")
         if name == "ors_nearby":
-            return await self.ors.nearby(args["lat"], args["lon"])
+            return await self.ors.nearby(
+                args["lat"], args["lon"], args.get("radius_m", 1000), args.get("k", 10), args.get("category")
+            )
         return {"error": f"Unknown tool: {name}"}
 
     async def run(self, prompt: str) -> Dict[str, Any]:
-        # Provider routing: openai (default), ollama, gemini, or offline
-        provider = os.getenv("MAP_AGENT_PROVIDER", "openai").lower()
-        if os.getenv("MAP_AGENT_DISABLE_OPENAI") or provider == "ollama":
+        # Provider routing: openai (default), ollama, gemini, auto/race, or offline
+        cfg = self.settings
+        provider = cfg.provider
+        if provider in ("auto", "race"):
+            return await self._run_routed(prompt, race=provider == "race")
+        if cfg.disable_openai or provider == "ollama":
             # Try Ollama tool selection if provider set; otherwise fallback heuristic
             selected: Optional[Tuple[str, Dict[str, Any]]] = None
             if provider == "ollama":
@@ -289,153 +534,294 @@ class AgentsSDKMapAssistant:
 
         if provider == "gemini":
             try:
-                return await gemini_run_with_tools(prompt, TOOLS, self._dispatch_tool)
+                from part2_implementation.gemini_provider import run_with_tools as gemini_run_with_tools
+
+                return await gemini_run_with_tools(prompt, TOOLS, self._dispatch_tool, settings=cfg)
             except Exception as e:
                 tool, args = self._heuristic_route(prompt)
                 result = await self._dispatch_tool(tool, args)
                 return {"answer": f"[gemini fallback] {tool}: {result} (no model: {e})",
                         "tool_results": [{"tool": tool, "content": result}]}
 
-        # Default: OpenAI provider (lazy import to avoid requiring OPENAI_API_KEY unless used)
-        def _get_openai_client():
-            from part2_implementation.openai_client import client as _client
-            return _client
-
+        # Default: OpenAI provider (client imported lazily, so OPENAI_API_KEY is only needed when used)
         messages: List[Dict[str, Any]] = [
-            {"role": "system", "content": "You are a helpful map assistant. Use tools when helpful."},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ]
 
-        # First call: let the model decide whether to call tools
-        try:
-            client = _get_openai_client()
-            resp = client.chat.completions.create(
-                model=os.getenv("MAP_AGENT_MODEL", "gpt-4o"),
-                messages=messages,
-                tools=TOOLS,
-                tool_choice="auto",
-            )
-        except Exception as e:
-            # Fallback: run a single heuristic tool and return raw results
-            tool, args = self._heuristic_route(prompt)
-            result = await self._dispatch_tool(tool, args)
-            return {
-                "answer": f"[fallback] {tool}: {result} (no model: {e})",
-                "tool_results": [{"tool": tool, "content": result}],
-            }
+        from part2_implementation.run_budget import RunBudget
 
-        msg = resp.choices[0].message
+        budget = RunBudget.from_settings(cfg)
         tool_messages: List[Dict[str, Any]] = []
-
-        if getattr(msg, "tool_calls", None):
-            # Execute each tool call and append tool results
-            for call in msg.tool_calls:
-                tool_name = call.function.name
-                try:
-                    args = json.loads(call.function.arguments or "{}")
-                except Exception:
-                    args = {}
-                result = await self._dispatch_tool(tool_name, args)
-                tool_messages.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": call.id,
-                        "content": json.dumps(result),
-                    }
-                )
-
-            # Second call: provide tool results and get final answer
-            messages.extend([
-                {"role": msg.role, "tool_calls": [tc.model_dump() for tc in msg.tool_calls], "content": msg.content},
-                *tool_messages,
-            ])
-
+        rnd = 0
+        while True:
+            # Tools stay available until the budget says this call must answer
+            final_round = budget.final_round(rnd)
+            if final_round:
+                choice = "none"
+            else:
+                choice = "required" if (cfg.force_tool_call and rnd == 0) else "auto"
+            t0 = time.monotonic()
             try:
-                client = _get_openai_client()
-                final = client.chat.completions.create(
-                    model=os.getenv("MAP_AGENT_MODEL", "gpt-4o"),
-                    messages=messages,
-                )
-                answer = final.choices[0].message.content
-                return {"answer": answer, "tool_results": tool_messages}
+                resp = await asyncio.wait_for(self._openai_chat(messages, choice), max(1.0, budget.remaining_s()))
             except Exception as e:
+                if rnd == 0:
+                    # Fallback: run a single heuristic tool and return raw results
+                    tool, args = self._heuristic_route(prompt)
+                    result = await self._dispatch_tool(tool, args)
+                    return {
+                        "answer": f"[fallback] {tool}: {result} (no model: {e})",
+                        "tool_results": [{"tool": tool, "content": result}],
+                    }
                 # Return tool outputs without model summary
                 return {
                     "answer": f"Results from tools: {[tm['content'] for tm in tool_messages]} (no model: {e})",
                     "tool_results": tool_messages,
+                    "budget": budget.to_json(),
                 }
+            llm_s = time.monotonic() - t0
+            tokens = getattr(getattr(resp, "usage", None), "total_tokens", 0) or 0
+
+            msg = resp.choices[0].message
+            calls = getattr(msg, "tool_calls", None) or []
+            if final_round or not calls:
+                budget.record(llm_s, tokens=tokens)
+                return {"answer": msg.content, "tool_results": tool_messages, "budget": budget.to_json()}
+
+            # Execute this round's tool calls concurrently, then feed results back
+            parsed = []
+            for call in calls:
+                try:
+                    args = json.loads(call.function.arguments or "{}")
+                except Exception:
+                    args = {}
+                parsed.append((call, args))
+            t1 = time.monotonic()
+            results = await asyncio.gather(*(self._dispatch_tool(c.function.name, a) for c, a in parsed))
+            budget.record(llm_s, time.monotonic() - t1, [c.function.name for c in calls], tokens)
+            round_messages = [
+                {"role": "tool", "tool_call_id": call.id, "content": json.dumps(result)}
+                for (call, _), result in zip(parsed, results)
+            ]
+            messages.extend([
+                {"role": msg.role, "tool_calls": [tc.model_dump() for tc in calls], "content": msg.content},
+                *round_messages,
+            ])
+            tool_messages.extend(round_messages)
+            rnd += 1
+
+    # -- latency-routed providers (MAP_AGENT_PROVIDER=auto|race) -----------
+
+    def _route_candidates(self) -> List[str]:
+        """Configured providers (``MAP_AGENT_ROUTE_PROVIDERS``) that have credentials."""
+        cfg = self.settings
+        out = []
+        for name in cfg.route_providers.split(","):
+            name = name.strip().lower()
+            if name == "openai" and (cfg.disable_openai or not cfg.openai_api_key):
+                continue
+            if name == "gemini" and not cfg.gemini_api_key:
+                continue
+            if name in ("openai", "gemini", "ollama") and name not in out:
+                out.append(name)
+        return out
+
+    async def _select(self, provider: str, prompt: str, tool_results: Optional[List[Dict[str, Any]]] = None
+                      ) -> Optional[Tuple[List[Tuple[str, Dict[str, Any]]], str]]:
+        """Ask ``provider`` which tools to call: ``([(name, args), ...], text)``, or None.
+
+        With ``tool_results`` (a follow-up round) the model sees the results so
+        far and may answer instead of calling more tools. Ollama always names a
+        tool, so it never gets a follow-up round.
+        """
+        cfg = self.settings
+        first_round = not tool_results
+        if not first_round:
+            prompt = f"User asked: {prompt}\nTool results JSON: {json.dumps(tool_results)}"
+        if provider == "ollama":
+            if not first_round:
+                return [], ""
+            choice = await self._ollama_choose_tool(prompt)
+            if not choice or "tool" not in choice:
+                return None
+            return [(choice["tool"], choice.get("arguments", {}))], ""
+        if provider == "gemini":
+            from part2_implementation.gemini_provider import select_tools
 
-        # No tool calls — just return the model’s reply
-        return {"answer": msg.content, "tool_results": []}
+            return await select_tools(prompt, TOOLS, settings=cfg, first_round=first_round)
+        resp = await self._openai_chat(
+            [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+            "required" if (cfg.force_tool_call and first_round) else "auto",
+        )
+        msg = resp.choices[0].message
+        calls = []
+        for call in getattr(msg, "tool_calls", None) or []:
+            try:
+                args = json.loads(call.function.arguments or "{}")
+            except ValueError:
+                args = {}
+            calls.append((call.function.name, args))
+        return calls, msg.content or ""
+
+    async def _summarize(self, provider: str, prompt: str, tool_results: List[Dict[str, Any]]) -> Optional[str]:
+        """Final answer from ``provider`` given executed tool results."""
+        cfg = self.settings
+        if provider == "ollama":
+            if len(tool_results) == 1:
+                return await self._ollama_summarize(prompt, tool_results[0]["tool"], tool_results[0]["content"])
+            return await self._ollama_summarize(prompt, "multiple", tool_results)
+        if provider == "gemini":
+            from part2_implementation.gemini_provider import summarize
+
+            return await summarize(prompt, tool_results, TOOLS, settings=cfg)
+        resp = await self._openai_chat(
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": f"User asked: {prompt}\nTool results JSON: {json.dumps(tool_results)}"},
+            ],
+            "none",
+        )
+        return resp.choices[0].message.content
 
-    async def _ollama_choose_tool(self, prompt: str) -> Optional[Dict[str, Any]]:
-        """Ask a local Ollama model to choose a tool and JSON args.
+    async def _openai_chat(self, messages: List[Dict[str, Any]], tool_choice: str):
+        """Chat completion with the byte-stable tools/system prefix; records cached prompt tokens.
 
-        Expects Ollama running at http://localhost:11434. Configure model via OLLAMA_MODEL and context via OLLAMA_NUM_CTX.
+        Tools are always sent (``tool_choice="none"`` for final answers) so
+        every call shares the same cacheable prefix. Identical requests are
+        served from the LLM response cache when it is enabled.
         """
-        import requests
+        from part2_implementation.llm_cache import cache_key, get_llm_cache
+        from part2_implementation.openai_client import get_client
+        from part2_implementation.prompt_layout import USAGE, canonical_tools
+
+        cfg = self.settings
+        tools = canonical_tools(TOOLS)
+        cache = get_llm_cache()
+        key = None
+        if cache is not None:
+            key = cache_key("openai", model=cfg.openai_model, messages=messages, tools=tools, tool_choice=tool_choice)
+            hit = cache.get(key)
+            if hit is not None:
+                return hit
+        resp = await asyncio.to_thread(
+            get_client(cfg).chat.completions.create,
+            model=cfg.openai_model,
+            messages=messages,
+            tools=tools,
+            tool_choice=tool_choice,
+        )
+        USAGE.record_openai(resp)
+        if cache is not None:
+            cache.set(key, resp)
+        return resp
 
-        model = os.getenv("OLLAMA_MODEL", "llama3.1:8b-instruct")
-        num_ctx = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+    async def _run_routed(self, prompt: str, race: bool = False) -> Dict[str, Any]:
+        """Pick the fastest healthy provider (or race the best two) for tool selection.
 
-        tool_list = [t["function"]["name"] for t in TOOLS]
-        sys = (
-            "You are a tool selector. Given a user prompt, choose the single best tool "
-            "from the list and return strictly JSON in the format: {\"tool\": \"<name>\", \"arguments\": { ... }}. "
-            f"Tools: {tool_list}. Do not include any other text."
-        )
-        user = f"Prompt: {prompt}"
+        The winner then runs the same round loop and budget as a fixed
+        provider: follow-up selections and the final answer go to it alone.
+        """
+        from part2_implementation.run_budget import RunBudget
+
+        router = self.router
+        candidates = router.ranked(self._route_candidates())
+        budget = RunBudget.from_settings(self.settings)
+        tool_results: List[Dict[str, Any]] = []
+
+        async def select(name: str):
+            return await self._select(name, prompt, tool_results)
+
+        t0 = time.monotonic()
+        if race and len(candidates) >= 2:
+            provider, selection = await router.race(candidates[:2], select)
+            if selection is None:
+                # Both raced providers failed; try any remaining ones in order
+                provider, selection = await router.first(candidates[2:], select)
+        else:
+            provider, selection = await router.first(candidates, select)
+
+        if selection is None:
+            tool, args = self._heuristic_route(prompt)
+            result = await self._dispatch_tool(tool, args)
+            return {"answer": f"[offline] {tool}: {result}", "tool_results": [{"tool": tool, "content": result}],
+                    "provider": None}
+
+        rnd = 0
+        while True:
+            llm_s = time.monotonic() - t0
+            calls, text = selection
+            if not calls:
+                if not text and rnd:
+                    # No more tools and no answer (always the case for Ollama): summarize below
+                    break
+                budget.record(llm_s)
+                return {"answer": text, "tool_results": tool_results, "provider": provider,
+                        "budget": budget.to_json()}
+            t1 = time.monotonic()
+            results = await asyncio.gather(*(self._dispatch_tool(name, args) for name, args in calls))
+            budget.record(llm_s, time.monotonic() - t1, [name for name, _ in calls])
+            tool_results.extend({"tool": name, "content": res} for (name, _), res in zip(calls, results))
+            rnd += 1
+            if budget.final_round(rnd):
+                break
+            t0 = time.monotonic()
+            try:
+                selection = await asyncio.wait_for(router.call(provider, select), max(1.0, budget.remaining_s()))
+            except Exception:
+                # Tools already ran; answer from their results below
+                break
+            if selection is None:
+                break
+
+        async def summarize(name: str):
+            return await self._summarize(name, prompt, tool_results)
 
+        t0 = time.monotonic()
         try:
-            r = requests.post(
-                "http://localhost:11434/api/chat",
-                json={
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": sys},
-                        {"role": "user", "content": user},
-                    ],
-                    "stream": False,
-                    "options": {"num_ctx": num_ctx},
-                },
-                timeout=30,
-            )
-            data = r.json()
-            content = data.get("message", {}).get("content", "{}")
-            return json.loads(content)
-        except Exception:
-            return None
+            answer = await asyncio.wait_for(router.call(provider, summarize), max(1.0, budget.remaining_s()))
+        except Exception as e:
+            answer = f"Results from tools: {[tr['content'] for tr in tool_results]} (no model: {e})"
+        budget.record(time.monotonic() - t0)
+        return {"answer": answer, "tool_results": tool_results, "provider": provider, "budget": budget.to_json()}
 
-    async def _ollama_summarize(self, prompt: str, tool: str, result: Dict[str, Any]) -> str:
-        """Ask a local Ollama model to summarize tool results into a friendly answer."""
-        import requests
+    async def run_stream(self, prompt: str) -> AsyncIterator[Dict[str, Any]]:
+        """Like run(), but yields ``tool_call``/``tool_result`` events as they happen.
 
-        model = os.getenv("OLLAMA_MODEL", "llama3.1:8b-instruct")
-        num_ctx = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+        The last event is ``{"event": "answer", ...}`` carrying run()'s result,
+        or ``{"event": "error", ...}`` if the run raised.
+        """
+        events: asyncio.Queue = asyncio.Queue()
 
-        sys = "You are a helpful map assistant. Write a short, friendly answer."
-        user = (
-            f"User asked: {prompt}\n"
-            f"Tool used: {tool}\n"
-            f"Tool result JSON: {json.dumps(result)}"
-        )
+        async def _run() -> Dict[str, Any]:
+            _EVENT_SINK.set(events)
+            return await self.run(prompt)
 
+        task = asyncio.create_task(_run())
+        task.add_done_callback(lambda _t: events.put_nowait(None))
         try:
-            r = requests.post(
-                "http://localhost:11434/api/chat",
-                json={
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": sys},
-                        {"role": "user", "content": user},
-                    ],
-                    "stream": False,
-                    "options": {"num_ctx": num_ctx},
-                },
-                timeout=30,
-            )
-            data = r.json()
-            return data.get("message", {}).get("content", "") or str(result)
+            while True:
+                ev = await events.get()
+                if ev is None:
+                    break
+                yield ev
+            try:
+                yield {"event": "answer", **task.result()}
+            except Exception as e:
+                yield {"event": "error", "error": str(e)}
+        finally:
+            task.cancel()
+
+    async def _ollama_choose_tool(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Ask a local Ollama model to choose a tool and JSON args.
+
+        Expects Ollama at OLLAMA_URL (default http://localhost:11434). Configure model via OLLAMA_MODEL and the context range via OLLAMA_MIN_CTX/OLLAMA_NUM_CTX.
+        """
+        return await self.ollama.choose_tool(prompt)
+
+    async def _ollama_summarize(self, prompt: str, tool: str, result: Dict[str, Any]) -> str:
+        """Ask a local Ollama model to summarize tool results into a friendly answer."""
+        try:
+            return await self.ollama.summarize(prompt, tool, result) or str(result)
         except Exception:
             return str(result)
 
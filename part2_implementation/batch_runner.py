@@ -0,0 +1,103 @@
+"""Run many prompts through one long-lived AgentsSDKMapAssistant.
+
+Prompts are read from a JSONL file (or stdin) and processed with bounded
+concurrency on a single event loop, so the geocode/route/POI caches and
+the pooled HTTP connections stay warm across the whole batch. Results are
+written as JSONL as soon as each prompt finishes.
+
+Input lines may be JSON objects (``{"id": ..., "prompt": ...}``), JSON
+strings, or plain text (one prompt per line).
+"""
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+
+def iter_prompts(lines: Iterable[str]) -> Iterator[Tuple[Any, str]]:
+    """Yield ``(id, prompt)`` pairs from JSONL/plain-text lines, skipping blanks."""
+    for n, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = line
+        if isinstance(item, dict):
+            yield item.get("id", n), str(item.get("prompt", ""))
+        else:
+            yield n, str(item)
+
+
+async def run_batch(agent, prompts: Iterable[Tuple[Any, str]], out: TextIO,
+                    concurrency: int = 8) -> Dict[str, Any]:
+    """Process ``prompts`` with at most ``concurrency`` in flight; write one JSON line per result.
+
+    Returns simple batch stats (counts and wall time).
+    """
+    concurrency = max(1, int(concurrency))
+    loop = asyncio.get_running_loop()
+    # Blocking HTTP/LLM calls run in threads; size the pool to the batch width
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max(8, concurrency * 2)))
+
+    queue: "asyncio.Queue[Optional[Tuple[Any, str]]]" = asyncio.Queue(maxsize=concurrency * 2)
+    stats = {"ok": 0, "failed": 0}
+    started = time.monotonic()
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            pid, prompt = item
+            t0 = time.monotonic()
+            try:
+                result = await agent.run(prompt)
+                rec = {"id": pid, "prompt": prompt, "result": result}
+                stats["ok"] += 1
+            except Exception as e:
+                rec = {"id": pid, "prompt": prompt, "error": str(e)}
+                stats["failed"] += 1
+            rec["elapsed_s"] = round(time.monotonic() - t0, 3)
+            out.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    for item in prompts:
+        await queue.put(item)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+
+    stats["elapsed_s"] = round(time.monotonic() - started, 3)
+    return stats
+
+
+def main_batch(source: str, output: Optional[str] = None, concurrency: int = 8,
+               processes: int = 0) -> Dict[str, Any]:
+    """Entry point used by ``demo_runner --batch``; ``source``/``output`` may be ``-`` for stdio.
+
+    With ``processes`` > 0 the prompts are spread over a worker process pool
+    (see ``worker_pool``) instead of one in-process assistant.
+    """
+    src = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    dst = sys.stdout if output in (None, "-") else open(output, "a", encoding="utf-8")
+    try:
+        if processes > 0:
+            from part2_implementation.worker_pool import AssistantProcessPool
+
+            with AssistantProcessPool(processes) as pool:
+                return pool.run_batch(iter_prompts(src), dst)
+
+        from part2_implementation.agent_sdk_app import AgentsSDKMapAssistant
+
+        agent = AgentsSDKMapAssistant()
+        return asyncio.run(run_batch(agent, iter_prompts(src), dst, concurrency))
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
@@ -1,5 +1,6 @@
 import argparse
 import asyncio
+import sys
 from part2_implementation.agent_sdk_app import AgentsSDKMapAssistant
 
 
@@ -7,8 +8,22 @@ def main():
     parser = argparse.ArgumentParser(description="Agents SDK Map Assistant demo")
     parser.add_argument("prompt", nargs="?", default="Find a driving route from Beirut to Tripoli",
                         help="User question for the agent")
+    parser.add_argument("--batch", metavar="PATH",
+                        help="Run every prompt in a JSONL/text file ('-' for stdin) through one assistant")
+    parser.add_argument("--output", metavar="PATH", default="-",
+                        help="Batch results file (JSONL, appended); '-' for stdout")
+    parser.add_argument("--concurrency", type=int, default=8, help="Prompts in flight during --batch")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Spread --batch over N worker processes with shared caches and rate limits")
     args = parser.parse_args()
 
+    if args.batch:
+        from part2_implementation.batch_runner import main_batch
+
+        stats = main_batch(args.batch, args.output, args.concurrency, args.processes)
+        print(stats, file=sys.stderr)
+        return
+
     agent = AgentsSDKMapAssistant()
     result = asyncio.run(agent.run(args.prompt))
     print(result)
@@ -16,4 +31,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -1,38 +1,43 @@
-import os
+import asyncio
 import json
+import time
 import requests
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from dotenv import load_dotenv
+from part2_implementation.llm_cache import cache_key, get_llm_cache
+from part2_implementation.prompt_layout import USAGE, canonical_tools
+from part2_implementation.run_budget import RunBudget
+from part2_implementation.servers.transport import request, session
+from part2_implementation.settings import Settings, get_settings
 
-# Load .env from package dir and default cwd
-_BASE_DIR = os.path.dirname(__file__)
-load_dotenv(os.path.join(_BASE_DIR, ".env"))
-load_dotenv()
+_BASE = "https://generativelanguage.googleapis.com/v1beta"
+_gemini_tools: Dict[int, List[Dict[str, Any]]] = {}
 
 
 def _to_gemini_tools(TOOLS: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    fns = []
-    for t in TOOLS:
-        fn = t["function"]
-        fns.append(
-            {
-                "name": fn["name"],
-                "description": fn.get("description", ""),
-                "parameters": fn.get("parameters", {"type": "object"}),
-            }
-        )
-    return [{"functionDeclarations": fns}]
+    # Built once from the canonical (sorted, stable-key) tool list so the
+    # serialized prefix is byte-identical across requests
+    canon = canonical_tools(TOOLS)
+    out = _gemini_tools.get(id(canon))
+    if out is None:
+        fns = []
+        for t in canon:
+            fn = t["function"]
+            fns.append(
+                {
+                    "name": fn["name"],
+                    "description": fn.get("description", ""),
+                    "parameters": fn.get("parameters", {"type": "object"}),
+                }
+            )
+        out = _gemini_tools[id(canon)] = [{"functionDeclarations": fns}]
+    return out
 
 
 def _user_msg(text: str) -> Dict[str, Any]:
     return {"role": "user", "parts": [{"text": text}]}
 
 
-def _model_function_call(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
-    return {"role": "model", "parts": [{"functionCall": {"name": name, "args": args}}]}
-
-
 def _tool_function_response(name: str, result: Dict[str, Any]) -> Dict[str, Any]:
     # Gemini expects functionResponse.response with a name and content parts
     if isinstance(result, (dict, list)):
@@ -55,73 +60,231 @@ def _tool_function_response(name: str, result: Dict[str, Any]) -> Dict[str, Any]
     }
 
 
-def _generate(contents: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None, auto: bool = True,
-              generation_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    api_key = (os.getenv("GEMINI_API_KEY") or "").strip()
+def _build_request(contents: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None, auto: bool = True,
+                   generation_config: Optional[Dict[str, Any]] = None,
+                   settings: Optional[Settings] = None, system: Optional[str] = None,
+                   mode: Optional[str] = None, cached: Optional[str] = None):
+    """URL, headers and JSON body of a generateContent call.
+
+    The body starts with the stable prefix (``systemInstruction``, tools,
+    tool config) before the per-request ``contents``; with ``cached`` the
+    prefix is replaced by a reference to a cachedContents resource.
+    """
+    cfg = settings or get_settings()
+    api_key = cfg.gemini_api_key
     if not api_key:
         raise ValueError("GEMINI_API_KEY not set. Add it to part2_implementation/.env or environment.")
 
-    model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
-    base = "https://generativelanguage.googleapis.com/v1beta"
-    url = f"{base}/models/{model}:generateContent"
+    model = cfg.gemini_model
+    url = f"{_BASE}/models/{model}:generateContent"
 
-    body: Dict[str, Any] = {"contents": contents}
-    if tools:
-        body["tools"] = tools
-        body["toolConfig"] = {"functionCallingConfig": {"mode": "AUTO" if auto else "ANY"}}
+    body: Dict[str, Any] = {}
+    if cached:
+        body["cachedContent"] = cached
+    else:
+        body.update(_prefix(system, tools, mode or ("AUTO" if auto else "ANY")))
+    body["contents"] = contents
     if generation_config:
         body["generationConfig"] = generation_config
 
     headers = {"Content-Type": "application/json", "x-goog-api-key": api_key}
-    r = requests.post(url, headers=headers, data=json.dumps(body), timeout=60)
+    return url, headers, json.dumps(body, ensure_ascii=False)
+
+
+def _prefix(system: Optional[str], tools: Optional[List[Dict[str, Any]]], mode: str) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    if system:
+        out["systemInstruction"] = {"parts": [{"text": system}]}
+    if tools:
+        out["tools"] = tools
+        out["toolConfig"] = {"functionCallingConfig": {"mode": mode}}
+    return out
+
+
+# (model, system, mode) -> (cachedContents name or None if creation failed, local expiry)
+_content_caches: Dict[Tuple[str, str, str], Tuple[Optional[str], float]] = {}
+
+
+def _cached_content(system: Optional[str], tools: Optional[List[Dict[str, Any]]], mode: str,
+                    cfg: Settings) -> Optional[str]:
+    """Name of a cachedContents resource holding this prefix, creating it when needed.
+
+    Blocking; returns None (and stops retrying until the TTL passes) if the
+    API refuses, e.g. because the prefix is below the model's minimum size.
+    """
+    key = (cfg.gemini_model, system or "", mode)
+    hit = _content_caches.get(key)
+    now = time.time()
+    if hit is not None and hit[1] > now:
+        return hit[0]
+    body = {"model": f"models/{cfg.gemini_model}", "ttl": f"{int(cfg.gemini_cache_ttl_s)}s",
+            **_prefix(system, tools, mode)}
+    name = None
+    try:
+        r = session().post(f"{_BASE}/cachedContents", data=json.dumps(body, ensure_ascii=False), timeout=30,
+                           headers={"Content-Type": "application/json", "x-goog-api-key": cfg.gemini_api_key})
+        if r.ok:
+            name = r.json().get("name")
+    except (requests.RequestException, ValueError):
+        pass
+    # Renew a minute before the server-side expiry
+    _content_caches[key] = (name, now + max(60.0, cfg.gemini_cache_ttl_s - 60))
+    return name
+
+
+def _parse(r: requests.Response) -> Dict[str, Any]:
     if not r.ok:
         # Surface API error details to aid debugging
         raise requests.HTTPError(f"{r.status_code} {r.reason}: {r.text}", response=r)
-    return r.json()
+    data = r.json()
+    USAGE.record_gemini(data)
+    return data
 
 
-async def run_with_tools(prompt: str, TOOLS: List[Dict[str, Any]], dispatch_tool_async) -> Dict[str, Any]:
+def _generate(contents: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None, auto: bool = True,
+              generation_config: Optional[Dict[str, Any]] = None,
+              settings: Optional[Settings] = None) -> Dict[str, Any]:
+    cfg = settings or get_settings()
+    cache, key = _response_cache(cfg, contents, tools, generation_config, None, "AUTO" if auto else "ANY")
+    hit = cache.get(key) if cache is not None else None
+    if hit is not None:
+        return hit
+    url, headers, data = _build_request(contents, tools, auto, generation_config, cfg)
+    out = _parse(session().post(url, headers=headers, data=data, timeout=60))
+    if cache is not None:
+        cache.set(key, out)
+    return out
+
+
+async def _agenerate(contents: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None, auto: bool = True,
+                     generation_config: Optional[Dict[str, Any]] = None,
+                     settings: Optional[Settings] = None, system: Optional[str] = None,
+                     mode: Optional[str] = None) -> Dict[str, Any]:
+    """Async :func:`_generate` under the ``gemini`` upstream policy (adaptive timeout, breaker).
+
+    With ``GEMINI_CACHED_CONTENT`` enabled the system/tools prefix is served
+    from an explicit context cache.
+    """
+    cfg = settings or get_settings()
+    mode = mode or ("AUTO" if auto else "ANY")
+    cache, key = _response_cache(cfg, contents, tools, generation_config, system, mode)
+    hit = cache.get(key) if cache is not None else None
+    if hit is not None:
+        return hit
+    cached = None
+    if cfg.gemini_cached_content and cfg.gemini_api_key and (system or tools):
+        cached = await asyncio.to_thread(_cached_content, system, tools, mode, cfg)
+    url, headers, data = _build_request(contents, tools, auto, generation_config, cfg, system, mode, cached)
+    out = _parse(await request("POST", url, upstream="gemini", headers=headers, data=data, timeout=60))
+    if cache is not None:
+        cache.set(key, out)
+    return out
+
+
+def _response_cache(cfg: Settings, contents, tools, generation_config, system, mode):
+    """``(cache, key)`` for a generateContent request, or ``(None, None)`` when caching is off."""
+    cache = get_llm_cache()
+    if cache is None:
+        return None, None
+    # Keyed on the logical request, not the cachedContents name, which rotates
+    return cache, cache_key("gemini", model=cfg.gemini_model, system=system, tools=tools, mode=mode,
+                            contents=contents, generation_config=generation_config)
+
+
+_POLICY = (
+    "You are a strict map assistant. Tool policy: if the user asks for a driving route"
+    " between two places, call ors_route_places (or ors_route) and return only the route"
+    " steps as a numbered list of turn-by-turn instructions. If the user asks for distance,"
+    " call ors_distance_places (or ors_distance) and return only the numeric distance in km."
+    " Do not echo raw geocode results in the final answer."
+)
+
+
+def _text(resp: Dict[str, Any]) -> str:
+    parts = resp.get("candidates", [{}])[0].get("content", {}).get("parts", []) or []
+    return "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+
+
+async def select_tools(prompt: str, TOOLS: List[Dict[str, Any]], settings: Optional[Settings] = None,
+                       first_round: bool = True):
+    """One tool-selection round: ``([(name, args), ...], text)`` chosen by Gemini."""
+    cfg = settings or get_settings()
+    # force_tool_call -> functionCallingConfig mode ANY (a call is required) on the first round only
+    resp = await _agenerate([_user_msg(prompt)], tools=_to_gemini_tools(TOOLS),
+                            auto=not (cfg.force_tool_call and first_round), settings=cfg, system=_POLICY)
+    parts = resp.get("candidates", [{}])[0].get("content", {}).get("parts", []) or []
+    calls = [
+        (p["functionCall"].get("name"), p["functionCall"].get("args", {}))
+        for p in parts if isinstance(p, dict) and p.get("functionCall")
+    ]
+    return calls, _text(resp)
+
+
+async def summarize(prompt: str, tool_results: List[Dict[str, Any]], TOOLS: List[Dict[str, Any]],
+                    settings: Optional[Settings] = None) -> str:
+    """Final answer for ``prompt`` from already-executed tool results."""
+    contents = [_user_msg(f"User asked: {prompt}\nTool results JSON: {json.dumps(tool_results, ensure_ascii=False)}")]
+    # Same system/tools prefix as selection; mode NONE asks for text only
+    return _text(await _agenerate(contents, tools=_to_gemini_tools(TOOLS), settings=settings, system=_POLICY,
+                                  mode="NONE"))
+
+
+async def run_with_tools(prompt: str, TOOLS: List[Dict[str, Any]], dispatch_tool_async,
+                         settings: Optional[Settings] = None) -> Dict[str, Any]:
     """
-    Run a single-turn Gemini interaction with optional tool-calling.
+    Run a Gemini interaction with up to MAP_AGENT_MAX_ROUNDS rounds of tool calls.
     dispatch_tool_async: async function (name, args) -> dict
+    settings: configuration to use (defaults to the global settings)
     """
-    policy = (
-        "You are a strict map assistant. Tool policy: if the user asks for a driving route"
-        " between two places, call ors_route_places (or ors_route) and return only the route"
-        " steps as a numbered list of turn-by-turn instructions. If the user asks for distance,"
-        " call ors_distance_places (or ors_distance) and return only the numeric distance in km."
-        " Do not echo raw geocode results in the final answer."
-    )
-    contents = [_user_msg(policy), _user_msg(prompt)]
+    cfg = settings or get_settings()
+    contents = [_user_msg(prompt)]
     tools = _to_gemini_tools(TOOLS)
 
-    # Let Gemini decide tools
-    resp = _generate(contents, tools=tools, auto=True)
-    cand = resp.get("candidates", [{}])[0]
-    parts = cand.get("content", {}).get("parts", []) or []
-
+    budget = RunBudget.from_settings(cfg)
     tool_results: List[Dict[str, Any]] = []
-    made_call = False
-    for p in parts:
-        call = p.get("functionCall")
-        if call:
-            made_call = True
-            name = call.get("name")
-            args = call.get("args", {})
-            result = await dispatch_tool_async(name, args)
-            tool_results.append({"tool": name, "content": result})
-            contents.append(_model_function_call(name, args))
-            contents.append(_tool_function_response(name, result))
-
-    if made_call:
-        # Ask for final answer after tool responses; keep tool declarations
-        final = _generate(contents, tools=tools, auto=False)
-        text = (
-            final.get("candidates", [{}])[0]
-            .get("content", {})
-            .get("parts", [{}])[0]
-            .get("text", "")
-        )
+    text = ""
+    rnd = 0
+    while True:
+        # Gemini may chain tools (geocode -> route -> nearby) until the budget
+        # says this call must answer; mode NONE asks for text only
+        final_round = budget.final_round(rnd)
+        if final_round:
+            mode = "NONE"
+        else:
+            mode = "ANY" if (cfg.force_tool_call and rnd == 0) else "AUTO"
+        t0 = time.monotonic()
+        try:
+            resp = await asyncio.wait_for(
+                _agenerate(contents, tools=tools, settings=cfg, system=_POLICY, mode=mode),
+                max(1.0, budget.remaining_s()),
+            )
+        except Exception:
+            if rnd == 0:
+                raise
+            # Tools already ran; answer from their results below
+            break
+        llm_s = time.monotonic() - t0
+        tokens = (resp.get("usageMetadata") or {}).get("totalTokenCount", 0)
+        parts = resp.get("candidates", [{}])[0].get("content", {}).get("parts", []) or []
+        calls = [p["functionCall"] for p in parts if isinstance(p, dict) and p.get("functionCall")]
+        if final_round or not calls:
+            budget.record(llm_s, tokens=tokens)
+            text = _text(resp)
+            break
+
+        t1 = time.monotonic()
+        results = await asyncio.gather(*(dispatch_tool_async(c.get("name"), c.get("args", {})) for c in calls))
+        budget.record(llm_s, time.monotonic() - t1, [c.get("name") for c in calls], tokens)
+        # Echo the model turn as returned, then one turn with all function responses
+        contents.append({"role": "model", "parts": parts})
+        contents.append({
+            "role": "tool",
+            "parts": [_tool_function_response(c.get("name"), r)["parts"][0] for c, r in zip(calls, results)],
+        })
+        tool_results.extend({"tool": c.get("name"), "content": r} for c, r in zip(calls, results))
+        rnd += 1
+
+    if tool_results:
         if not (text or "").strip():
             # Fallback: synthesize a brief answer from tool_results
             def _fmt_tool(tr: Dict[str, Any]) -> str:
@@ -183,11 +346,10 @@ async def run_with_tools(prompt: str, TOOLS: List[Dict[str, Any]], dispatch_tool
                     return str(data)[:400]
 
             text = "\n".join(_fmt_tool(tr) for tr in tool_results)
-        return {"answer": text, "tool_results": tool_results}
+        return {"answer": text, "tool_results": tool_results, "budget": budget.to_json()}
 
     # No tool calls; return model text
-    text = "".join(p.get("text", "") for p in parts if isinstance(p, dict))
-    return {"answer": text, "tool_results": []}
+    return {"answer": text, "tool_results": [], "budget": budget.to_json()}
 
 
 def call_gemini(prompt: str, max_tokens: int = 100) -> str:
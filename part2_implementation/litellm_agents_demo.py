@@ -13,12 +13,11 @@ Then run:
 """
 
 import os
-from dotenv import load_dotenv
+
+from part2_implementation.settings import load_env
 
 # Load .env (GEMINI_API_KEY)
-_BASE = os.path.dirname(__file__)
-load_dotenv(os.path.join(_BASE, ".env"))
-load_dotenv()
+load_env()
 
 # Configure OpenAI SDK to talk to LiteLLM gateway
 os.environ.setdefault("OPENAI_BASE_URL", "http://127.0.0.1:4000")
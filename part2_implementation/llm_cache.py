@@ -0,0 +1,88 @@
+"""Opt-in, content-addressed cache of LLM responses.
+
+Enabled with ``MAP_AGENT_LLM_CACHE=1``. The key is a SHA-256 of the
+canonical JSON of everything that determines a response (provider, model,
+messages/contents, tools, tool choice, generation options), so
+byte-identical requests — repeated evaluation prompts, retries, identical
+tool results — are answered without a network call.
+
+Entries live in an in-process LRU (:class:`TTLCache`) and, when
+``MAP_AGENT_LLM_CACHE_PATH`` is set, in a SQLite file
+(:class:`SharedCache`) that survives restarts and is shared by pool
+workers. Both tiers expire after ``MAP_AGENT_LLM_CACHE_TTL_S``. Only
+successful responses are stored.
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Optional
+
+from part2_implementation.prompt_layout import canonical
+from part2_implementation.servers.cache import TTLCache
+from part2_implementation.settings import get_settings, on_reload
+
+
+def cache_key(provider: str, **request: Any) -> str:
+    """Stable digest of a provider request (keys sorted, no whitespace)."""
+    blob = json.dumps(canonical({"provider": provider, **request}), ensure_ascii=False,
+                      separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Memory tier in front of an optional disk tier."""
+
+    def __init__(self, ttl: float = 3600.0, maxsize: int = 2048, path: Optional[str] = None):
+        self.memory = TTLCache(ttl, maxsize=maxsize)
+        self.disk = None
+        if path:
+            from part2_implementation.servers.cache import SharedCache
+
+            self.disk = SharedCache(path, "llm", ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+
+_cache: Optional[LLMResponseCache] = None
+_configured = False
+_listening = False
+_lock = threading.Lock()
+
+
+def _reset(_settings=None) -> None:
+    """Rebuild from the new settings on next use (registered with on_reload)."""
+    global _cache, _configured
+    with _lock:
+        _cache, _configured = None, False
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """The process-wide response cache, or None unless ``MAP_AGENT_LLM_CACHE`` is on."""
+    global _cache, _configured, _listening
+    if not _configured:
+        with _lock:
+            if not _configured:
+                cfg = get_settings()
+                _cache = LLMResponseCache(cfg.llm_cache_ttl_s, path=cfg.llm_cache_path) if cfg.llm_cache else None
+                _configured = True
+                if not _listening:
+                    on_reload(_reset)
+                    _listening = True
+    return _cache
@@ -0,0 +1,294 @@
+"""Client for a local Ollama server used for tool selection and summaries.
+
+- Every call sends ``keep_alive`` (``OLLAMA_KEEP_ALIVE``), so the model stays
+  loaded between prompts.
+- ``num_ctx`` is sized per call from a fast token estimate of the messages
+  plus room for the reply, rounded up to a power-of-two multiple of
+  ``OLLAMA_MIN_CTX`` and capped at ``OLLAMA_NUM_CTX``. The few fixed sizes
+  keep reloads rare while small prompts avoid allocating a large KV cache.
+  Tool results too large for the cap are compacted before summarising.
+- System prompts are built once and sent byte-identical first, so Ollama can
+  reuse the cached prompt prefix; only the user turn varies.
+- Tool selection passes a JSON schema as ``format`` (grammar-constrained
+  output), so replies name a declared tool with schema-shaped arguments;
+  they are still checked by the precompiled validator.
+- Concurrent ``choose_tool`` calls that arrive within a short window
+  (``OLLAMA_BATCH_WINDOW_MS``) are answered by one request that returns a
+  JSON list of choices. If the batched reply is unusable, each prompt is
+  retried on its own; so is any single entry that fails validation.
+"""
+import asyncio
+import json
+import re
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from part2_implementation.llm_cache import cache_key, get_llm_cache
+from part2_implementation.settings import Settings, get_settings
+from part2_implementation.tool_schema import ToolValidator
+
+SUMMARY_SYSTEM = "You are a helpful map assistant. Write a short, friendly answer."
+
+# Tokens kept free for the reply, and for chat-template framing of two messages
+SELECT_RESERVE = 256
+SUMMARY_RESERVE = 512
+_TEMPLATE_OVERHEAD = 32
+
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Upper-leaning token count for Llama-style BPE vocabularies.
+
+    Letters run about four characters per token, digits three, and every
+    punctuation mark is its own token; no tokenizer needs to be loaded.
+    """
+    n = 0
+    for m in _PIECE.finditer(text):
+        size = m.end() - m.start()
+        c = text[m.start()]
+        if c.isalpha():
+            n += 1 + (size - 1) // 4
+        elif c.isdigit():
+            n += 1 + (size - 1) // 3
+        else:
+            n += 1
+    return n
+
+
+def ctx_bucket(tokens: int, min_ctx: int, max_ctx: int) -> int:
+    """Smallest ``min_ctx * 2**k`` holding ``tokens``, capped at ``max_ctx``."""
+    size = max(1, min(min_ctx, max_ctx))
+    while size < tokens and size < max_ctx:
+        size *= 2
+    return min(size, max_ctx)
+
+
+def _shrink(obj: Any, max_items: int) -> Any:
+    """Copy with floats rounded to 5 places and lists cut to ``max_items``."""
+    if isinstance(obj, float):
+        return round(obj, 5)
+    if isinstance(obj, dict):
+        return {k: _shrink(v, max_items) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        items = [_shrink(v, max_items) for v in obj[:max_items]]
+        if len(obj) > max_items:
+            items.append(f"... {len(obj) - max_items} more")
+        return items
+    return obj
+
+
+def compact_json(obj: Any, max_tokens: int) -> Tuple[str, bool]:
+    """Compact JSON for ``obj`` within about ``max_tokens``; returns ``(text, trimmed)``.
+
+    Tries whitespace-free JSON first, then rounded floats with ever shorter
+    lists (geometries, POI lists), and finally cuts the text.
+    """
+    text = json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str)
+    if estimate_tokens(text) <= max_tokens:
+        return text, False
+    cap = 64
+    while cap >= 1:
+        text = json.dumps(_shrink(obj, cap), separators=(",", ":"), ensure_ascii=False, default=str)
+        if estimate_tokens(text) <= max_tokens:
+            return text, True
+        cap //= 2
+    return text[: max(0, max_tokens) * 2] + "...", True
+
+
+class OllamaClient:
+    """Warm, batching wrapper around Ollama's ``/api/chat``."""
+
+    def __init__(self, validator: ToolValidator, settings: Optional[Settings] = None):
+        self._settings = settings
+        self.validator = validator
+        self.tool_names = validator.names
+        self.selection_format = validator.selection_schema()
+        self.batch_format = validator.batch_schema()
+        # Built once: identical bytes on every call keep the prompt-prefix cache hot
+        self.selector_system = (
+            "You are a tool selector. Given a user prompt, choose the single best tool "
+            "from the list and return strictly JSON in the format: {\"tool\": \"<name>\", \"arguments\": { ... }}. "
+            f"Tools: {self.tool_names}. Do not include any other text."
+        )
+        self.batch_system = (
+            self.selector_system
+            + " When given several numbered prompts, return {\"choices\": [...]} with one such object"
+            " per prompt, in the same order."
+        )
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {"requests": 0, "batches": 0, "batched_prompts": 0, "parse_failures": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0, "trimmed_results": 0}
+        # num_ctx -> calls, and per-call token usage of the most recent requests
+        self.ctx_sizes: Dict[int, int] = {}
+        self.calls: deque = deque(maxlen=256)
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings or get_settings()
+
+    async def chat(self, system: str, user: str, fmt: Any = None, reserve: int = SELECT_RESERVE) -> str:
+        """One non-streaming chat turn; returns the assistant message text.
+
+        ``fmt`` is passed as Ollama's ``format``: ``"json"`` or a JSON schema.
+        ``reserve`` is the number of tokens left free for the reply.
+        """
+        from part2_implementation.prompt_layout import USAGE
+        from part2_implementation.servers.transport import request
+
+        cfg = self.settings
+        estimate = estimate_tokens(system) + estimate_tokens(user) + _TEMPLATE_OVERHEAD
+        num_ctx = ctx_bucket(estimate + reserve, cfg.ollama_min_ctx, cfg.ollama_num_ctx)
+        body: Dict[str, Any] = {
+            "model": cfg.ollama_model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            "stream": False,
+            "keep_alive": cfg.ollama_keep_alive,
+            "options": {"num_ctx": num_ctx},
+        }
+        if fmt is not None:
+            body["format"] = fmt
+        cache = get_llm_cache()
+        key = None
+        if cache is not None:
+            # keep_alive only affects residency, not the answer
+            key = cache_key("ollama", **{k: v for k, v in body.items() if k != "keep_alive"})
+            hit = cache.get(key)
+            if hit is not None:
+                return hit
+        self.stats["requests"] += 1
+        t0 = time.monotonic()
+        r = await request("POST", f"{cfg.ollama_url}/api/chat", upstream="ollama", json=body, timeout=30)
+        r.raise_for_status()
+        data = r.json()
+        content = data.get("message", {}).get("content", "")
+        self._record(num_ctx, estimate, data, time.monotonic() - t0)
+        USAGE.record("ollama", data.get("prompt_eval_count", 0), 0)
+        if cache is not None and content:
+            cache.set(key, content)
+        return content
+
+    async def warm(self) -> bool:
+        """Load the model ahead of the first prompt (an empty generate only loads it)."""
+        from part2_implementation.servers.transport import request
+
+        cfg = self.settings
+        try:
+            r = await request(
+                "POST",
+                f"{cfg.ollama_url}/api/generate",
+                upstream="ollama",
+                # Selections use the smallest context, so load that one
+                json={"model": cfg.ollama_model, "keep_alive": cfg.ollama_keep_alive,
+                      "options": {"num_ctx": ctx_bucket(0, cfg.ollama_min_ctx, cfg.ollama_num_ctx)}},
+                timeout=120,
+            )
+            return r.ok
+        except Exception:
+            return False
+
+    def _record(self, num_ctx: int, estimate: int, data: Dict[str, Any], elapsed_s: float) -> None:
+        prompt_tokens = int(data.get("prompt_eval_count") or 0)
+        completion_tokens = int(data.get("eval_count") or 0)
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["completion_tokens"] += completion_tokens
+        self.ctx_sizes[num_ctx] = self.ctx_sizes.get(num_ctx, 0) + 1
+        self.calls.append({
+            "num_ctx": num_ctx,
+            "estimated_tokens": estimate,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "ms": round(elapsed_s * 1000, 1),
+        })
+
+    # -- tool selection ----------------------------------------------------
+
+    def _valid(self, choice: Any) -> Optional[Dict[str, Any]]:
+        if isinstance(choice, dict) and self.validator.validate(choice.get("tool"), choice.get("arguments")) is None:
+            return choice
+        self.stats["parse_failures"] += 1
+        return None
+
+    async def _choose_one(self, prompt: str) -> Optional[Dict[str, Any]]:
+        try:
+            content = await self.chat(self.selector_system, f"Prompt: {prompt}", self.selection_format)
+            return self._valid(json.loads(content or "{}"))
+        except Exception:
+            return None
+
+    async def _choose_many(self, prompts: List[str]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        user = "\n".join(f"{i}. Prompt: {p}" for i, p in enumerate(prompts, 1))
+        try:
+            content = await self.chat(self.batch_system, user, self.batch_format)
+            choices = json.loads(content or "{}").get("choices")
+        except Exception:
+            return None
+        if not isinstance(choices, list) or len(choices) != len(prompts):
+            return None
+        return [self._valid(c) for c in choices]
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        prompts = [p for p, _ in batch]
+        try:
+            results = None
+            if len(batch) > 1:
+                self.stats["batches"] += 1
+                self.stats["batched_prompts"] += len(batch)
+                results = await self._choose_many(prompts)
+            if results is None:
+                results = await asyncio.gather(*(self._choose_one(p) for p in prompts))
+            else:
+                # Entries the batch got wrong get their own constrained request
+                retry = [i for i, res in enumerate(results) if res is None]
+                for i, res in zip(retry, await asyncio.gather(*(self._choose_one(prompts[i]) for i in retry))):
+                    results[i] = res
+        except BaseException as e:
+            # Never leave choose_tool callers waiting on a batch that died
+            err = e if isinstance(e, Exception) else RuntimeError("Ollama tool-selection batch was cancelled")
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(err)
+            raise
+        for (_, fut), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def choose_tool(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """``{"tool": name, "arguments": {...}}`` for ``prompt``, or None if Ollama fails."""
+        cfg = self.settings
+        if cfg.ollama_batch_max <= 1:
+            return await self._choose_one(prompt)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((prompt, fut))
+        if len(self._pending) >= cfg.ollama_batch_max:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(cfg.ollama_batch_window_ms / 1000.0, self._flush)
+        try:
+            return await fut
+        except Exception:
+            return None
+
+    async def summarize(self, prompt: str, tool: str, result: Any) -> str:
+        head = f"User asked: {prompt}\nTool used: {tool}\nTool result JSON: "
+        # Whatever the largest context leaves after the prompt and reply goes to the result
+        room = (self.settings.ollama_num_ctx - SUMMARY_RESERVE - _TEMPLATE_OVERHEAD
+                - estimate_tokens(SUMMARY_SYSTEM) - estimate_tokens(head))
+        body, trimmed = compact_json(result, room)
+        if trimmed:
+            self.stats["trimmed_results"] += 1
+        return await self.chat(SUMMARY_SYSTEM, head + body, reserve=SUMMARY_RESERVE)
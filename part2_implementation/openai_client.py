@@ -1,15 +1,26 @@
-import os
-from dotenv import load_dotenv
+from typing import Dict, Optional
+
 from openai import OpenAI
 
-# Load .env from package directory first, then any default .env in CWD
-_BASE_DIR = os.path.dirname(__file__)
-load_dotenv(os.path.join(_BASE_DIR, ".env"))
-load_dotenv()
+from part2_implementation.settings import Settings, get_settings
+
+# One client (and connection pool) per API key, so a settings reload with a
+# new key takes effect without restarting the process.
+_clients: Dict[str, OpenAI] = {}
+
 
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not found. Add it to part2_implementation/.env or env vars.")
+def get_client(settings: Optional[Settings] = None) -> OpenAI:
+    api_key = (settings or get_settings()).openai_api_key
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found. Add it to part2_implementation/.env or env vars.")
+    client = _clients.get(api_key)
+    if client is None:
+        client = _clients[api_key] = OpenAI(api_key=api_key)
+    return client
 
-client = OpenAI(api_key=api_key)
 
+def __getattr__(name: str):
+    # Backwards compatible ``from part2_implementation.openai_client import client``
+    if name == "client":
+        return get_client()
+    raise AttributeError(name)
@@ -0,0 +1,71 @@
+"""Byte-stable request prefixes and prompt-cache accounting.
+
+Provider prompt caches (OpenAI automatic prefix caching, Gemini implicit
+and explicit context caching) only help when every request starts with the
+same bytes. This module canonicalises the shared prefix — tool schemas are
+sorted by name with recursively sorted keys and built once, and system
+prompts are module constants — and counts cached prompt tokens reported
+back by the providers.
+"""
+import threading
+from typing import Any, Dict, List, Tuple
+
+# Shared system prompt for OpenAI tool selection and final answers
+SYSTEM_PROMPT = "You are a helpful map assistant. Use tools when helpful."
+
+# id(tools) -> (tools, canonical copy); holding ``tools`` keeps its id from being reused
+_canonical: Dict[int, Tuple[list, list]] = {}
+_lock = threading.Lock()
+
+
+def canonical(obj: Any) -> Any:
+    """Copy of ``obj`` with every dict's keys in sorted order."""
+    if isinstance(obj, dict):
+        return {k: canonical(obj[k]) for k in sorted(obj)}
+    if isinstance(obj, list):
+        return [canonical(v) for v in obj]
+    return obj
+
+
+def canonical_tools(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """``tools`` sorted by function name with sorted keys, built once per list object."""
+    entry = _canonical.get(id(tools))
+    if entry is None or entry[0] is not tools:
+        with _lock:
+            entry = (tools, canonical(sorted(tools, key=lambda t: t["function"]["name"])))
+            _canonical[id(tools)] = entry
+    return entry[1]
+
+
+class PromptCacheStats:
+    """Per-provider prompt and cached-prompt token counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, provider: str, prompt_tokens: int, cached_tokens: int) -> None:
+        with self._lock:
+            c = self.counts.setdefault(provider, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0})
+            c["requests"] += 1
+            c["prompt_tokens"] += int(prompt_tokens or 0)
+            c["cached_tokens"] += int(cached_tokens or 0)
+
+    def record_openai(self, resp: Any) -> None:
+        usage = getattr(resp, "usage", None)
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.record("openai", getattr(usage, "prompt_tokens", 0), getattr(details, "cached_tokens", 0) or 0)
+
+    def record_gemini(self, data: Dict[str, Any]) -> None:
+        usage = data.get("usageMetadata") if isinstance(data, dict) else None
+        if usage:
+            self.record("gemini", usage.get("promptTokenCount", 0), usage.get("cachedContentTokenCount", 0))
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self.counts.items()}
+
+
+USAGE = PromptCacheStats()
@@ -0,0 +1,134 @@
+"""Latency/error-aware routing across LLM providers.
+
+:class:`ProviderRouter` keeps a rolling window of outcomes per provider
+(OpenAI, Gemini, Ollama). ``MAP_AGENT_PROVIDER=auto`` sends each prompt to
+the fastest healthy provider; ``MAP_AGENT_PROVIDER=race`` starts tool
+selection on the two best-ranked providers at once, keeps the first
+successful answer and cancels the other, which bounds tail latency when
+one vendor has a slow spell.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class ProviderHealth:
+    """Rolling outcomes (ok, latency) of recent calls to one provider."""
+
+    def __init__(self, window: int = 50):
+        self._calls = deque(maxlen=window)
+
+    def record(self, ok: bool, latency_s: float) -> None:
+        self._calls.append((ok, latency_s))
+
+    @property
+    def samples(self) -> int:
+        return len(self._calls)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._calls:
+            return 0.0
+        return sum(1 for ok, _ in self._calls if not ok) / len(self._calls)
+
+    def latency(self, q: float = 0.5) -> Optional[float]:
+        data = sorted(lat for ok, lat in self._calls if ok)
+        if not data:
+            return None
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+    def to_json(self) -> Dict[str, Any]:
+        p50, p95 = self.latency(0.5), self.latency(0.95)
+        return {
+            "samples": self.samples,
+            "error_rate": round(self.error_rate, 3),
+            "p50_s": round(p50, 3) if p50 is not None else None,
+            "p95_s": round(p95, 3) if p95 is not None else None,
+        }
+
+
+class ProviderRouter:
+    """Ranks providers by health and latency, and runs or races calls against them."""
+
+    def __init__(self, window: int = 50, max_error_rate: float = 0.5):
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.health: Dict[str, ProviderHealth] = {}
+
+    def _h(self, name: str) -> ProviderHealth:
+        h = self.health.get(name)
+        if h is None:
+            h = self.health[name] = ProviderHealth(self.window)
+        return h
+
+    def healthy(self, name: str) -> bool:
+        h = self._h(name)
+        # Need a few samples before declaring a provider unhealthy
+        return h.samples < 5 or h.error_rate < self.max_error_rate
+
+    def ranked(self, names: List[str]) -> List[str]:
+        """Healthy providers first; within each group, lowest p95 first.
+
+        Providers never called rank ahead of measured ones so each gets
+        tried, and ones with only failures rank last; ties keep the
+        configured order.
+        """
+        def key(item):
+            idx, name = item
+            h = self._h(name)
+            p95 = h.latency(0.95)
+            only_failures = p95 is None and h.samples > 0
+            return (not self.healthy(name), only_failures, p95 is not None, p95 or 0.0, idx)
+
+        return [name for _, name in sorted(enumerate(names), key=key)]
+
+    async def call(self, name: str, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        """Await ``fn(name)``, recording latency and success. ``None`` counts as a failure."""
+        t0 = time.monotonic()
+        try:
+            out = await fn(name)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._h(name).record(False, time.monotonic() - t0)
+            raise
+        self._h(name).record(out is not None, time.monotonic() - t0)
+        return out
+
+    async def first(self, names: List[str], fn: Callable[[str], Awaitable[Any]]) -> Tuple[Optional[str], Any]:
+        """Try providers in order; return ``(name, result)`` of the first that succeeds."""
+        for name in names:
+            try:
+                out = await self.call(name, fn)
+            except Exception:
+                continue
+            if out is not None:
+                return name, out
+        return None, None
+
+    async def race(self, names: List[str], fn: Callable[[str], Awaitable[Any]]) -> Tuple[Optional[str], Any]:
+        """Run ``fn`` on all ``names`` concurrently; first success wins, the rest are cancelled.
+
+        Cancelled losers are not recorded, and are awaited before returning so
+        their cleanup (e.g. releasing a circuit breaker's half-open probe)
+        has run. Blocking SDK calls running in a worker thread finish in the
+        background and their result is dropped.
+        """
+        tasks = {asyncio.ensure_future(self.call(n, fn)): n for n in names}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if not t.cancelled() and t.exception() is None and t.result() is not None:
+                        return tasks[t], t.result()
+            return None, None
+        finally:
+            for t in pending:
+                t.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: h.to_json() for name, h in self.health.items()}
@@ -0,0 +1,67 @@
+"""Round, deadline and token limits for the multi-round tool loop.
+
+A :class:`RunBudget` is created per prompt. The provider loops (OpenAI in
+``AgentsSDKMapAssistant.run`` and Gemini ``run_with_tools``) ask it whether
+the next model call must be the final one — no more tool calls — and
+record per-round timings and token usage, which are returned with the
+answer.
+"""
+import time
+from typing import Any, Dict, List, Optional
+
+from part2_implementation.settings import Settings, get_settings
+
+
+class RunBudget:
+    """Tracks rounds, wall-clock time and tokens spent on one prompt."""
+
+    def __init__(self, max_rounds: int = 4, deadline_s: float = 60.0, token_budget: int = 0):
+        self.max_rounds = max(1, int(max_rounds))
+        self.deadline_s = float(deadline_s)
+        # 0 disables the token limit
+        self.token_budget = int(token_budget)
+        self.started = time.monotonic()
+        self.tokens = 0
+        self.rounds: List[Dict[str, Any]] = []
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Settings] = None) -> "RunBudget":
+        cfg = settings or get_settings()
+        return cls(cfg.max_tool_rounds, cfg.run_deadline_s, cfg.run_token_budget)
+
+    def remaining_s(self) -> float:
+        return self.deadline_s - (time.monotonic() - self.started)
+
+    def final_round(self, index: int) -> bool:
+        """True if model call ``index`` (0-based) must produce the answer, without more tools.
+
+        Ends the loop early when the round limit or token budget is reached,
+        or when the time left would not cover another round as slow as the
+        slowest so far plus the final answer.
+        """
+        if index >= self.max_rounds - 1:
+            return True
+        if self.token_budget and self.tokens >= self.token_budget:
+            return True
+        if self.rounds:
+            slowest = max(r["llm_ms"] + r["tools_ms"] for r in self.rounds) / 1000.0
+            return self.remaining_s() < 2 * slowest
+        return False
+
+    def record(self, llm_s: float, tools_s: float = 0.0, tools: Optional[List[str]] = None,
+               tokens: int = 0) -> None:
+        self.tokens += int(tokens or 0)
+        self.rounds.append({
+            "round": len(self.rounds) + 1,
+            "llm_ms": round(llm_s * 1000, 1),
+            "tools_ms": round(tools_s * 1000, 1),
+            "tools": tools or [],
+            "tokens": int(tokens or 0),
+        })
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds,
+            "total_tokens": self.tokens,
+            "elapsed_ms": round((time.monotonic() - self.started) * 1000, 1),
+        }
@@ -0,0 +1,158 @@
+"""Typeahead place suggestions from places already geocoded (and optional OSM extracts).
+
+Names are indexed in normalized form (see :mod:`place_names`), both whole
+and from each later word ("hamra street" is also found under "street").
+Two structures answer a prefix:
+
+- prefixes of up to ``trie_depth`` characters (the short, hot ones) map to
+  their top-k places by popularity, kept current on every update;
+- longer prefixes bisect a sorted ``(name, place)`` array and rank the few
+  rows in that range.
+
+Both are updated in place as geocodes land, so no rebuild is needed.
+"""
+import bisect
+import heapq
+import math
+import threading
+from dataclasses import replace
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from part2_implementation.servers.place_names import normalize_place
+from part2_implementation.servers.records import Suggestion
+
+# Rows scanned at most for a long prefix before ranking
+_MAX_SCAN = 1024
+# Base popularity of extract places by OSM place=* type (log10(population) is added)
+_PLACE_RANK = {
+    "city": 8.0, "town": 5.0, "suburb": 3.0, "village": 2.0, "quarter": 2.0,
+    "neighbourhood": 1.0, "hamlet": 1.0, "locality": 0.5,
+}
+
+
+class PlaceIndex:
+    """Prefix index of places with per-prefix top-k by popularity."""
+
+    def __init__(self, top_k: int = 10, trie_depth: int = 3):
+        self.top_k = int(top_k)
+        self.trie_depth = int(trie_depth)
+        self.entries: List[Suggestion] = []
+        # place ref (OSM id or rounded coordinates) -> entry id
+        self._ids: Dict[Hashable, int] = {}
+        # entry id -> {normalized name: label}
+        self._names: List[Dict[str, str]] = []
+        # sorted (indexed key, entry id)
+        self._rows: List[Tuple[str, int]] = []
+        # short prefix -> entry ids, most popular first
+        self._top: Dict[str, List[int]] = {}
+        # While loading an extract, rows are appended and sorted once at the end
+        self._bulk = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _keys(name: str) -> List[str]:
+        words = name.split()
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def add(self, ref: Hashable, name: str, lat: float, lon: float, display: Optional[str] = None,
+            aliases: Iterable[str] = (), popularity: float = 1.0) -> int:
+        """Add ``popularity`` to place ``ref`` (creating it), index its names; returns its id."""
+        with self._lock:
+            i = self._ids.get(ref)
+            if i is None:
+                i = self._ids[ref] = len(self.entries)
+                self.entries.append(Suggestion(name=name, lat=float(lat), lon=float(lon), display=display))
+                self._names.append({})
+            entry = self.entries[i]
+            entry.popularity += popularity
+            names = self._names[i]
+            for label in (name, *aliases):
+                norm = normalize_place(label)
+                if norm and norm not in names:
+                    names[norm] = label.strip()
+                    for key in self._keys(norm):
+                        if self._bulk:
+                            self._rows.append((key, i))
+                        else:
+                            bisect.insort(self._rows, (key, i))
+            # Popularity only grows, so each prefix list just needs this entry re-placed
+            for prefix in {key[:n] for norm in names for key in self._keys(norm)
+                           for n in range(1, min(len(key), self.trie_depth) + 1)}:
+                top = self._top.setdefault(prefix, [])
+                if i not in top:
+                    top.append(i)
+                top.sort(key=lambda j: -self.entries[j].popularity)
+                del top[self.top_k:]
+            return i
+
+    def complete(self, prefix: str, k: int = 5) -> List[Suggestion]:
+        """Up to ``k`` places with a name (or later word) starting with ``prefix``, most popular first.
+
+        Long prefixes are ranked among their first 1024 matching names.
+        """
+        p = normalize_place(prefix)
+        if not p:
+            return []
+        k = max(1, min(int(k), self.top_k))
+        with self._lock:
+            if len(p) <= self.trie_depth:
+                ids = self._top.get(p, [])[:k]
+            else:
+                found = set()
+                lo = bisect.bisect_left(self._rows, (p,))
+                for key, i in self._rows[lo:lo + _MAX_SCAN]:
+                    if not key.startswith(p):
+                        break
+                    found.add(i)
+                ids = heapq.nlargest(k, found, key=lambda j: self.entries[j].popularity)
+            return [self._suggestion(i, p) for i in ids]
+
+    def _suggestion(self, i: int, p: str) -> Suggestion:
+        # Label with the spelling that matched the prefix, preferring whole-name matches
+        names = self._names[i]
+        label = next((lbl for norm, lbl in names.items() if norm.startswith(p)), None)
+        if label is None:
+            label = next((lbl for norm, lbl in names.items() if any(w.startswith(p) for w in self._keys(norm))),
+                         self.entries[i].name)
+        return replace(self.entries[i], name=label)
+
+    def load_extract(self, path: str) -> int:
+        """Index the named ``place=*`` nodes of an OSM XML extract (.osm, .gz, .bz2); returns places added."""
+        import xml.etree.ElementTree as ET
+
+        from part2_implementation.servers.road_graph import open_extract
+
+        self._bulk = True
+        try:
+            with open_extract(path) as f:
+                added = self._load_places(ET.iterparse(f, events=("end",)))
+        finally:
+            with self._lock:
+                self._rows.sort()
+                self._bulk = False
+        return added
+
+    def _load_places(self, events) -> int:
+        added = 0
+        for _, el in events:
+            if el.tag == "node":
+                tags = {t.get("k"): t.get("v") for t in el.iter("tag")}
+                rank = _PLACE_RANK.get(tags.get("place"))
+                if rank is not None and tags.get("name"):
+                    try:
+                        population = float(tags.get("population") or 0)
+                    except ValueError:
+                        population = 0.0
+                    aliases = [v for t, v in tags.items()
+                               if t.startswith("name:") or t in ("int_name", "alt_name", "official_name")]
+                    self.add(f"node/{el.get('id')}", tags["name"], float(el.get("lat")), float(el.get("lon")),
+                             aliases=[a for v in aliases for a in v.split(";")],
+                             popularity=rank + math.log10(1 + max(population, 0.0)))
+                    added += 1
+                el.clear()
+            elif el.tag in ("way", "relation"):
+                el.clear()
+        return added
@@ -0,0 +1,269 @@
+"""Caches used by the map servers: in-process TTL/LRU and a cross-process shared tier.
+
+Both tiers support the lookup policy of :meth:`Revalidating.fetch`:
+
+- entries past their TTL stay servable for ``stale_ttl`` more seconds; a
+  stale hit is answered immediately and refreshed in the background
+  (stale-while-revalidate),
+- concurrent misses for one key share a single upstream call,
+- results are stored according to :func:`classify_result`: answers for
+  ``ttl``, "nothing found" answers for the short ``negative_ttl``, and
+  errors (timeouts, 429/5xx, missing keys) never, so a failing upstream
+  cannot poison the cache.
+"""
+import ast
+import asyncio
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+
+def classify_result(value: Any) -> str:
+    """``"ok"`` (cache), ``"negative"`` (cache briefly) or ``"skip"`` (never cache).
+
+    Error dicts are cached only when flagged ``not_found`` (a definitive empty
+    answer); empty result lists count as negative answers too.
+    """
+    if isinstance(value, dict) and "error" in value:
+        return "negative" if value.get("not_found") else "skip"
+    if isinstance(value, list) and not value:
+        return "negative"
+    return "ok"
+
+
+class Revalidating:
+    """``fetch()`` on top of a cache's ``peek()``/``set()``."""
+
+    # Set by subclasses: stale_ttl, negative_ttl, stale_hits and
+    # _loads (key -> future of the upstream call in progress)
+    _loads: Dict[Hashable, "asyncio.Future"]
+
+    async def fetch(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                    classify: Callable[[Any], str] = classify_result) -> Any:
+        """Cached value for ``key``, loading it with ``loader()`` on a miss."""
+        found = self.peek(key)
+        if found is not None:
+            value, fresh = found
+            if not fresh:
+                self._load(key, loader, classify)
+            return value
+        return await asyncio.shield(self._load(key, loader, classify))
+
+    def _load(self, key: Hashable, loader, classify) -> "asyncio.Future":
+        fut = self._loads.get(key)
+        if fut is None:
+            fut = self._loads[key] = asyncio.ensure_future(self._store(key, loader, classify))
+            fut.add_done_callback(lambda _f: self._loads.pop(key, None))
+            fut.add_done_callback(_drop_result)
+        return fut
+
+    async def _store(self, key: Hashable, loader, classify) -> Any:
+        value = await loader()
+        kind = classify(value)
+        if kind == "ok":
+            self.set(key, value)
+        elif kind == "negative":
+            self.set(key, value, self.negative_ttl)
+        # "skip": a stale entry, if any, keeps being served until it expires
+        return value
+
+
+def _drop_result(fut: "asyncio.Future") -> None:
+    # Background refreshes (and abandoned waits) must not log "exception never retrieved"
+    if not fut.cancelled():
+        fut.exception()
+
+
+class TTLCache(Revalidating):
+    """LRU cache whose entries expire ``ttl`` seconds after they are stored.
+
+    With ``stale_ttl`` > 0, expired entries are kept that much longer for
+    :meth:`peek` / :meth:`fetch`; :meth:`get` only returns fresh entries.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 4096, stale_ttl: float = 0.0, negative_ttl: float = 300.0):
+        self.ttl = float(ttl)
+        self.maxsize = int(maxsize)
+        self.stale_ttl = float(stale_ttl)
+        self.negative_ttl = float(negative_ttl)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._loads = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        now = time.monotonic()
+        if item is None or item[0] <= now:
+            if item is not None and item[0] + self.stale_ttl <= now:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """``(value, fresh)`` for a fresh or stale entry, else None."""
+        item = self._data.get(key)
+        now = time.monotonic()
+        if item is None or item[0] + self.stale_ttl <= now:
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        fresh = item[0] > now
+        if fresh:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return item[1], fresh
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else float(ttl)), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        item = self._data.get(key)
+        return item is not None and item[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        now = time.monotonic()
+        return iter([k for k, (expires, _) in self._data.items() if expires > now])
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class SharedCache(Revalidating, MutableMapping):
+    """TTL cache stored in a memory-mapped SQLite file, shared by many processes.
+
+    Meant for read-mostly data (geocodes, routes) in the process-pool mode:
+    every worker opens the same file, readers go through SQLite's mmap and
+    never block each other (WAL journal). Keys are any ``repr``-able value;
+    values are pickled. Offers both the mapping protocol (for ``place_cache``)
+    and ``get``/``set`` like :class:`TTLCache`.
+    """
+
+    def __init__(self, path: str, namespace: str, ttl: float = 86400.0, mmap_bytes: int = 256 << 20,
+                 stale_ttl: float = 0.0, negative_ttl: float = 300.0):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = float(ttl)
+        self.mmap_bytes = int(mmap_bytes)
+        # ``expires`` is the end of freshness; rows live on for stale_ttl
+        self.stale_ttl = float(stale_ttl)
+        self.negative_ttl = float(negative_ttl)
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._loads = {}
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        # Connections must not cross fork(); reopen lazily in each process
+        if self._conn is None or self._pid != os.getpid():
+            import sqlite3
+
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " ns TEXT NOT NULL, k TEXT NOT NULL, expires REAL NOT NULL, v BLOB NOT NULL,"
+                " PRIMARY KEY (ns, k))"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT v FROM cache WHERE ns = ? AND k = ? AND expires > ?",
+                (self.namespace, repr(key), time.time()),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """``(value, fresh)`` for a fresh or stale entry, else None."""
+        now = time.time()
+        with self._lock:
+            row = self._db().execute(
+                "SELECT v, expires FROM cache WHERE ns = ? AND k = ? AND expires > ?",
+                (self.namespace, repr(key), now - self.stale_ttl),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        fresh = row[1] > now
+        if fresh:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return pickle.loads(row[0]), fresh
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO cache (ns, k, expires, v) VALUES (?, ?, ?, ?)",
+                (self.namespace, repr(key), time.time() + (self.ttl if ttl is None else float(ttl)), blob),
+            )
+
+    def __getitem__(self, key: Hashable) -> Any:
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: Hashable) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM cache WHERE ns = ? AND k = ?", (self.namespace, repr(key)))
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT 1 FROM cache WHERE ns = ? AND k = ? AND expires > ?",
+                (self.namespace, repr(key), time.time()),
+            ).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator[Any]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT k FROM cache WHERE ns = ? AND expires > ?", (self.namespace, time.time())
+            ).fetchall()
+        for (k,) in rows:
+            yield ast.literal_eval(k)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute(
+                "SELECT COUNT(*) FROM cache WHERE ns = ? AND expires > ?", (self.namespace, time.time())
+            ).fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM cache WHERE ns = ?", (self.namespace,))
@@ -0,0 +1,197 @@
+"""Geometry helpers: slippy-map tiles, bounding boxes and great-circle distance."""
+import heapq
+import math
+from typing import Iterator, List, Sequence, Tuple
+
+_NUMPY_UNSET = object()
+_numpy = _NUMPY_UNSET
+
+
+def _np():
+    """NumPy if installed (imported on first use, it is slow to import), else None."""
+    global _numpy
+    if _numpy is _NUMPY_UNSET:
+        try:
+            import numpy
+        except ImportError:  # numpy is optional
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+# (min_lon, min_lat, max_lon, max_lat)
+BBox = Tuple[float, float, float, float]
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def lonlat_to_tile(lon: float, lat: float, zoom: int) -> Tuple[int, int]:
+    """Slippy-map tile ``(x, y)`` containing a coordinate at ``zoom``."""
+    lat = max(-85.0511, min(85.0511, lat))
+    n = 1 << zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return (min(max(x, 0), n - 1), min(max(y, 0), n - 1))
+
+
+def tile_bbox(x: int, y: int, zoom: int) -> BBox:
+    """Bounding box of tile ``(x, y)`` at ``zoom``."""
+    n = 1 << zoom
+
+    def lat(yy: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * yy / n))))
+
+    return (x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y))
+
+
+def tiles_for_bbox(bbox: BBox, zoom: int) -> Iterator[Tuple[int, int]]:
+    """All tiles at ``zoom`` intersecting ``bbox``."""
+    x0, y0 = lonlat_to_tile(bbox[0], bbox[3], zoom)  # north-west corner
+    x1, y1 = lonlat_to_tile(bbox[2], bbox[1], zoom)  # south-east corner
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield (x, y)
+
+
+def bbox_area_m2(bbox: BBox) -> float:
+    """Approximate area of ``bbox`` in square meters (equirectangular; fine for boxes of a few km)."""
+    mid = math.radians((bbox[1] + bbox[3]) / 2)
+    width = math.radians(bbox[2] - bbox[0]) * EARTH_RADIUS_M * math.cos(mid)
+    height = math.radians(bbox[3] - bbox[1]) * EARTH_RADIUS_M
+    return abs(width * height)
+
+
+def tile_range_bbox(x0: int, y0: int, x1: int, y1: int, zoom: int) -> BBox:
+    """Bounding box of the tile rectangle ``x0..x1`` x ``y0..y1`` (inclusive)."""
+    west, _, _, north = tile_bbox(x0, y0, zoom)
+    _, south, east, _ = tile_bbox(x1, y1, zoom)
+    return (west, south, east, north)
+
+
+def tile_chunks(tiles, zoom: int, max_area_m2: float) -> List[Tuple[int, int, int, int]]:
+    """Cover ``tiles`` with rectangles ``(x0, y0, x1, y1)`` made only of those tiles.
+
+    Greedy: from the top-left remaining tile, grow right, then down, while
+    every covered tile is in ``tiles`` and the area stays within
+    ``max_area_m2`` (a single larger tile still gets its own chunk).
+    """
+    left = set(tiles)
+    chunks = []
+    for x, y in sorted(left, key=lambda t: (t[1], t[0])):
+        if (x, y) not in left:
+            continue
+        x1, y1 = x, y
+        while (x1 + 1, y) in left and bbox_area_m2(tile_range_bbox(x, y, x1 + 1, y, zoom)) <= max_area_m2:
+            x1 += 1
+        while (all((xx, y1 + 1) in left for xx in range(x, x1 + 1))
+               and bbox_area_m2(tile_range_bbox(x, y, x1, y1 + 1, zoom)) <= max_area_m2):
+            y1 += 1
+        left.difference_update((xx, yy) for xx in range(x, x1 + 1) for yy in range(y, y1 + 1))
+        chunks.append((x, y, x1, y1))
+    return chunks
+
+
+def in_bbox(lon: float, lat: float, bbox: BBox) -> bool:
+    return bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]
+
+
+def bbox_around(lon: float, lat: float, radius_m: float) -> BBox:
+    """Smallest lon/lat box containing a circle of ``radius_m`` around a point."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return (lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+
+
+def haversine_m(lon: float, lat: float, lons: Sequence[float], lats: Sequence[float]):
+    """Great-circle distances in meters from one point to many.
+
+    Vectorized with NumPy when available (returns an ndarray), otherwise a list.
+    """
+    np = _np()
+    if np is not None:
+        lon2 = np.radians(np.asarray(lons, dtype=float))
+        lat2 = np.radians(np.asarray(lats, dtype=float))
+        lat1 = math.radians(lat)
+        a = (np.sin((lat2 - lat1) / 2) ** 2
+             + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - math.radians(lon)) / 2) ** 2)
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    lat1 = math.radians(lat)
+    cos1 = math.cos(lat1)
+    out = []
+    for lo, la in zip(lons, lats):
+        la2 = math.radians(la)
+        a = (math.sin((la2 - lat1) / 2) ** 2
+             + cos1 * math.cos(la2) * math.sin((math.radians(lo) - math.radians(lon)) / 2) ** 2)
+        out.append(2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0))))
+    return out
+
+
+def haversine_pairs_m(lons1: Sequence[float], lats1: Sequence[float],
+                      lons2: Sequence[float], lats2: Sequence[float]):
+    """Great-circle distances in meters between paired points (element-wise).
+
+    Vectorized with NumPy when available (returns an ndarray), otherwise a list.
+    """
+    np = _np()
+    if np is not None:
+        lo1, la1, lo2, la2 = (np.radians(np.asarray(v, dtype=float)) for v in (lons1, lats1, lons2, lats2))
+        a = np.sin((la2 - la1) / 2) ** 2 + np.cos(la1) * np.cos(la2) * np.sin((lo2 - lo1) / 2) ** 2
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return [haversine_m(a, b, [c], [d])[0] for a, b, c, d in zip(lons1, lats1, lons2, lats2)]
+
+
+def k_nearest(distances, k: int, max_distance: float = math.inf) -> List[int]:
+    """Indices of the ``k`` smallest distances not exceeding ``max_distance``, nearest first."""
+    np = _np()
+    if np is not None and isinstance(distances, np.ndarray):
+        idx = np.flatnonzero(distances <= max_distance)
+        if len(idx) > k:
+            idx = idx[np.argpartition(distances[idx], k - 1)[:k]]
+        return [int(i) for i in idx[np.argsort(distances[idx], kind="stable")]]
+    within = ((d, i) for i, d in enumerate(distances) if d <= max_distance)
+    return [i for _, i in heapq.nsmallest(k, within)]
+
+
+def points_in_ring(lons: Sequence[float], lats: Sequence[float], ring: Sequence[Sequence[float]]):
+    """Even-odd ray-casting test of many points against one ``[lon, lat]`` ring.
+
+    Vectorized over the points with NumPy when available (returns a bool
+    ndarray), otherwise a list of bools.
+    """
+    n = len(ring)
+    np = _np()
+    if np is not None:
+        x = np.asarray(lons, dtype=float)
+        y = np.asarray(lats, dtype=float)
+        inside = np.zeros(x.shape, dtype=bool)
+        r = np.asarray(ring, dtype=float)
+        x1, y1 = r[:, 0], r[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        for a, b, c, d in zip(x1, y1, x2, y2):
+            if b == d:
+                continue
+            crosses = (b > y) != (d > y)
+            inside ^= crosses & (x < (c - a) * (y - b) / (d - b) + a)
+        return inside
+    out = []
+    for px, py in zip(lons, lats):
+        inside = False
+        for k in range(n):
+            a, b = ring[k][0], ring[k][1]
+            c, d = ring[(k + 1) % n][0], ring[(k + 1) % n][1]
+            if (b > py) != (d > py) and px < (c - a) * (py - b) / (d - b) + a:
+                inside = not inside
+        out.append(inside)
+    return out
+
+
+def points_in_polygon(lons: Sequence[float], lats: Sequence[float], rings: Sequence[Sequence[Sequence[float]]]):
+    """Points inside a GeoJSON polygon: in the outer ring and in none of its holes."""
+    np = _np()
+    inside = points_in_ring(lons, lats, rings[0])
+    for hole in rings[1:]:
+        in_hole = points_in_ring(lons, lats, hole)
+        if np is not None and isinstance(inside, np.ndarray):
+            inside = inside & ~in_hole
+        else:
+            inside = [a and not b for a, b in zip(inside, in_hole)]
+    return inside
@@ -1,37 +1,147 @@
 """OpenRouteService helper server (routing, distance, POIs)."""
-import os, requests
+import asyncio
+import os
+import requests
+from dataclasses import replace
+from typing import Optional
 from part2_implementation.mcp_base import MCPCommand
-from dotenv import load_dotenv
+from part2_implementation.settings import Settings, get_settings
+from part2_implementation.servers.cache import TTLCache
+from part2_implementation.servers.geo import (
+    bbox_around, haversine_m, in_bbox, k_nearest, points_in_polygon, tile_chunks, tile_range_bbox,
+    tiles_for_bbox,
+)
+from part2_implementation.servers.records import (
+    Isochrone, OptimizedRoute, POI, RouteComparison, RouteStep, RouteSummary,
+)
+from part2_implementation.servers.road_factor import RoadFactorModel
+from part2_implementation.servers.tour import solve as solve_tour
+from part2_implementation.servers.transport import request
+
+# ORS /pois returns at most this many features per request
+_POI_LIMIT = 2000
+# ORS /pois rejects larger request areas (50 km^2); keep a margin for the area approximation
+_POI_MAX_AREA_M2 = 45e6
+# ORS error codes for "no route between these points" / "point not routable"
+_NOT_FOUND_CODES = {2009, 2010}
+
+
+def _http_error(status: int, data) -> dict:
+    """Error dict for a failed ORS call, flagged ``transient`` or ``not_found``."""
+    err = {"error": f"ORS HTTP {status}", "detail": data}
+    detail = data.get("error") if isinstance(data, dict) else None
+    code = detail.get("code") if isinstance(detail, dict) else None
+    if status == 429 or status >= 500:
+        err["transient"] = True  # still failing after retries
+    elif status == 404 or code in _NOT_FOUND_CODES:
+        err["not_found"] = True
+    return err
 
-# Load .env from the part2_implementation folder explicitly, then any default .env
-_BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # .../part2_implementation
-load_dotenv(os.path.join(_BASE_DIR, ".env"))
-load_dotenv()
-ORS_KEY = os.getenv("ORS_API_KEY")
 
 class ORSServer:
     """
     Simulated MCPServer for OpenRouteService (routing, distance, nearby)
     """
 
+    def __init__(self, limiter=None, settings: Optional[Settings] = None):
+        # Injected settings are pinned; otherwise follow the (reloadable) global ones
+        self._settings = settings
+        cfg = self.settings
+        # Optional RateLimiter/SharedRateLimiter applied to every ORS request
+        self.limiter = limiter
+        # Nearby POIs are cached per slippy tile (zoom 15 tiles are roughly 1 km
+        # wide); the zoom is fixed for the lifetime of the cache
+        self.poi_tile_zoom = cfg.ors_poi_tile_zoom
+        # tile (x, y) -> list of POI records inside that tile
+        # Stale entries are served while a refresh runs; "no route" answers are
+        # kept for the short negative TTL and errors not at all
+        policy = dict(stale_ttl=cfg.cache_stale_ttl_s, negative_ttl=cfg.negative_cache_ttl_s)
+        self.poi_tiles = TTLCache(cfg.ors_poi_tile_ttl_s, maxsize=20000, **policy)
+        # tiles whose background refresh is in flight
+        self._tile_refreshes = set()
+        # tiles cached from a truncated /pois answer (a single tile with >= 2000 POIs)
+        self.partial_poi_tiles = set()
+        # (profile, waypoints rounded to ~1 m) -> RouteSummary or not-found error
+        self.routes = TTLCache(cfg.ors_route_ttl_s, maxsize=4096, **policy)
+        # (lon, lat, profile, range_s) -> Isochrone
+        self.isochrones = TTLCache(cfg.ors_isochrone_ttl_s, maxsize=1024, **policy)
+        # (MAP_AGENT_ROUTE_GRAPH, profile) -> memory-mapped RoadGraph or None
+        self._graphs = {}
+        # Road/great-circle ratios learned from exact routes, for approximate distances
+        self.road_factors = RoadFactorModel(cfg.road_factor_min_samples)
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings or get_settings()
+
     async def route(self, origin: list, destination: list, profile: str = "driving-car"):
         """Compute driving route and duration.
 
         Returns an error dict instead of raising if API/key issues occur.
         """
-        if not ORS_KEY:
+        return await self._directions([origin, destination], profile)
+
+    async def compare_routes(self, origin: list, destination: list, profiles: Optional[list] = None):
+        """Route one origin/destination with several profiles concurrently.
+
+        ``profiles`` defaults to ``MAP_AGENT_COMPARE_PROFILES``; each profile
+        goes through :meth:`route`, so per-profile cache hits cost nothing.
+        """
+        if not profiles:
+            profiles = [p.strip() for p in self.settings.compare_profiles.split(",") if p.strip()]
+        profiles = list(dict.fromkeys(profiles))
+        results = await asyncio.gather(*(self.route(origin, destination, p) for p in profiles))
+        return RouteComparison(origin=list(origin), destination=list(destination),
+                               routes=dict(zip(profiles, results)))
+
+    def road_graph(self, profile: str):
+        """Offline graph for ``profile`` under ``MAP_AGENT_ROUTE_GRAPH``, or None."""
+        root = self.settings.route_graph
+        if not root:
+            return None
+        key = (root, profile)
+        if key not in self._graphs:
+            from part2_implementation.servers.road_graph import RoadGraph
+
+            self._graphs[key] = RoadGraph.open(os.path.join(root, profile))
+        return self._graphs[key]
+
+    async def _directions(self, coordinates: list, profile: str = "driving-car"):
+        """Route through ``coordinates`` (two or more ``[lon, lat]`` waypoints) in order.
+
+        Answered by the offline road graph when one is configured and covers
+        the waypoints; otherwise by the ORS directions API.
+        """
+        key = self._route_key(coordinates, profile)
+        return await self.routes.fetch(key, lambda: self._compute_route(coordinates, profile))
+
+    async def _compute_route(self, coordinates: list, profile: str):
+        graph = self.road_graph(profile)
+        if graph is not None:
+            out = await asyncio.to_thread(graph.route, coordinates)
+            if out is not None:
+                return self._observe_route(coordinates, profile, out)
+
+        ors_key = self.settings.ors_api_key
+        if not ors_key:
+            if graph is not None:
+                return {"error": "Waypoints are outside the offline road graph and ORS_API_KEY is not set"}
             return {"error": "Missing ORS_API_KEY. Add it to part2_implementation/.env or environment."}
 
         url = f"https://api.openrouteservice.org/v2/directions/{profile}"
         try:
-            r = requests.post(
+            r = await request(
+                "POST",
                 url,
-                headers={"Authorization": ORS_KEY, "Content-Type": "application/json"},
-                json={"coordinates": [origin, destination]},
+                self.limiter,
+                "ors",
+                True,  # read-only lookups, safe to retry/hedge despite POST
+                headers={"Authorization": ors_key, "Content-Type": "application/json"},
+                json={"coordinates": coordinates},
                 timeout=30,
             )
         except requests.RequestException as e:
-            return {"error": "Network error contacting ORS", "detail": str(e)}
+            return {"error": "Network error contacting ORS", "detail": str(e), "transient": True}
 
         # Try to parse JSON, but be robust to non-JSON responses
         try:
@@ -40,7 +150,7 @@ class ORSServer:
             data = {"raw": r.text}
 
         if not r.ok:
-            return {"error": f"ORS HTTP {r.status_code}", "detail": data}
+            return _http_error(r.status_code, data)
 
         # ORS can return either GeoJSON-like (features[..].properties.summary)
         # or plain JSON (routes[..].summary). Support both.
@@ -64,72 +174,329 @@ class ORSServer:
             if segments:
                 cumulative_distance_m = sum(float(seg.get("distance", 0.0)) for seg in segments)
                 cumulative_duration_s = sum(float(seg.get("duration", 0.0)) for seg in segments)
-                steps_list = []
-                for seg in segments:
-                    for st in seg.get("steps", []) or []:
-                        steps_list.append({
-                            "instruction": st.get("instruction"),
-                            "name": st.get("name"),
-                            "distance_m": st.get("distance"),
-                            "duration_s": st.get("duration"),
-                            "type": st.get("type"),
-                        })
+                steps_list = [
+                    RouteStep.from_ors(st)
+                    for seg in segments
+                    for st in (seg.get("steps", []) or [])
+                ]
         except Exception:
             pass
 
+        cum_km = round(cumulative_distance_m / 1000, 2) if cumulative_distance_m is not None else None
+        cum_min = round(cumulative_duration_s / 60, 1) if cumulative_duration_s is not None else None
         try:
-            dist_km = round(float(s["distance"]) / 1000, 2)
-            dur_min = round(float(s["duration"]) / 60, 1)
-            out = {"distance_km": dist_km, "duration_min": dur_min}
-            if cumulative_distance_m is not None:
-                out["cumulative_distance_km"] = round(cumulative_distance_m / 1000, 2)
-            if cumulative_duration_s is not None:
-                out["cumulative_duration_min"] = round(cumulative_duration_s / 60, 1)
-            if steps_list is not None:
-                out["steps"] = steps_list
-            return out
+            out = RouteSummary(
+                distance_km=round(float(s["distance"]) / 1000, 2),
+                duration_min=round(float(s["duration"]) / 60, 1),
+                cumulative_distance_km=cum_km,
+                cumulative_duration_min=cum_min,
+                steps=steps_list,
+            )
         except (KeyError, TypeError, ValueError):
             # Fall back to cumulative if summary missing
-            if cumulative_distance_m is not None:
-                out = {"distance_km": round(cumulative_distance_m / 1000, 2)}
-                if cumulative_duration_s is not None:
-                    out["duration_min"] = round(cumulative_duration_s / 60, 1)
-                if steps_list is not None:
-                    out["steps"] = steps_list
-                return out
-            return {"error": "Missing distance/duration in ORS summary", "detail": s}
-
-    async def distance(self, origin: list, destination: list):
-        """Shortcut for route distance only"""
+            if cum_km is None:
+                return {"error": "Missing distance/duration in ORS summary", "detail": s}
+            out = RouteSummary(distance_km=cum_km, duration_min=cum_min, steps=steps_list)
+        return self._observe_route(coordinates, profile, out)
+
+    @staticmethod
+    def _route_key(coordinates: list, profile: str) -> tuple:
+        # (profile, waypoints rounded to ~1 m)
+        return (profile, tuple((round(float(c[0]), 5), round(float(c[1]), 5)) for c in coordinates))
+
+    def _observe_route(self, coordinates: list, profile: str, out: RouteSummary) -> RouteSummary:
+        if len(coordinates) == 2 and profile == "driving-car":
+            self.road_factors.observe(coordinates[0], coordinates[1], out.distance_km)
+        return out
+
+    async def distance(self, origin: list, destination: list, exact: bool = False):
+        """Shortcut for route distance only.
+
+        Unless ``exact`` is requested (or ``MAP_AGENT_DISTANCE_MODE=exact``),
+        the distance may be estimated locally from the great-circle distance
+        and the learned road factor, flagged ``approximate`` with a
+        ``distance_range_km``: always in ``approximate`` mode, and in ``auto``
+        mode once the region is calibrated and no offline graph is set. An
+        already cached route is always used as is. If ORS cannot be reached
+        (network error or open circuit breaker) the result degrades to an
+        estimate as well.
+        """
+        cached = self.routes.peek(self._route_key([origin, destination], "driving-car"))
+        if cached is not None and isinstance(cached[0], RouteSummary):
+            cached = cached[0]
+            return RouteSummary(distance_km=cached.distance_km, approximate=cached.approximate)
+        mode = self.settings.distance_mode
+        if not exact and mode != "exact" and (mode == "approximate" or (
+                self.road_graph("driving-car") is None and self.road_factors.calibrated(origin, destination))):
+            return self.estimate_distance(origin, destination)
         result = await self.route(origin, destination)
         # Pass through errors or unexpected formats gracefully
         try:
-            if isinstance(result, dict) and "distance_km" in result:
-                return {"distance_km": result["distance_km"]}
+            if isinstance(result, RouteSummary):
+                return RouteSummary(distance_km=result.distance_km)
+            if isinstance(result, dict) and result.get("transient"):
+                return self.estimate_distance(origin, destination)
             return result
         except Exception:
             return {"error": "Unexpected distance computation error", "detail": result}
 
-    async def nearby(self, lat: float, lon: float):
-        """Find nearby POIs within small bbox"""
-        url = "https://api.openrouteservice.org/pois"
+    def estimate_distance(self, origin: list, destination: list) -> RouteSummary:
+        """Great-circle distance times the calibrated road detour factor, with a ~90% range."""
+        return self.road_factors.estimate(origin, destination)
+
+    def estimate_distances(self, origins: list, destinations: list) -> list:
+        """:meth:`estimate_distance` for many origin/destination pairs in one vectorized pass."""
+        return self.road_factors.estimate_many(origins, destinations)
+
+    async def matrix(self, locations: list, profile: str = "driving-car"):
+        """All-pairs distance (m) and duration (s) matrices for ``[lon, lat]`` locations."""
+        ors_key = self.settings.ors_api_key
+        if not ors_key:
+            return {"error": "Missing ORS_API_KEY. Add it to part2_implementation/.env or environment."}
+        try:
+            r = await request(
+                "POST",
+                f"https://api.openrouteservice.org/v2/matrix/{profile}",
+                self.limiter,
+                "ors",
+                True,  # read-only lookups, safe to retry/hedge despite POST
+                headers={"Authorization": ors_key, "Content-Type": "application/json"},
+                json={"locations": locations, "metrics": ["distance", "duration"]},
+                timeout=30,
+            )
+        except requests.RequestException as e:
+            return {"error": "Network error contacting ORS", "detail": str(e), "transient": True}
+        try:
+            data = r.json()
+        except ValueError:
+            data = {"raw": r.text}
+        if not r.ok:
+            return {"error": f"ORS HTTP {r.status_code}", "detail": data}
+        if "distances" not in data or "durations" not in data:
+            return {"error": "Unexpected ORS matrix response format", "detail": data}
+        return data
+
+    async def optimize(self, stops: list, profile: str = "driving-car", roundtrip: bool = False,
+                       metric: str = "duration", time_budget_s: float = 1.0):
+        """Order ``stops`` (first one is the start) to minimize travel, then route through them.
+
+        Uses one ORS matrix request, solves the visiting order locally and
+        issues a single multi-waypoint directions request.
+        """
+        if len(stops) < 2:
+            return {"error": "Need at least two stops"}
+        # ORS directions accept at most 50 waypoints (a roundtrip repeats the start)
+        if len(stops) > (49 if roundtrip else 50):
+            return {"error": "Too many stops for one directions request (max 50, 49 for roundtrips)"}
+        m = await self.matrix(stops, profile)
+        if "error" in m:
+            return m
+        costs = m["durations" if metric == "duration" else "distances"]
+        # Unreachable pairs come back as null; make them prohibitively expensive
+        costs = [[float("inf") if c is None else float(c) for c in row] for row in costs]
+        order = await asyncio.to_thread(solve_tour, costs, 0, roundtrip, time_budget_s)
+        ordered = [list(stops[i]) for i in order]
+        route = await self._directions(ordered + ([ordered[0]] if roundtrip else []), profile)
+        if not isinstance(route, RouteSummary):
+            return route
+        return OptimizedRoute(order=order, stops=ordered, route=route, roundtrip=roundtrip)
+
+    async def isochrone(self, lon: float, lat: float, minutes: float, profile: str = "driving-car"):
+        """Area reachable within ``minutes`` from a point (cached per snapped center)."""
+        ors_key = self.settings.ors_api_key
+        if not ors_key:
+            return {"error": "Missing ORS_API_KEY. Add it to part2_implementation/.env or environment."}
+        # Snap the center (3 decimals ~ 100 m by default) so nearby origins share polygons
+        decimals = self.settings.ors_isochrone_decimals
+        lon = round(float(lon), decimals)
+        lat = round(float(lat), decimals)
+        range_s = int(round(float(minutes) * 60))
+        key = (lon, lat, profile, range_s)
+        return await self.isochrones.fetch(key, lambda: self._isochrone(lon, lat, profile, range_s, ors_key))
+
+    async def _isochrone(self, lon: float, lat: float, profile: str, range_s: int, ors_key: str):
+        try:
+            r = await request(
+                "POST",
+                f"https://api.openrouteservice.org/v2/isochrones/{profile}",
+                self.limiter,
+                "ors",
+                True,  # read-only lookups, safe to retry/hedge despite POST
+                headers={"Authorization": ors_key, "Content-Type": "application/json"},
+                json={"locations": [[lon, lat]], "range": [range_s], "range_type": "time"},
+                timeout=30,
+            )
+        except requests.RequestException as e:
+            return {"error": "Network error contacting ORS", "detail": str(e), "transient": True}
+        try:
+            data = r.json()
+        except ValueError:
+            data = {"raw": r.text}
+        if not r.ok:
+            return _http_error(r.status_code, data)
+
+        polygons = []
+        for f in data.get("features") or []:
+            geom = f.get("geometry") or {}
+            if geom.get("type") == "Polygon":
+                polygons.append(geom["coordinates"])
+            elif geom.get("type") == "MultiPolygon":
+                polygons.extend(geom["coordinates"])
+        if not polygons:
+            return {"error": "Unexpected ORS isochrone response format", "detail": data}
+        return Isochrone(center=(lon, lat), profile=profile, range_s=range_s, polygons=polygons)
+
+    @staticmethod
+    def within(iso: Isochrone, pois: list) -> list:
+        """POIs lying inside ``iso``, tested in one vectorized pass per polygon."""
+        if not pois:
+            return []
+        lons = [p.lon for p in pois]
+        lats = [p.lat for p in pois]
+        keep = [False] * len(pois)
+        for rings in iso.polygons:
+            for i, hit in enumerate(points_in_polygon(lons, lats, rings)):
+                keep[i] = keep[i] or bool(hit)
+        return [p for p, k in zip(pois, keep) if k]
+
+    async def _fetch_poi_tiles(self, tiles) -> Optional[dict]:
+        """Download POIs for ``tiles`` and cache them per tile.
+
+        The tiles are grouped into rectangles of missing tiles only, each
+        within the ORS /pois area limit, with one request per rectangle.
+        Returns the error dict of the first failed rectangle, else None; the
+        others are still cached.
+        """
+        chunks = tile_chunks(tiles, self.poi_tile_zoom, _POI_MAX_AREA_M2)
+        errors = await asyncio.gather(*(self._fetch_poi_chunk(*c) for c in chunks))
+        return next((e for e in errors if e is not None), None)
+
+    async def _fetch_poi_chunk(self, x0: int, y0: int, x1: int, y1: int) -> Optional[dict]:
+        west, south, east, north = tile_range_bbox(x0, y0, x1, y1, self.poi_tile_zoom)
         body = {
             "request": "pois",
-            "geometry": {
-                "bbox": [[lon - 0.01, lat - 0.01], [lon + 0.01, lat + 0.01]]
-            }
+            "geometry": {"bbox": [[west, south], [east, north]]},
+            "limit": _POI_LIMIT,
         }
-        r = requests.post(
-            url,
-            headers={"Authorization": ORS_KEY, "Content-Type": "application/json"},
+        r = await request(
+            "POST",
+            "https://api.openrouteservice.org/pois",
+            self.limiter,
+            "ors",
+            True,
+            headers={"Authorization": self.settings.ors_api_key, "Content-Type": "application/json"},
             json=body,
+            timeout=30,
         )
-        return r.json()
+        try:
+            data = r.json()
+        except ValueError:
+            data = {"raw": r.text}
+        if not r.ok:
+            return _http_error(r.status_code, data)
+        features = (data.get("features") if isinstance(data, dict) else None) or []
+        single = x0 == x1 and y0 == y1
+        if len(features) >= _POI_LIMIT and not single:
+            # Truncated: a partial answer cannot be split into complete tiles, so halve the rectangle
+            if x1 - x0 >= y1 - y0:
+                xm = (x0 + x1) // 2
+                halves = ((x0, y0, xm, y1), (xm + 1, y0, x1, y1))
+            else:
+                ym = (y0 + y1) // 2
+                halves = ((x0, y0, x1, ym), (x0, ym + 1, x1, y1))
+            errors = await asyncio.gather(*(self._fetch_poi_chunk(*h) for h in halves))
+            return next((e for e in errors if e is not None), None)
+
+        buckets = {(x, y): [] for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)}
+        for f in features:
+            try:
+                poi = POI.from_ors_feature(f)
+            except (KeyError, TypeError, ValueError):
+                continue
+            tile = next(tiles_for_bbox((poi.lon, poi.lat, poi.lon, poi.lat), self.poi_tile_zoom))
+            if tile in buckets:
+                buckets[tile].append(poi)
+        for tile, pois in buckets.items():
+            self.poi_tiles.set(tile, pois)
+        if single and len(features) >= _POI_LIMIT:
+            # A dense tile cannot be split further: keep the first 2000 POIs, marked partial
+            self.partial_poi_tiles.add((x0, y0))
+        else:
+            self.partial_poi_tiles.difference_update(buckets)
+        return None
+
+    def _refresh_poi_tiles(self, tiles) -> None:
+        """Re-download stale ``tiles`` in the background; they keep being served meanwhile."""
+        tiles = [t for t in tiles if t not in self._tile_refreshes]
+        if not tiles:
+            return
+        self._tile_refreshes.update(tiles)
+
+        async def run():
+            try:
+                await self._fetch_poi_tiles(tiles)
+            except (requests.RequestException, ValueError):
+                pass  # keep serving the stale tiles
+            finally:
+                self._tile_refreshes.difference_update(tiles)
+
+        asyncio.ensure_future(run())
+
+    async def nearby(self, lat: float, lon: float, radius_m: float = 1000, k: int = 10,
+                     category: str = None):
+        """Find the ``k`` POIs closest to a coordinate within ``radius_m`` meters.
+
+        POIs come from a per-tile cache; distances are great-circle meters and
+        ``category`` (e.g. "pharmacy") filters on the ORS category name/group.
+        ``radius_m`` is clamped to 1..5000. ORS /pois accepts at most 50 km^2
+        per request (about a 3.5 km radius), so missing tiles of larger
+        searches are fetched in several requests. A tile with more than 2000
+        POIs keeps the first 2000 and is listed in ``partial_poi_tiles``.
+        """
+        ors_key = self.settings.ors_api_key
+        if not ors_key:
+            return {"error": "Missing ORS_API_KEY. Add it to part2_implementation/.env or environment."}
+
+        radius_m = min(max(float(radius_m), 1.0), 5000.0)
+        k = min(max(int(k), 1), 50)
+        bbox = bbox_around(lon, lat, radius_m)
+        tiles = list(tiles_for_bbox(bbox, self.poi_tile_zoom))
+        found = {t: self.poi_tiles.peek(t) for t in tiles}
+        missing = [t for t, hit in found.items() if hit is None]
+        stale = [t for t, hit in found.items() if hit is not None and not hit[1]]
+        if stale:
+            self._refresh_poi_tiles(stale)
+        if missing:
+            try:
+                err = await self._fetch_poi_tiles(missing)
+            except requests.RequestException as e:
+                return {"error": "Network error contacting ORS", "detail": str(e), "transient": True}
+            if err is not None:
+                return err
+
+        want = (category or "").strip().lower()
+        candidates = []
+        for t in tiles:
+            hit = found[t] or self.poi_tiles.peek(t)
+            for poi in (hit[0] if hit else None) or []:
+                if want and want not in (poi.kind or "").lower() and want not in (poi.category or "").lower():
+                    continue
+                if in_bbox(poi.lon, poi.lat, bbox):
+                    candidates.append(poi)
+        if not candidates:
+            return []
+
+        dists = haversine_m(lon, lat, [p.lon for p in candidates], [p.lat for p in candidates])
+        # Copy records so the cached tile entries stay distance-free
+        return [replace(candidates[i], distance_m=float(dists[i])) for i in k_nearest(dists, k, radius_m)]
 
     @property
     def server_params(self):
         return [
             MCPCommand("route", ["origin", "destination", "profile"], "Route with summary"),
-            MCPCommand("distance", ["origin", "destination"], "Distance only"),
-            MCPCommand("nearby", ["lat", "lon"], "Nearby POIs"),
+            MCPCommand("distance", ["origin", "destination", "exact"], "Distance only (estimated unless exact)"),
+            MCPCommand("compare_routes", ["origin", "destination", "profiles"], "Same trip by several profiles"),
+            MCPCommand("optimize", ["stops", "profile", "roundtrip"], "Optimized multi-stop route"),
+            MCPCommand("isochrone", ["lon", "lat", "minutes", "profile"], "Area reachable within a time budget"),
+            MCPCommand("nearby", ["lat", "lon", "radius_m", "k", "category"], "Nearest POIs within a radius"),
         ]
@@ -1,30 +1,171 @@
 """OpenStreetMap helper server (geocode, reverse, POI)."""
-import os
+import asyncio
+from dataclasses import replace
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
 import requests
 from part2_implementation.mcp_base import MCPCommand
+from part2_implementation.servers.autocomplete import PlaceIndex
+from part2_implementation.servers.cache import TTLCache
+from part2_implementation.servers.place_names import PlaceNames, normalize_place
+from part2_implementation.servers.records import GeocodeHit, POI
+from part2_implementation.servers.transport import RateLimiter, request
+from part2_implementation.settings import Settings, get_settings, on_reload
+
+# Query words that map onto a Nominatim structured ``amenity=`` search.
+_AMENITIES = {
+    "hospital", "clinic", "doctors", "pharmacy", "dentist", "restaurant", "cafe",
+    "fast_food", "bar", "pub", "bank", "atm", "fuel", "parking", "school",
+    "university", "library", "police", "fire_station", "post_office", "cinema",
+}
+_HEALTHCARE_TYPES = ("hospital", "clinic", "doctors", "health_centre")
+
+
+def _amenity_for(query: str) -> Optional[str]:
+    """Map a free-text POI query (e.g. "Pharmacies") to an OSM amenity value."""
+    q = (query or "").strip().lower().replace(" ", "_")
+    for cand in (q, q[:-3] + "y" if q.endswith("ies") else q, q[:-1] if q.endswith("s") else q):
+        if cand in _AMENITIES:
+            return cand
+    return None
+
+
+def _clamp_count(max_count) -> int:
+    try:
+        n = int(max_count)
+    except Exception:
+        n = 5
+    return 1 if n <= 0 else (20 if n > 20 else n)
+
+
+def _poi_results(r, query: str, city: str):
+    """Items of a Nominatim ``/search`` response, or an error dict like :meth:`OSMServer._geocode` returns."""
+    if not r.ok:
+        text = None
+        try:
+            text = r.text
+        except Exception:
+            pass
+        err = {"error": f"Nominatim HTTP {r.status_code}", "detail": text, "query": query, "city": city}
+        if r.status_code == 429 or r.status_code >= 500:
+            err["transient"] = True
+        return err
+    data = r.json()
+    if data and not isinstance(data, list):
+        return {"error": "Unexpected Nominatim response format", "detail": data, "query": query, "city": city}
+    return data or []
+
 
 class OSMServer:
     """
     Simulated MCPServer for OpenStreetMap (geocoding, reverse, POI search)
     """
 
+    def __init__(self, limiter: Optional[RateLimiter] = None, settings: Optional[Settings] = None):
+        # Injected settings are pinned; otherwise follow the (reloadable) global ones
+        self._settings = settings
+        cfg = self.settings
+        # One limiter per server instance: every Nominatim call shares the budget
+        # (Nominatim's public usage policy allows at most one request per second)
+        self.limiter = limiter or RateLimiter(cfg.osm_min_interval_s)
+        if limiter is None and settings is None:
+            # Follow OSM_MIN_INTERVAL_S across reloads (an injected limiter is the caller's to pace)
+            own = self.limiter
+            on_reload(lambda new: setattr(own, "min_interval", max(0.0, new.osm_min_interval_s)))
+        # Answers (and, briefly, "no results") per normalized request; errors are never cached
+        policy = dict(stale_ttl=cfg.cache_stale_ttl_s, negative_ttl=cfg.negative_cache_ttl_s)
+        # PlaceNames.key(place) -> GeocodeHit or not-found error
+        self.place_names = PlaceNames()
+        self.geocodes = TTLCache(cfg.osm_cache_ttl_s, maxsize=8192, **policy)
+        # Plain strip().lower() keys seen recently, to measure what normalization adds
+        self._raw_keys = TTLCache(cfg.osm_cache_ttl_s, maxsize=8192)
+        self.geocode_stats = {"lookups": 0, "hits": 0, "raw_hits": 0}
+        # Typeahead index fed by every successful geocode
+        self.suggestions = PlaceIndex()
+        # (extract path, load task) once MAP_AGENT_AUTOCOMPLETE_EXTRACT is read
+        self._extract = None
+        # (lat, lon) rounded to ~1 m -> {"address": ...}
+        self.reverses = TTLCache(cfg.osm_cache_ttl_s, maxsize=8192, **policy)
+        # (query, city, count, countrycodes) -> list of POI records
+        self.pois = TTLCache(cfg.osm_cache_ttl_s, maxsize=2048, **policy)
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings or get_settings()
+
     async def geocode(self, place: str):
-        """Get coordinates from a place name (robust to network errors)."""
+        """Get coordinates from a place name (robust to network errors).
+
+        Served from ``geocodes`` under the normalized name (see
+        :mod:`place_names`); a place with no match is remembered for
+        ``MAP_AGENT_NEGATIVE_TTL_S``.
+        """
+        countrycodes = self.settings.osm_countrycodes
+        key = self.place_key(place)
+        raw = ((place or "").strip().lower(), countrycodes)
+        self.geocode_stats["lookups"] += 1
+        if key in self.geocodes:
+            self.geocode_stats["hits"] += 1
+            # Would the old strip().lower() key have hit as well?
+            self.geocode_stats["raw_hits"] += raw in self._raw_keys
+        self._raw_keys.set(raw, True)
+        res = await self.geocodes.fetch(key, lambda: self._geocode(place))
+        if isinstance(res, GeocodeHit):
+            self._suggest(place, res)
+            if res.place != place:
+                res = replace(res, place=place)  # echo this caller's spelling
+        return res
+
+    def _suggest(self, place: str, hit: GeocodeHit) -> None:
+        # One popularity point per lookup; the query (minus ", country") is indexed next to the OSM name
+        # when it names the place itself, not e.g. "Paris, Texas" or "hospitals in beirut"
+        name = (hit.display or place).split(",")[0].strip()
+        same = self.place_key(place)[0] == self.place_names.canonical(normalize_place(name))
+        self.suggestions.add(hit.osm_id or (round(hit.lat, 4), round(hit.lon, 4)), name, hit.lat, hit.lon,
+                             display=hit.display, aliases=(place.split(",")[0],) if same else ())
+
+    async def autocomplete(self, prefix: str, k: int = 5):
+        """Up to ``k`` known places whose name starts with ``prefix``, most looked-up first.
+
+        Draws on places geocoded so far plus, once loaded, the extract in
+        ``MAP_AGENT_AUTOCOMPLETE_EXTRACT``; never calls Nominatim.
+        """
+        path = self.settings.autocomplete_extract
+        if path and (self._extract is None or self._extract[0] != path):
+            self._extract = (path, asyncio.ensure_future(asyncio.to_thread(self.suggestions.load_extract, path)))
+        if self._extract is not None:
+            extract = self._extract
+            try:
+                await asyncio.shield(extract[1])
+            except (OSError, SyntaxError) as e:  # ParseError is a SyntaxError
+                # Forget the failed load so the next request tries again (e.g. once the file exists)
+                if self._extract is extract:
+                    self._extract = None
+                return {"error": "Could not read autocomplete extract", "detail": str(e), "path": path}
+        return self.suggestions.complete(prefix, k)
+
+    def place_key(self, place: str) -> tuple:
+        """Cache key for ``place``: normalized name, country and country bias."""
+        return self.place_names.key(place, self.settings.osm_countrycodes)
+
+    async def _geocode(self, place: str):
         url = "https://nominatim.openstreetmap.org/search"
         # Ask only for one result; allow optional country bias; keep request lean
-        params = {"q": place, "format": "json", "limit": 1, "addressdetails": 0}
-        countrycodes = os.getenv("OSM_COUNTRYCODES")
-        if countrycodes:
-            params["countrycodes"] = countrycodes
+        cfg = self.settings
+        # namedetails feeds the alias table (local/other-language names of the hit)
+        params = {"q": place, "format": "json", "limit": 1, "addressdetails": 0, "namedetails": 1}
+        if cfg.osm_countrycodes:
+            params["countrycodes"] = cfg.osm_countrycodes
 
-        # Allow overriding UA via env (Nominatim requires a meaningful UA)
-        ua = os.getenv("OSM_USER_AGENT", "C5-MapAgent (educational)")
-        headers = {"User-Agent": ua}
+        # UA is configurable (OSM_USER_AGENT); Nominatim requires a meaningful one
+        headers = {"User-Agent": cfg.osm_user_agent}
 
         try:
-            r = requests.get(url, params=params, headers=headers, timeout=30)
+            r = await request("GET", url, self.limiter, "nominatim", True,
+                              params=params, headers=headers, timeout=30)
         except requests.RequestException as e:
-            return {"error": "Network error contacting Nominatim", "detail": str(e), "place": place}
+            return {"error": "Network error contacting Nominatim", "detail": str(e), "place": place,
+                    "transient": True}
 
         if not r.ok:
             # Surface HTTP error body when possible
@@ -33,7 +174,10 @@ class OSMServer:
                 text = r.text
             except Exception:
                 pass
-            return {"error": f"Nominatim HTTP {r.status_code}", "detail": text, "place": place}
+            err = {"error": f"Nominatim HTTP {r.status_code}", "detail": text, "place": place}
+            if r.status_code == 429 or r.status_code >= 500:
+                err["transient"] = True
+            return err
 
         try:
             data = r.json()
@@ -41,62 +185,81 @@ class OSMServer:
             return {"error": "Nominatim returned non-JSON response", "place": place}
 
         if not data:
-            return {"error": f"No results for {place}"}
+            return {"error": f"No results for {place}", "not_found": True}
 
-        d = data[0]
-        return {
-            "place": place,
-            "lat": d.get("lat"),
-            "lon": d.get("lon"),
-            "display": d.get("display_name"),
-        }
+        try:
+            hit = GeocodeHit.from_nominatim(place, data[0])
+        except (KeyError, TypeError, ValueError):
+            return {"error": "Nominatim result missing coordinates", "place": place}
+        self.place_names.learn(self.place_key(place)[0], data[0])
+        return hit
 
     async def reverse(self, lat: float, lon: float):
-        """Get address from coordinates"""
+        """Get address from coordinates (cached per ~1 m)."""
+        key = (round(float(lat), 5), round(float(lon), 5))
+        return await self.reverses.fetch(key, lambda: self._reverse(lat, lon))
+
+    async def _reverse(self, lat: float, lon: float):
         url = "https://nominatim.openstreetmap.org/reverse"
-        r = requests.get(url, params={"lat": lat, "lon": lon, "format": "json"},
-                         headers={"User-Agent": "C5-MapAgent"})
-        return {"address": r.json().get("display_name", "Unknown")}
+        try:
+            r = await request("GET", url, self.limiter, "nominatim", True,
+                              params={"lat": lat, "lon": lon, "format": "json"},
+                              headers={"User-Agent": self.settings.osm_user_agent}, timeout=30)
+        except requests.RequestException as e:
+            return {"error": "Network error contacting Nominatim", "detail": str(e), "transient": True}
+        if not r.ok:
+            return {"error": f"Nominatim HTTP {r.status_code}",
+                    "transient": r.status_code == 429 or r.status_code >= 500}
+        try:
+            data = r.json()
+        except ValueError:
+            return {"error": "Nominatim returned non-JSON response"}
+        if data.get("error"):
+            # e.g. "Unable to geocode" for points at sea
+            return {"error": data["error"], "not_found": True}
+        return {"address": data.get("display_name", "Unknown")}
 
-    async def search_poi(self, query: str, city: str, max_count: int = 5):
-        """Find POIs by keyword + city.
+    async def _fetch_pois(self, query: str, city: str, limit: int):
+        """Raw Nominatim items for ``query`` in ``city``, or an error dict.
 
-        Uses Nominatim text search but filters results to relevant healthcare
-        features (e.g., hospitals/clinics) when the query suggests it.
+        Queries that name a known amenity use a structured ``amenity=`` search so
+        Nominatim does the category filtering; anything else is a free-text search.
         """
         url = "https://nominatim.openstreetmap.org/search"
-        params = {"q": f"{query}, {city}", "format": "json"}
-        countrycodes = os.getenv("OSM_COUNTRYCODES")
-        if countrycodes:
-            params["countrycodes"] = countrycodes
-        r = requests.get(
-            url,
-            params=params,
-            headers={"User-Agent": "C5-MapAgent"},
-        )
-
-        try:
-            n = int(max_count)
-        except Exception:
-            n = 5
-        n = 1 if n <= 0 else (20 if n > 20 else n)
+        amenity = _amenity_for(query)
+        # Over-fetch a little so local ranking/dedupe still fills ``limit``
+        if amenity:
+            params = {"amenity": amenity, "city": city, "format": "json", "limit": min(40, 2 * limit)}
+        else:
+            params = {"q": f"{query}, {city}", "format": "json", "limit": min(40, max(10, 2 * limit))}
+        cfg = self.settings
+        if cfg.osm_countrycodes:
+            params["countrycodes"] = cfg.osm_countrycodes
+        headers = {"User-Agent": cfg.osm_user_agent}
+        r = await request("GET", url, self.limiter, "nominatim", True,
+                          params=params, headers=headers, timeout=30)
+        results = _poi_results(r, query, city)
+        if amenity and results == []:
+            # Structured search can miss places tagged differently; retry as text
+            params.pop("amenity")
+            params.pop("city")
+            params["q"] = f"{query}, {city}"
+            r = await request("GET", url, self.limiter, "nominatim", True,
+                              params=params, headers=headers, timeout=30)
+            results = _poi_results(r, query, city)
+        return results
 
-        results = r.json() or []
-
-        # Heuristic filtering: when user asks for hospitals/clinics, prefer
-        # OSM objects tagged as amenity/healthcare with hospital/clinic types.
+    @staticmethod
+    def _rank(query: str, results: List[dict]) -> List[dict]:
+        """Order Nominatim items by category match, then Nominatim importance."""
         q_lower = (query or "").lower()
+        amenity = _amenity_for(query)
         wants_hospitals = any(k in q_lower for k in ("hospital", "hospitals", "clinic", "clinics"))
 
         def is_healthcare(x: dict) -> bool:
             cls = x.get("class") or ""
             typ = x.get("type") or ""
-            if cls in ("amenity", "healthcare") and typ in (
-                "hospital",
-                "clinic",
-                "doctors",
-                "health_centre",
-            ):
+            if cls in ("amenity", "healthcare") and typ in _HEALTHCARE_TYPES:
                 return True
             # Fallback: detect common words in name/display (English/Arabic)
             name = (x.get("display_name") or "").lower()
@@ -104,21 +267,103 @@ class OSMServer:
                 return True
             return False
 
+        def score(x: dict) -> Tuple[int, float]:
+            match = (amenity is not None and x.get("type") == amenity) or (wants_hospitals and is_healthcare(x))
+            try:
+                importance = float(x.get("importance") or 0.0)
+            except (TypeError, ValueError):
+                importance = 0.0
+            return (1 if match else 0, importance)
+
         filtered = results
         if wants_hospitals:
             filtered = [x for x in results if is_healthcare(x)] or results
+        return sorted(filtered, key=score, reverse=True)
 
-        # Truncate to requested count and normalize fields
-        out = [
-            {"name": x.get("display_name"), "lat": x.get("lat"), "lon": x.get("lon")}
-            for x in filtered[:n]
-        ]
+    @staticmethod
+    def _to_pois(items: Iterable[dict]) -> List[POI]:
+        out = []
+        for x in items:
+            try:
+                out.append(POI.from_nominatim(x))
+            except (KeyError, TypeError, ValueError):
+                continue
         return out
 
+    async def search_poi(self, query: str, city: str, max_count: int = 5):
+        """Find POIs by keyword + city.
+
+        Uses Nominatim search (structured ``amenity=`` when the query names a
+        known amenity) and prefers relevant healthcare features (e.g.,
+        hospitals/clinics) when the query suggests it. Results are cached per
+        query/city; empty results only for ``MAP_AGENT_NEGATIVE_TTL_S``.
+        """
+        n = _clamp_count(max_count)
+        key = ((query or "").strip().lower(), normalize_place(city), n, self.settings.osm_countrycodes)
+        return await self.pois.fetch(key, lambda: self._search_poi(query, city, n))
+
+    async def _search_poi(self, query: str, city: str, n: int):
+        try:
+            results = await self._fetch_pois(query, city, n)
+        except (requests.RequestException, ValueError) as e:
+            return {"error": "Nominatim POI search failed", "detail": str(e), "query": query, "city": city,
+                    "transient": True}
+        if isinstance(results, dict):
+            return results
+        # Truncate to requested count and parse into typed records
+        return self._to_pois(self._rank(query, results)[:n])
+
+    async def search_poi_batch(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        max_count: int = 5,
+        concurrency: int = 4,
+    ) -> AsyncIterator[Tuple[str, str, object]]:
+        """Search many ``(query, city)`` pairs concurrently, streaming results.
+
+        Yields ``(query, city, pois)`` as each pair completes. POIs are ranked
+        per pair and deduplicated by OSM id across the whole batch, so a place
+        matched by overlapping queries is only reported once. Failed pairs
+        yield an error dict instead of a list. Request starts are still spaced
+        by the server's rate limiter.
+        """
+        n = _clamp_count(max_count)
+        sem = asyncio.Semaphore(max(1, int(concurrency)))
+        seen: set = set()
+
+        async def one(query: str, city: str):
+            async with sem:
+                try:
+                    return query, city, await self._fetch_pois(query, city, n)
+                except (requests.RequestException, ValueError) as e:
+                    return query, city, {"error": "Nominatim POI search failed", "detail": str(e)}
+
+        tasks = [asyncio.ensure_future(one(q, c)) for q, c in dict.fromkeys(pairs)]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                query, city, results = await fut
+                if isinstance(results, dict):
+                    yield query, city, results
+                    continue
+                fresh: List[POI] = []
+                for poi in self._to_pois(self._rank(query, results)):
+                    key = poi.osm_id or (round(poi.lat, 6), round(poi.lon, 6))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    fresh.append(poi)
+                    if len(fresh) >= n:
+                        break
+                yield query, city, fresh
+        finally:
+            for t in tasks:
+                t.cancel()
+
     @property
     def server_params(self):
         return [
             MCPCommand("geocode", ["place"], "Geocode a place name"),
             MCPCommand("reverse", ["lat", "lon"], "Reverse geocode coordinates"),
             MCPCommand("search_poi", ["query", "city"], "Search POIs in a city"),
+            MCPCommand("search_poi_batch", ["pairs", "max_count"], "Search POIs for many query/city pairs"),
         ]
@@ -0,0 +1,155 @@
+"""Canonical place-name keys for geocode caches.
+
+:func:`normalize_place` folds the spellings people type for one place onto
+one string: Unicode NFKC, case folding, Latin diacritics ("Bayrūt" ->
+"bayrut"), Arabic hamza/alef/taa-marbuta variants and harakat, punctuation
+and whitespace. :class:`PlaceNames` adds a trailing country ("Beirut,
+Lebanon", "beirut lebanon") as a separate key part, and an alias table
+learned from Nominatim ``namedetails``/``display_name``, so "بيروت" or
+"Beyrouth" reuse the entry of an earlier "Beirut".
+"""
+import re
+import unicodedata
+from typing import Any, Dict, Optional, Set, Tuple
+
+# Letters NFKD does not decompose into base + mark
+_LATIN_FOLD = str.maketrans({
+    "ø": "o", "ł": "l", "đ": "d", "ð": "d", "ħ": "h", "ı": "i", "ŀ": "l",
+    "æ": "ae", "œ": "oe", "þ": "th", "ß": "ss",
+})
+_ARABIC_FOLD = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+    "ـ": None,  # tatweel
+})
+# Apostrophes join ("l'Aquila" -> "laquila"); other punctuation separates words
+_APOSTROPHES = re.compile(r"['’ʼʻ`]")
+_SEPARATORS = re.compile(r"[\W_]+")
+
+# Country names (English, French and local spellings, already normalized) -> ISO 3166 alpha-2
+COUNTRIES: Dict[str, str] = {
+    "afghanistan": "af", "albania": "al", "algeria": "dz", "الجزاير": "dz", "andorra": "ad",
+    "angola": "ao", "argentina": "ar", "armenia": "am", "australia": "au", "austria": "at",
+    "osterreich": "at", "azerbaijan": "az", "bahrain": "bh", "البحرين": "bh", "bangladesh": "bd",
+    "belarus": "by", "belgium": "be", "belgique": "be", "belgie": "be", "bolivia": "bo",
+    "bosnia and herzegovina": "ba", "brazil": "br", "brasil": "br", "bulgaria": "bg",
+    "cambodia": "kh", "cameroon": "cm", "canada": "ca", "chile": "cl", "china": "cn",
+    "colombia": "co", "croatia": "hr", "hrvatska": "hr", "cuba": "cu", "cyprus": "cy",
+    "czech republic": "cz", "czechia": "cz", "denmark": "dk", "danmark": "dk",
+    "dominican republic": "do", "ecuador": "ec", "egypt": "eg", "مصر": "eg", "estonia": "ee",
+    "ethiopia": "et", "finland": "fi", "suomi": "fi", "france": "fr", "georgia": "ge",
+    "germany": "de", "deutschland": "de", "allemagne": "de", "ghana": "gh", "greece": "gr",
+    "hellas": "gr", "guatemala": "gt", "hungary": "hu", "magyarorszag": "hu", "iceland": "is",
+    "india": "in", "indonesia": "id", "iran": "ir", "ايران": "ir", "iraq": "iq", "العراق": "iq",
+    "ireland": "ie", "israel": "il", "italy": "it", "italia": "it", "italie": "it",
+    "ivory coast": "ci", "cote d ivoire": "ci", "jamaica": "jm", "japan": "jp", "jordan": "jo",
+    "الاردن": "jo", "jordanie": "jo", "kazakhstan": "kz", "kenya": "ke", "kosovo": "xk",
+    "kuwait": "kw", "الكويت": "kw", "kyrgyzstan": "kg", "latvia": "lv", "lebanon": "lb",
+    "liban": "lb", "lubnan": "lb", "لبنان": "lb", "libya": "ly", "ليبيا": "ly", "libye": "ly",
+    "lithuania": "lt", "luxembourg": "lu", "malaysia": "my", "malta": "mt", "mexico": "mx",
+    "moldova": "md", "monaco": "mc", "mongolia": "mn", "montenegro": "me", "morocco": "ma",
+    "maroc": "ma", "المغرب": "ma", "nepal": "np", "netherlands": "nl", "the netherlands": "nl",
+    "nederland": "nl", "new zealand": "nz", "nigeria": "ng", "north macedonia": "mk",
+    "norway": "no", "norge": "no", "oman": "om", "عمان": "om", "pakistan": "pk",
+    "palestine": "ps", "فلسطين": "ps", "panama": "pa", "paraguay": "py", "peru": "pe",
+    "philippines": "ph", "poland": "pl", "polska": "pl", "portugal": "pt", "qatar": "qa",
+    "قطر": "qa", "romania": "ro", "russia": "ru", "rossiya": "ru", "россия": "ru",
+    "saudi arabia": "sa", "السعوديه": "sa", "senegal": "sn", "serbia": "rs", "srbija": "rs",
+    "singapore": "sg", "slovakia": "sk", "slovenia": "si", "south africa": "za",
+    "south korea": "kr", "korea": "kr", "spain": "es", "espana": "es", "espagne": "es",
+    "sri lanka": "lk", "sudan": "sd", "السودان": "sd", "sweden": "se", "sverige": "se",
+    "switzerland": "ch", "schweiz": "ch", "suisse": "ch", "svizzera": "ch", "syria": "sy",
+    "syrie": "sy", "سوريا": "sy", "سوريه": "sy", "taiwan": "tw", "tanzania": "tz",
+    "thailand": "th", "tunisia": "tn", "tunisie": "tn", "تونس": "tn", "turkey": "tr",
+    "turkiye": "tr", "ukraine": "ua", "украіна": "ua", "united arab emirates": "ae", "uae": "ae",
+    "الامارات": "ae", "united kingdom": "gb", "uk": "gb", "great britain": "gb", "england": "gb",
+    "scotland": "gb", "wales": "gb", "united states": "us", "united states of america": "us",
+    "usa": "us", "uruguay": "uy", "uzbekistan": "uz", "venezuela": "ve", "vietnam": "vn",
+    "viet nam": "vn", "yemen": "ye", "اليمن": "ye", "zambia": "zm", "zimbabwe": "zw",
+}
+_MAX_COUNTRY_WORDS = max(len(name.split()) for name in COUNTRIES)
+
+# namedetails keys worth learning as aliases (besides every name:<lang>)
+_NAME_TAGS = ("name", "int_name", "official_name", "short_name", "alt_name", "old_name", "loc_name")
+
+
+def normalize_place(text: str) -> str:
+    """Fold case, accents, Arabic letter variants, punctuation and spacing of a place name."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = _APOSTROPHES.sub("", text)
+    # Drop combining marks (Latin accents, Arabic harakat), then recompose
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    text = unicodedata.normalize("NFC", text).translate(_LATIN_FOLD).translate(_ARABIC_FOLD)
+    return " ".join(_SEPARATORS.sub(" ", text).split())
+
+
+def split_country(name: str) -> Tuple[str, str]:
+    """``(place, country_code)`` for a normalized name ending in a known country, else ``(name, "")``.
+
+    The longest matching suffix wins ("... united states of america"); a
+    name that is only a country is left alone.
+    """
+    words = name.split()
+    for n in range(min(_MAX_COUNTRY_WORDS, len(words) - 1), 0, -1):
+        code = COUNTRIES.get(" ".join(words[-n:]))
+        if code:
+            return " ".join(words[:-n]), code
+    return name, ""
+
+
+class PlaceNames:
+    """Cache keys for free-text places, plus aliases learned from geocode results."""
+
+    def __init__(self, max_aliases: int = 50000):
+        self.max_aliases = int(max_aliases)
+        # normalized variant -> canonical normalized name
+        self.aliases: Dict[str, str] = {}
+        # names already used as cache keys; never turned into aliases
+        self._canonicals: Set[str] = set()
+
+    def key(self, place: str, countrycodes: Optional[str] = None) -> Tuple[str, str, str]:
+        """``(name, country, countrycodes)`` for ``place`` under the given country bias.
+
+        ``country`` is the trailing country of the text, or the bias itself
+        when it names a single country, so "Beirut" and "Beirut, Lebanon"
+        share a key under ``OSM_COUNTRYCODES=lb``.
+        """
+        cc = (countrycodes or "").strip().lower()
+        name, country = split_country(normalize_place(place))
+        if not country and cc and "," not in cc:
+            country = cc
+        return self.canonical(name), country, cc
+
+    def canonical(self, name: str) -> str:
+        """Canonical form of the normalized ``name`` (itself unless it is a learned alias)."""
+        return self.aliases.get(name, name)
+
+    def learn(self, canonical: str, result: Dict[str, Any]) -> int:
+        """Map the names of a Nominatim ``/search`` item onto ``canonical``; returns aliases added.
+
+        Only learns when ``canonical`` is one of the item's own names: a
+        qualified query ("Paris, Texas", "hospitals in beirut") must not
+        capture the bare name of the place it found.
+        """
+        canonical = self.canonical(canonical)
+        names = []
+        details = result.get("namedetails") or {}
+        for tag, value in details.items():
+            if isinstance(value, str) and (tag in _NAME_TAGS or tag.startswith("name:")):
+                names.extend(value.split(";"))
+        variants = {normalize_place(v) for v in names}
+        # display_name's first part only confirms the match; it is not learned
+        display = result.get("display_name")
+        own = variants | ({normalize_place(display.split(",")[0])} if isinstance(display, str) else set())
+        if canonical not in own:
+            return 0
+        if len(self._canonicals) < self.max_aliases:
+            self._canonicals.add(canonical)
+        added = 0
+        for variant in variants:
+            if not variant or variant == canonical or variant in self.aliases or variant in self._canonicals:
+                continue
+            if len(self.aliases) >= self.max_aliases:
+                break
+            self.aliases[variant] = canonical
+            added += 1
+        return added
@@ -0,0 +1,250 @@
+"""Typed result records shared by the OSM and ORS servers.
+
+Upstream JSON is parsed into these slotted dataclasses once, at the HTTP
+boundary, so coordinates are floats everywhere downstream. ``to_json()``
+produces the compact dict shape handed to LLM providers.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _opt_float(v: Any) -> Optional[float]:
+    try:
+        return None if v is None else float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(slots=True)
+class GeocodeHit:
+    """One forward-geocoding result."""
+    place: str
+    lat: float
+    lon: float
+    display: Optional[str] = None
+    osm_id: Optional[str] = None
+
+    @classmethod
+    def from_nominatim(cls, place: str, d: Dict[str, Any]) -> "GeocodeHit":
+        """Build from one Nominatim ``/search`` item (lat/lon arrive as strings)."""
+        return cls(
+            place=place,
+            lat=float(d["lat"]),
+            lon=float(d["lon"]),
+            display=d.get("display_name"),
+            osm_id=_osm_key(d),
+        )
+
+    @property
+    def lonlat(self) -> Tuple[float, float]:
+        return (self.lon, self.lat)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"place": self.place, "lat": self.lat, "lon": self.lon, "display": self.display}
+
+
+@dataclass(slots=True)
+class Suggestion:
+    """One autocomplete candidate; ``popularity`` grows with every geocode of the place."""
+    name: str
+    lat: float
+    lon: float
+    display: Optional[str] = None
+    popularity: float = 0.0
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"name": self.name, "lat": self.lat, "lon": self.lon, "display": self.display,
+                "popularity": round(self.popularity, 2)}
+
+
+@dataclass(slots=True)
+class POI:
+    """A point of interest from Nominatim or ORS."""
+    name: Optional[str]
+    lat: float
+    lon: float
+    osm_id: Optional[str] = None
+    category: Optional[str] = None
+    kind: Optional[str] = None
+    importance: float = 0.0
+    distance_m: Optional[float] = None
+
+    @classmethod
+    def from_nominatim(cls, d: Dict[str, Any]) -> "POI":
+        return cls(
+            name=d.get("display_name"),
+            lat=float(d["lat"]),
+            lon=float(d["lon"]),
+            osm_id=_osm_key(d),
+            category=d.get("class") or d.get("category"),
+            kind=d.get("type"),
+            importance=_opt_float(d.get("importance")) or 0.0,
+        )
+
+    @classmethod
+    def from_ors_feature(cls, f: Dict[str, Any]) -> "POI":
+        """Build from one GeoJSON feature of the ORS ``/pois`` endpoint."""
+        lon, lat = f["geometry"]["coordinates"][:2]
+        props = f.get("properties") or {}
+        tags = props.get("osm_tags") or {}
+        cats = list((props.get("category_ids") or {}).values())
+        cat = cats[0] if cats else {}
+        osm_id = props.get("osm_id")
+        return cls(
+            name=tags.get("name"),
+            lat=float(lat),
+            lon=float(lon),
+            osm_id=None if osm_id is None else f"{props.get('osm_type', 1)}/{osm_id}",
+            category=cat.get("category_group"),
+            kind=cat.get("category_name"),
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"name": self.name, "lat": self.lat, "lon": self.lon}
+        if self.kind:
+            out["kind"] = self.kind
+        if self.distance_m is not None:
+            out["distance_m"] = round(self.distance_m)
+        return out
+
+
+@dataclass(slots=True)
+class RouteStep:
+    """One turn-by-turn instruction of a route."""
+    instruction: Optional[str]
+    name: Optional[str]
+    distance_m: Optional[float]
+    duration_s: Optional[float]
+    type: Optional[int] = None
+
+    @classmethod
+    def from_ors(cls, st: Dict[str, Any]) -> "RouteStep":
+        return cls(
+            instruction=st.get("instruction"),
+            name=st.get("name"),
+            distance_m=_opt_float(st.get("distance")),
+            duration_s=_opt_float(st.get("duration")),
+            type=st.get("type"),
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "instruction": self.instruction,
+            "name": self.name,
+            "distance_m": self.distance_m,
+            "duration_s": self.duration_s,
+            "type": self.type,
+        }
+
+
+@dataclass(slots=True)
+class RouteSummary:
+    """Distance/duration of a route, with optional cumulative totals and steps."""
+    distance_km: float
+    duration_min: Optional[float] = None
+    cumulative_distance_km: Optional[float] = None
+    cumulative_duration_min: Optional[float] = None
+    steps: Optional[List[RouteStep]] = None
+    # True for heuristic estimates made without the routing engine
+    approximate: bool = False
+    # (low, high) bounds of an approximate distance
+    distance_range_km: Optional[Tuple[float, float]] = None
+
+    def to_json(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"distance_km": self.distance_km}
+        if self.approximate:
+            out["approximate"] = True
+        if self.distance_range_km is not None:
+            out["distance_range_km"] = list(self.distance_range_km)
+        if self.duration_min is not None:
+            out["duration_min"] = self.duration_min
+        if self.cumulative_distance_km is not None:
+            out["cumulative_distance_km"] = self.cumulative_distance_km
+        if self.cumulative_duration_min is not None:
+            out["cumulative_duration_min"] = self.cumulative_duration_min
+        if self.steps is not None:
+            out["steps"] = [st.to_json() for st in self.steps]
+        return out
+
+
+@dataclass(slots=True)
+class RouteComparison:
+    """The same origin/destination routed with several profiles."""
+    origin: List[float]
+    destination: List[float]
+    # profile -> RouteSummary, or an error dict for profiles that failed
+    routes: Dict[str, Any]
+
+    def to_json(self) -> Dict[str, Any]:
+        rows = []
+        errors = {}
+        for profile, r in self.routes.items():
+            if isinstance(r, RouteSummary):
+                rows.append([profile, r.distance_km, r.duration_min])
+            else:
+                errors[profile] = r.get("error") if isinstance(r, dict) else str(r)
+        out: Dict[str, Any] = {
+            "origin": self.origin,
+            "destination": self.destination,
+            "columns": ["profile", "distance_km", "duration_min"],
+            "rows": rows,
+        }
+        timed = [row for row in rows if row[2] is not None]
+        if timed:
+            out["fastest"] = min(timed, key=lambda row: row[2])[0]
+        if errors:
+            out["errors"] = errors
+        return out
+
+
+@dataclass(slots=True)
+class OptimizedRoute:
+    """Stops in solved visiting order plus the multi-waypoint route through them."""
+    order: List[int]
+    stops: List[List[float]]
+    route: RouteSummary
+    roundtrip: bool = False
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "order": self.order,
+            "stops": self.stops,
+            "roundtrip": self.roundtrip,
+            **self.route.to_json(),
+        }
+
+
+@dataclass(slots=True)
+class Isochrone:
+    """Area reachable from ``center`` within ``range_s`` seconds for ``profile``."""
+    center: Tuple[float, float]
+    profile: str
+    range_s: int
+    polygons: List[List[List[List[float]]]]  # GeoJSON polygon rings, one entry per polygon
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "center": list(self.center),
+            "profile": self.profile,
+            "range_min": round(self.range_s / 60, 1),
+            "polygons": len(self.polygons),
+        }
+
+
+def _osm_key(d: Dict[str, Any]) -> Optional[str]:
+    """Stable ``"<type>/<id>"`` key for a Nominatim item (e.g. ``"way/1234"``)."""
+    osm_id = d.get("osm_id")
+    if osm_id is None:
+        return None
+    return f"{d.get('osm_type') or 'node'}/{osm_id}"
+
+
+def to_json(obj: Any) -> Any:
+    """Convert records (and lists/dicts containing them) to plain JSON values."""
+    if hasattr(obj, "to_json"):
+        return obj.to_json()
+    if isinstance(obj, list):
+        return [to_json(x) for x in obj]
+    if isinstance(obj, dict):
+        return {k: to_json(v) for k, v in obj.items()}
+    return obj
@@ -0,0 +1,239 @@
+"""Per-upstream resilience: adaptive timeouts, retries, hedging, circuit breaking.
+
+Each upstream (Nominatim, ORS, Gemini, Ollama) gets one
+:class:`UpstreamPolicy` per process via :func:`policy_for`. A policy:
+
+- derives its timeout from the recent latency distribution (a multiple of
+  p99, clamped to a floor and the caller's ceiling) instead of a fixed value;
+- retries idempotent requests on network errors, 429 and 5xx with full-jitter
+  exponential backoff;
+- optionally hedges idempotent requests: if no answer arrived after the
+  observed p95, a second identical request is sent and the first answer wins;
+- opens a circuit breaker after consecutive failures so callers fail fast
+  (``CircuitOpenError``) and can fall back to heuristics, then lets one probe
+  through after a cool-down.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import requests
+
+from part2_implementation.settings import Settings, get_settings, on_reload
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without contacting the upstream while its circuit breaker is open."""
+
+    def __init__(self, upstream: str, retry_in_s: float):
+        super().__init__(f"{upstream} temporarily unavailable (circuit open, retry in {retry_in_s:.0f}s)")
+        self.upstream = upstream
+        self.retry_in_s = retry_in_s
+
+
+def _retryable_status(code: int) -> bool:
+    return code == 429 or code >= 500
+
+
+class UpstreamPolicy:
+    """Latency tracking, timeout, retry, hedge and breaker state for one upstream."""
+
+    def __init__(self, name: str, min_timeout_s: float = 2.0, max_timeout_s: float = 30.0,
+                 retries: int = 2, backoff_s: float = 0.3, hedge: bool = False,
+                 failure_threshold: int = 5, cooldown_s: float = 30.0, window: int = 200):
+        self.name = name
+        self.min_timeout_s = min_timeout_s
+        self.max_timeout_s = max_timeout_s
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.hedge = hedge
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self._latencies = deque(maxlen=window)
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        # Token of the half-open probe in flight, if any
+        self._probe: Optional[object] = None
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "failures": 0, "short_circuited": 0}
+
+    # -- latency model -----------------------------------------------------
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            data = sorted(self._latencies)
+        if len(data) < 20:
+            return None
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+    def timeout(self, ceiling: Optional[float] = None) -> float:
+        """Adaptive timeout: 3x p99 of recent successes, within [min_timeout_s, ceiling]."""
+        ceiling = min(ceiling or self.max_timeout_s, self.max_timeout_s)
+        p99 = self.percentile(0.99)
+        if p99 is None:
+            return ceiling
+        return max(self.min_timeout_s, min(ceiling, 3.0 * p99))
+
+    # -- circuit breaker ---------------------------------------------------
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown_s:
+                return "half_open"
+            return "open"
+
+    def _before_call(self) -> Optional[object]:
+        """Raise while open; returns a token when this call is the half-open probe."""
+        with self._lock:
+            if self._opened_at is None:
+                return None
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.cooldown_s and self._probe is None:
+                self._probe = object()  # let exactly one probe through
+                return self._probe
+            self.stats["short_circuited"] += 1
+            raise CircuitOpenError(self.name, max(0.0, self.cooldown_s - waited))
+
+    def _record(self, ok: bool, latency: Optional[float] = None) -> None:
+        with self._lock:
+            self._probe = None
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+                if latency is not None:
+                    self._latencies.append(latency)
+                return
+            self.stats["failures"] += 1
+            self._failures += 1
+            if self._failures >= self.failure_threshold or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+    # -- execution ---------------------------------------------------------
+
+    async def _attempt(self, fn: Callable[[float], requests.Response], timeout: float, acquire=None):
+        if acquire is not None:
+            await acquire()
+        t0 = time.monotonic()
+        r = await asyncio.to_thread(fn, timeout)
+        return r, time.monotonic() - t0
+
+    async def _attempt_hedged(self, fn, timeout: float, acquire=None):
+        delay = self.percentile(0.95)
+        first = asyncio.ensure_future(self._attempt(fn, timeout, acquire))
+        if delay is None:
+            return await first
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        self.stats["hedges"] += 1
+        second = asyncio.ensure_future(self._attempt(fn, timeout, acquire))
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    for p in pending:
+                        p.cancel()  # the thread finishes in the background; its result is dropped
+                    return t.result()
+                error = t.exception()
+        raise error
+
+    async def call(self, fn: Callable[[float], requests.Response], idempotent: bool = False,
+                   ceiling_s: Optional[float] = None, acquire=None) -> requests.Response:
+        """Run ``fn(timeout)`` (a blocking HTTP call) under this policy.
+
+        ``acquire`` (e.g. a rate limiter's) is awaited before every attempt,
+        retries and hedges included. Non-idempotent calls get the adaptive timeout and breaker but are never
+        retried or hedged, and retries stop once the breaker opens. Returns the
+        last response (possibly an HTTP error); raises the last network error
+        or :class:`CircuitOpenError`.
+        """
+        probe = self._before_call()
+        self.stats["calls"] += 1
+        try:
+            return await self._call(fn, idempotent, ceiling_s, acquire)
+        finally:
+            if probe is not None:
+                # A probe that ended without a verdict (e.g. cancelled by wait_for or a
+                # lost race) counts as neither success nor failure: just free the slot
+                with self._lock:
+                    if self._probe is probe:
+                        self._probe = None
+
+    async def _call(self, fn, idempotent: bool, ceiling_s: Optional[float], acquire) -> requests.Response:
+        attempts = 1 + (self.retries if idempotent else 0)
+        last_exc: Optional[BaseException] = None
+        r = None
+        for attempt in range(attempts):
+            if attempt:
+                if self.state == "open":
+                    # The failures so far opened the breaker: stop, as new calls would
+                    break
+                self.stats["retries"] += 1
+                await asyncio.sleep(random.uniform(0, self.backoff_s * (2 ** attempt)))
+            timeout = self.timeout(ceiling_s)
+            try:
+                if idempotent and self.hedge:
+                    r, latency = await self._attempt_hedged(fn, timeout, acquire)
+                else:
+                    r, latency = await self._attempt(fn, timeout, acquire)
+            except requests.RequestException as e:
+                # The caller sees the latest outcome, not an earlier error response
+                last_exc, r = e, None
+                self._record(False)
+                continue
+            if _retryable_status(r.status_code):
+                self._record(False)
+                continue
+            self._record(True, latency)
+            return r
+        if r is not None:
+            return r
+        raise last_exc
+
+
+_policies: Dict[str, UpstreamPolicy] = {}
+_policies_lock = threading.Lock()
+_listening = False
+
+
+def _configure(pol: UpstreamPolicy, cfg: Settings) -> None:
+    hedged = {h.strip() for h in (cfg.hedge_upstreams or "").split(",") if h.strip()}
+    pol.retries = cfg.upstream_retries
+    pol.hedge = pol.name in hedged
+    pol.failure_threshold = cfg.breaker_failures
+    pol.cooldown_s = cfg.breaker_cooldown_s
+
+
+def _reconfigure(cfg: Settings) -> None:
+    """Apply reloaded settings to existing policies, keeping their latency and breaker state."""
+    with _policies_lock:
+        for pol in _policies.values():
+            _configure(pol, cfg)
+
+
+def policy_for(name: str) -> UpstreamPolicy:
+    """The process-wide policy for upstream ``name`` (created from settings on first use)."""
+    global _listening
+    pol = _policies.get(name)
+    if pol is None:
+        with _policies_lock:
+            pol = _policies.get(name)
+            if pol is None:
+                pol = _policies[name] = UpstreamPolicy(name)
+                _configure(pol, get_settings())
+                if not _listening:
+                    on_reload(_reconfigure)
+                    _listening = True
+    return pol
+
+
+def all_policies() -> Dict[str, UpstreamPolicy]:
+    return dict(_policies)
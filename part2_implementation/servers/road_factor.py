@@ -0,0 +1,138 @@
+"""Approximate road distances: great-circle distance times a learned detour factor.
+
+Every exact two-point route that enters the route cache (from ORS or the
+offline graph) is a sample of ``road distance / great-circle distance``.
+Samples are kept per region (the zoom-6 slippy tile of the midpoint, about
+600 km wide) and per trip-length band, since short trips detour
+proportionally more. An estimate uses the region's mean factor once it has
+enough samples, else the band's mean over all regions, else a prior of 1.3,
+and reports a ~90% range from the spread of the samples.
+"""
+import math
+import threading
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from part2_implementation.servers.geo import haversine_pairs_m, lonlat_to_tile
+from part2_implementation.servers.records import RouteSummary
+
+PRIOR_FACTOR = 1.3
+# Spread assumed while uncalibrated (1.3 +- 1.645 * 0.18 covers ~1.0-1.6)
+PRIOR_STD = 0.18
+# Floor for the spread of small, tight samples
+MIN_STD = 0.03
+_Z90 = 1.645
+# Trip-length band edges (great-circle km)
+_BANDS_KM = (5.0, 50.0)
+REGION_ZOOM = 6
+
+
+class _Stats:
+    """Running mean/variance (Welford)."""
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        d = x - self.mean
+        self.mean += d / self.count
+        self.m2 += d * (x - self.mean)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else PRIOR_STD
+
+
+def _band(gc_km: float) -> int:
+    return sum(gc_km >= edge for edge in _BANDS_KM)
+
+
+class RoadFactorModel:
+    """Detour factors learned from exact routes, per region and trip-length band."""
+
+    def __init__(self, min_samples: int = 5):
+        self.min_samples = max(1, int(min_samples))
+        self.regions: Dict[Tuple[int, int, int], _Stats] = {}
+        self.bands: Dict[int, _Stats] = {}
+        self.samples = 0
+        self.estimates = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _region(origin: Sequence[float], destination: Sequence[float], band: int) -> Tuple[int, int, int]:
+        lon = (float(origin[0]) + float(destination[0])) / 2
+        lat = (float(origin[1]) + float(destination[1])) / 2
+        return (*lonlat_to_tile(lon, lat, REGION_ZOOM), band)
+
+    def observe(self, origin: Sequence[float], destination: Sequence[float], road_km: float) -> bool:
+        """Record one exact route between two ``[lon, lat]`` points; False if it was not usable."""
+        gc_km = float(haversine_pairs_m([origin[0]], [origin[1]], [destination[0]], [destination[1]])[0]) / 1000
+        # Too short to say anything about detours, or inconsistent data
+        if gc_km < 0.2 or not gc_km * 0.95 <= road_km <= gc_km * 5:
+            return False
+        factor = max(1.0, road_km / gc_km)
+        band = _band(gc_km)
+        with self._lock:
+            self.regions.setdefault(self._region(origin, destination, band), _Stats()).add(factor)
+            self.bands.setdefault(band, _Stats()).add(factor)
+            self.samples += 1
+        return True
+
+    def calibrate_from(self, routes) -> int:
+        """Learn from an existing route cache (``(profile, waypoints) -> RouteSummary``); returns samples used."""
+        used = 0
+        for key in list(routes):
+            route = routes.get(key)
+            try:
+                _, waypoints = key
+            except (TypeError, ValueError):
+                continue
+            if isinstance(route, RouteSummary) and not route.approximate and len(waypoints) == 2:
+                used += self.observe(waypoints[0], waypoints[1], route.distance_km)
+        return used
+
+    def factor(self, origin: Sequence[float], destination: Sequence[float],
+               gc_km: Optional[float] = None) -> Tuple[float, float, str]:
+        """``(factor, std, source)`` where source is ``"region"``, ``"global"`` or ``"prior"``."""
+        if gc_km is None:
+            gc_km = float(haversine_pairs_m([origin[0]], [origin[1]], [destination[0]], [destination[1]])[0]) / 1000
+        band = _band(gc_km)
+        st = self.regions.get(self._region(origin, destination, band))
+        if st is not None and st.count >= self.min_samples:
+            return st.mean, max(st.std, MIN_STD), "region"
+        st = self.bands.get(band)
+        if st is not None and st.count >= self.min_samples:
+            return st.mean, max(st.std, MIN_STD), "global"
+        return PRIOR_FACTOR, PRIOR_STD, "prior"
+
+    def calibrated(self, origin: Sequence[float], destination: Sequence[float]) -> bool:
+        """True when an estimate would use the region's own samples."""
+        return self.factor(origin, destination)[2] == "region"
+
+    def estimate_many(self, origins: Sequence[Sequence[float]],
+                      destinations: Sequence[Sequence[float]]) -> List[RouteSummary]:
+        """Approximate distances for paired points, with one vectorized great-circle pass."""
+        gc = haversine_pairs_m([o[0] for o in origins], [o[1] for o in origins],
+                               [d[0] for d in destinations], [d[1] for d in destinations])
+        out = []
+        for o, d, m in zip(origins, destinations, gc):
+            gc_km = float(m) / 1000
+            f, std, _ = self.factor(o, d, gc_km)
+            low = gc_km * max(1.0, f - _Z90 * std)
+            high = gc_km * (f + _Z90 * std)
+            out.append(RouteSummary(distance_km=round(gc_km * f, 2), approximate=True,
+                                    distance_range_km=(round(low, 2), round(high, 2))))
+        self.estimates += len(out)
+        return out
+
+    def estimate(self, origin: Sequence[float], destination: Sequence[float]) -> RouteSummary:
+        return self.estimate_many([origin], [destination])[0]
+
+    def snapshot(self) -> Dict[Hashable, Dict[str, float]]:
+        """Per-region ``count``/``factor``/``std`` (for inspection and metrics)."""
+        with self._lock:
+            return {k: {"count": s.count, "factor": round(s.mean, 3), "std": round(s.std, 3)}
+                    for k, s in self.regions.items()}
@@ -0,0 +1,590 @@
+"""Offline road routing on a graph built from an OpenStreetMap extract.
+
+Build once per profile from an ``.osm`` XML extract (optionally ``.gz`` or
+``.bz2``; convert ``.pbf`` files first, e.g. ``osmium cat in.pbf -o out.osm``)::
+
+    python -m part2_implementation.servers.road_graph extract.osm.bz2 graphs \\
+        --profile driving-car --ch
+
+The graph is stored as CSR adjacency in ``.npy`` arrays (``offsets``,
+``targets``, per-edge ``length``/``duration``/``name``, node ``lon``/``lat``
+and a grid index for snapping), which :class:`RoadGraph` memory-maps, so
+several processes share one copy and opening a graph is instant.
+
+Queries minimise travel time. Without preprocessing they run A* with a
+great-circle / top-speed bound; ``--ch`` adds contraction hierarchies
+(``ch_*`` arrays), answered by a bidirectional Dijkstra over the upward
+graphs, which settles a few hundred nodes even on long routes. Results are
+:class:`RouteSummary` records with ORS-style turn-by-turn steps.
+
+NumPy is required; contraction is pure Python and meant for city- or
+region-sized extracts.
+"""
+import argparse
+import bz2
+import gzip
+import heapq
+import json
+import math
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from part2_implementation.servers.geo import EARTH_RADIUS_M, _np
+from part2_implementation.servers.records import RouteStep, RouteSummary
+
+# Speeds in km/h per highway class; ways of other classes are not routable
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "driving-car": {
+        "speeds": {
+            "motorway": 100, "motorway_link": 60, "trunk": 85, "trunk_link": 50,
+            "primary": 65, "primary_link": 45, "secondary": 55, "secondary_link": 40,
+            "tertiary": 45, "tertiary_link": 35, "unclassified": 35, "residential": 30,
+            "living_street": 10, "service": 15, "road": 30,
+        },
+        "access": ("access", "vehicle", "motor_vehicle", "motorcar"),
+        "oneway": True,
+        "use_maxspeed": True,
+    },
+    "cycling-regular": {
+        "speeds": {
+            "trunk": 18, "trunk_link": 18, "primary": 18, "primary_link": 18, "secondary": 18,
+            "secondary_link": 18, "tertiary": 18, "tertiary_link": 18, "unclassified": 18,
+            "residential": 18, "living_street": 10, "service": 15, "road": 18,
+            "cycleway": 18, "track": 12, "path": 12,
+        },
+        "access": ("access", "vehicle", "bicycle"),
+        "oneway": True,
+        "oneway_tag": "oneway:bicycle",
+        "use_maxspeed": False,
+    },
+    "foot-walking": {
+        "speeds": {
+            "trunk": 5, "trunk_link": 5, "primary": 5, "primary_link": 5, "secondary": 5,
+            "secondary_link": 5, "tertiary": 5, "tertiary_link": 5, "unclassified": 5,
+            "residential": 5, "living_street": 5, "service": 5, "road": 5, "pedestrian": 5,
+            "footway": 5, "path": 5, "steps": 3, "track": 5, "cycleway": 5,
+        },
+        "access": ("access", "foot"),
+        "oneway": False,
+        "use_maxspeed": False,
+    },
+}
+
+# Snapping grid cell size in degrees (~1.1 km of latitude)
+_CELL_DEG = 0.01
+_CELL_ROW = 40000  # > number of longitude cells, so keys are unique
+# Coordinates farther than this from any graph node are not routed offline
+MAX_SNAP_M = 2000.0
+_DENIED = {"no", "private"}
+_MAXSPEED = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(mph)?")
+
+# (max |turn| in degrees, left type, right type, verb) in ORS instruction types
+_TURNS = (
+    (20.0, 6, 6, "Continue straight"),
+    (45.0, 4, 5, "Turn slight {side}"),
+    (120.0, 0, 1, "Turn {side}"),
+    (170.0, 2, 3, "Turn sharp {side}"),
+    (180.0, 9, 9, "Make a U-turn"),
+)
+_CARDINALS = ("north", "northeast", "east", "southeast", "south", "southwest", "west", "northwest")
+
+
+def open_extract(path: str):
+    """Open an OSM XML extract for reading bytes, decompressing ``.bz2``/``.gz`` by extension."""
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _haversine(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def _bearing(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dl = math.radians(lon2 - lon1)
+    y = math.sin(dl) * math.cos(p2)
+    x = math.cos(p1) * math.sin(p2) - math.sin(p1) * math.cos(p2) * math.cos(dl)
+    return math.degrees(math.atan2(y, x)) % 360.0
+
+
+def _cell(lon, lat):
+    """Grid key(s) for coordinates (scalars or arrays)."""
+    np = _np()
+    row = np.floor((np.asarray(lat) + 90.0) / _CELL_DEG).astype(np.int64)
+    col = np.floor((np.asarray(lon) + 180.0) / _CELL_DEG).astype(np.int64)
+    return row * _CELL_ROW + col
+
+
+def _way_rule(tags: Dict[str, str], profile: Dict[str, Any]) -> Optional[Tuple[float, bool, bool]]:
+    """``(speed_kmh, forward, backward)`` for a way, or None if it is not routable."""
+    speed = profile["speeds"].get(tags.get("highway"))
+    if speed is None or tags.get("area") == "yes":
+        return None
+    # The most specific access tag present decides (motorcar=yes beats access=no)
+    for key in reversed(profile["access"]):
+        if tags.get(key) in _DENIED:
+            return None
+        if tags.get(key) in ("yes", "designated", "permissive"):
+            break
+    if profile["use_maxspeed"]:
+        m = _MAXSPEED.match(tags.get("maxspeed", ""))
+        if m:
+            limit = float(m.group(1)) * (1.609 if m.group(2) else 1.0)
+            # Average speed stays below the posted limit
+            speed = min(speed, limit * 0.9) if limit > 0 else speed
+    forward = backward = True
+    if profile["oneway"]:
+        oneway = tags.get(profile.get("oneway_tag", ""), "") or tags.get("oneway", "")
+        if oneway in ("yes", "true", "1") or (
+                tags.get("junction") in ("roundabout", "circular") and oneway != "no") or (
+                tags.get("highway") in ("motorway", "motorway_link") and oneway != "no"):
+            backward = False
+        elif oneway == "-1":
+            forward = False
+    return float(speed), forward, backward
+
+
+def build(osm_path: str, out_dir: str, profile: str = "driving-car") -> Dict[str, Any]:
+    """Parse an OSM XML extract into CSR arrays under ``out_dir``; returns the metadata."""
+    np = _np()
+    if np is None:
+        raise RuntimeError("numpy is required to build road graphs")
+    rule = PROFILES[profile]
+    # Pass 1: routable ways. Nodes precede ways in OSM files, so coordinates
+    # of the referenced nodes are read in a second pass.
+    ways: List[Tuple[List[int], float, bool, bool, int]] = []
+    names: Dict[str, int] = {"": 0}
+    needed = set()
+    for _, el in ET.iterparse(open_extract(osm_path), events=("end",)):
+        if el.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in el.iter("tag")}
+            way = _way_rule(tags, rule)
+            if way is not None:
+                refs = [int(nd.get("ref")) for nd in el.iter("nd")]
+                if len(refs) >= 2:
+                    name = tags.get("name") or tags.get("ref") or ""
+                    ways.append((refs, way[0], way[1], way[2], names.setdefault(name, len(names))))
+                    needed.update(refs)
+            el.clear()
+        elif el.tag in ("node", "relation"):
+            el.clear()
+    coords: Dict[int, Tuple[float, float]] = {}
+    for _, el in ET.iterparse(open_extract(osm_path), events=("end",)):
+        if el.tag == "node":
+            nid = int(el.get("id"))
+            if nid in needed:
+                coords[nid] = (float(el.get("lon")), float(el.get("lat")))
+            el.clear()
+        elif el.tag in ("way", "relation"):
+            el.clear()
+
+    index: Dict[int, int] = {}
+    src: List[int] = []
+    dst: List[int] = []
+    length: List[float] = []
+    duration: List[float] = []
+    name_ids: List[int] = []
+    for refs, speed, forward, backward, name_id in ways:
+        mps = speed / 3.6
+        for a, b in zip(refs, refs[1:]):
+            if a not in coords or b not in coords or a == b:
+                continue
+            ia = index.setdefault(a, len(index))
+            ib = index.setdefault(b, len(index))
+            d = _haversine(*coords[a], *coords[b])
+            for u, v, ok in ((ia, ib, forward), (ib, ia, backward)):
+                if ok:
+                    src.append(u)
+                    dst.append(v)
+                    length.append(d)
+                    duration.append(d / mps)
+                    name_ids.append(name_id)
+
+    n = len(index)
+    lonlat = np.empty((n, 2), dtype=np.float64)
+    for nid, i in index.items():
+        lonlat[i] = coords[nid]
+    src_a = np.asarray(src, dtype=np.int64)
+    order = np.argsort(src_a, kind="stable")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src_a, minlength=n), out=offsets[1:])
+    cells = _cell(lonlat[:, 0], lonlat[:, 1])
+    grid_order = np.argsort(cells, kind="stable")
+
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {
+        "offsets": offsets,
+        "targets": np.asarray(dst, dtype=np.int32)[order],
+        "length": np.asarray(length, dtype=np.float32)[order],
+        "duration": np.asarray(duration, dtype=np.float32)[order],
+        "name": np.asarray(name_ids, dtype=np.int32)[order],
+        "lon": lonlat[:, 0].copy(),
+        "lat": lonlat[:, 1].copy(),
+        "grid_keys": cells[grid_order],
+        "grid_nodes": grid_order.astype(np.int32),
+    }
+    for key, arr in arrays.items():
+        np.save(os.path.join(out_dir, f"{key}.npy"), arr)
+    with open(os.path.join(out_dir, "names.json"), "w", encoding="utf-8") as f:
+        json.dump(sorted(names, key=names.get), f, ensure_ascii=False)
+    top_speed = max((d / t for d, t in zip(length, duration) if t > 0), default=1.0)
+    meta = {"profile": profile, "nodes": n, "edges": len(dst), "max_speed_mps": top_speed,
+            "source": os.path.basename(osm_path), "built": time.time(), "ch": False}
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class RoadGraph:
+    """Memory-mapped routing graph for one profile."""
+
+    def __init__(self, path: str):
+        np = _np()
+        self.directory = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, "names.json"), encoding="utf-8") as f:
+            self.names: List[str] = json.load(f)
+
+        def load(key: str):
+            # Plain ndarray views of the mapping: indexing a memmap subclass is slow
+            return np.load(os.path.join(path, f"{key}.npy"), mmap_mode="r").view(np.ndarray)
+
+        self.offsets = load("offsets")
+        self.targets = load("targets")
+        self.length = load("length")
+        self.duration = load("duration")
+        self.name = load("name")
+        self.lon = load("lon")
+        self.lat = load("lat")
+        self.grid_keys = load("grid_keys")
+        self.grid_nodes = load("grid_nodes")
+        self.max_speed = float(self.meta.get("max_speed_mps") or 1.0)
+        self.ch = None
+        if self.meta.get("ch"):
+            # side -> (offsets, targets, weight, mid, edge)
+            self.ch = {
+                side: tuple(load(f"ch_{side}_{key}") for key in ("offsets", "targets", "weight", "mid", "edge"))
+                for side in ("up", "down")
+            }
+
+    @classmethod
+    def open(cls, path: str) -> Optional["RoadGraph"]:
+        """The graph stored at ``path``, or None if there is none (or numpy is missing)."""
+        if _np() is None or not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        return cls(path)
+
+    @property
+    def n(self) -> int:
+        return len(self.offsets) - 1
+
+    # -- queries -----------------------------------------------------------
+
+    def snap(self, lon: float, lat: float) -> Optional[int]:
+        """Nearest graph node within :data:`MAX_SNAP_M`, searching the 3x3 grid cells around the point."""
+        np = _np()
+        center = int(_cell(lon, lat))
+        candidates = []
+        for dr in (-_CELL_ROW, 0, _CELL_ROW):
+            lo = np.searchsorted(self.grid_keys, center + dr - 1, side="left")
+            hi = np.searchsorted(self.grid_keys, center + dr + 1, side="right")
+            if hi > lo:
+                candidates.append(np.asarray(self.grid_nodes[lo:hi]))
+        if not candidates:
+            return None
+        nodes = np.concatenate(candidates)
+        lat1 = math.radians(lat)
+        lat2 = np.radians(np.asarray(self.lat[nodes]))
+        a = (np.sin((lat2 - lat1) / 2) ** 2
+             + math.cos(lat1) * np.cos(lat2) * np.sin(np.radians(np.asarray(self.lon[nodes]) - lon) / 2) ** 2)
+        best = int(np.argmin(a))
+        if 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(float(a[best]), 1.0))) > MAX_SNAP_M:
+            return None
+        return int(nodes[best])
+
+    def _astar(self, s: int, t: int) -> Optional[List[int]]:
+        """Edge ids of the fastest path from ``s`` to ``t`` on the plain graph."""
+        offsets, targets, duration = self.offsets, self.targets, self.duration
+        lon, lat = self.lon, self.lat
+        tlon, tlat = float(lon[t]), float(lat[t])
+        inv_speed = 1.0 / self.max_speed
+        dist = {s: 0.0}
+        pred: Dict[int, Tuple[int, int]] = {}
+        heap = [(0.0, 0.0, s)]
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if u == t:
+                break
+            if d > dist[u]:
+                continue
+            a, b = int(offsets[u]), int(offsets[u + 1])
+            for e, v, w in zip(range(a, b), targets[a:b].tolist(), duration[a:b].tolist()):
+                nd = d + w
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    pred[v] = (e, u)
+                    h = _haversine(float(lon[v]), float(lat[v]), tlon, tlat) * inv_speed
+                    heapq.heappush(heap, (nd + h, nd, v))
+        else:
+            return None
+        edges = []
+        while t != s:
+            e, t = pred[t]
+            edges.append(e)
+        return edges[::-1]
+
+    def _ch_row(self, side: str, u: int):
+        offsets, targets, weight, mid, edge = self.ch[side]
+        a, b = int(offsets[u]), int(offsets[u + 1])
+        return zip(targets[a:b].tolist(), weight[a:b].tolist(), mid[a:b].tolist(), edge[a:b].tolist())
+
+    def _unpack(self, u: int, v: int, mid: int, edge: int) -> List[int]:
+        """Original edge ids behind hierarchy edge ``u -> v`` (a shortcut if ``mid >= 0``)."""
+        out: List[int] = []
+        stack = [(u, v, mid, edge)]
+        while stack:
+            a, b, m, e = stack.pop()
+            if m < 0:
+                out.append(e)
+                continue
+            # a -> m was stored with m's downward edges, m -> b with its upward edges
+            first = next(r for r in self._ch_row("down", m) if r[0] == a)
+            second = next(r for r in self._ch_row("up", m) if r[0] == b)
+            stack.append((m, b, second[2], second[3]))
+            stack.append((a, m, first[2], first[3]))
+        return out
+
+    def _ch_query(self, s: int, t: int) -> Optional[List[int]]:
+        """Edge ids of the fastest path using the contraction hierarchy."""
+        dist = ({s: 0.0}, {t: 0.0})
+        pred: Tuple[Dict[int, tuple], Dict[int, tuple]] = ({}, {})
+        heaps = ([(0.0, s)], [(0.0, t)])
+        best, meet = math.inf, None
+        while True:
+            side = min((i for i in (0, 1) if heaps[i] and heaps[i][0][0] < best),
+                       key=lambda i: heaps[i][0][0], default=None)
+            if side is None:
+                break
+            d, u = heapq.heappop(heaps[side])
+            if d > dist[side][u]:
+                continue
+            other = dist[1 - side].get(u)
+            if other is not None and d + other < best:
+                best, meet = d + other, u
+            for v, w, mid, edge in self._ch_row("up" if side == 0 else "down", u):
+                nd = d + w
+                if nd < dist[side].get(v, math.inf):
+                    dist[side][v] = nd
+                    pred[side][v] = (u, mid, edge)
+                    heapq.heappush(heaps[side], (nd, v))
+        if meet is None:
+            return None
+        edges: List[int] = []
+        x = meet
+        chain = []
+        while x != s:
+            u, mid, edge = pred[0][x]
+            chain.append((u, x, mid, edge))
+            x = u
+        for u, v, mid, edge in reversed(chain):
+            edges.extend(self._unpack(u, v, mid, edge))
+        x = meet
+        while x != t:
+            # Backward labels store the original direction x -> nxt
+            nxt, mid, edge = pred[1][x]
+            edges.extend(self._unpack(x, nxt, mid, edge))
+            x = nxt
+        return edges
+
+    def path(self, s: int, t: int) -> Optional[List[int]]:
+        if s == t:
+            return []
+        return self._ch_query(s, t) if self.ch is not None else self._astar(s, t)
+
+    def _sources(self, edges: Sequence[int]) -> List[int]:
+        np = _np()
+        return (np.searchsorted(self.offsets, np.asarray(edges, dtype=np.int64), side="right") - 1).tolist()
+
+    def _steps(self, edges: List[int], last: bool, waypoint: int) -> List[RouteStep]:
+        """ORS-style steps: one per run of edges on the same street, then an arrival step."""
+        steps: List[RouteStep] = []
+        arrive = "Arrive at your destination" if last else f"Arrive at waypoint {waypoint}"
+        if not edges:
+            return [RouteStep(arrive, "-", 0.0, 0.0, 10)]
+        srcs = self._sources(edges)
+        groups: List[Dict[str, Any]] = []
+        prev_bearing = None
+        for e, u in zip(edges, srcs):
+            v = int(self.targets[e])
+            bearing = _bearing(float(self.lon[u]), float(self.lat[u]), float(self.lon[v]), float(self.lat[v]))
+            name = self.names[int(self.name[e])]
+            turn = None if prev_bearing is None else (bearing - prev_bearing + 540.0) % 360.0 - 180.0
+            g = groups[-1] if groups else None
+            if g is None or name != g["name"] or (not name and abs(turn) >= 45.0):
+                groups.append({"name": name, "turn": turn, "bearing": bearing, "m": 0.0, "s": 0.0})
+                g = groups[-1]
+            g["m"] += float(self.length[e])
+            g["s"] += float(self.duration[e])
+            prev_bearing = bearing
+        for i, g in enumerate(groups):
+            street = g["name"]
+            if i == 0:
+                kind = 11
+                text = f"Head {_CARDINALS[int((g['bearing'] + 22.5) // 45) % 8]}"
+                text += f" on {street}" if street else ""
+            else:
+                _, left, right, verb = next(r for r in _TURNS if abs(g["turn"]) <= r[0])
+                kind = left if g["turn"] < 0 else right
+                text = verb.format(side="left" if g["turn"] < 0 else "right")
+                text += f" onto {street}" if street else ""
+            steps.append(RouteStep(text, street or "-", round(g["m"], 1), round(g["s"], 1), kind))
+        steps.append(RouteStep(arrive, groups[-1]["name"] or "-", 0.0, 0.0, 10))
+        return steps
+
+    def route(self, coordinates: Sequence[Sequence[float]]) -> Optional[RouteSummary]:
+        """Route through ``[lon, lat]`` waypoints in order; None if any leg cannot be routed."""
+        nodes = [self.snap(float(c[0]), float(c[1])) for c in coordinates]
+        if len(nodes) < 2 or any(n is None for n in nodes):
+            return None
+        total_m = total_s = 0.0
+        steps: List[RouteStep] = []
+        for i, (s, t) in enumerate(zip(nodes, nodes[1:]), 1):
+            edges = self.path(s, t)
+            if edges is None:
+                return None
+            total_m += float(self.length[edges].sum()) if edges else 0.0
+            total_s += float(self.duration[edges].sum()) if edges else 0.0
+            steps.extend(self._steps(edges, i == len(nodes) - 1, i))
+        km, minutes = round(total_m / 1000, 2), round(total_s / 60, 1)
+        return RouteSummary(distance_km=km, duration_min=minutes, cumulative_distance_km=km,
+                            cumulative_duration_min=minutes, steps=steps)
+
+    # -- contraction hierarchies ------------------------------------------
+
+    def contract(self, witness_settle: int = 60) -> Dict[str, Any]:
+        """Add contraction-hierarchy arrays to the graph directory (slow; run once after build).
+
+        Nodes are contracted in lazily updated edge-difference order; a
+        shortcut ``u -> w`` replaces ``u -> v -> w`` unless a local witness
+        search (at most ``witness_settle`` settled nodes) finds a path that is
+        no longer. Each node keeps the edges it had when contracted: outgoing
+        ones form the upward graph, incoming ones the downward graph.
+        """
+        np = _np()
+        n = self.n
+        # node -> {neighbour: (weight, mid node or -1, original edge id or -1)}
+        out: List[Dict[int, tuple]] = [dict() for _ in range(n)]
+        inn: List[Dict[int, tuple]] = [dict() for _ in range(n)]
+        offsets, targets, duration = self.offsets, self.targets, self.duration
+        for u in range(n):
+            a, b = int(offsets[u]), int(offsets[u + 1])
+            for e, v, w in zip(range(a, b), targets[a:b].tolist(), duration[a:b].tolist()):
+                if v != u and (v not in out[u] or w < out[u][v][0]):
+                    out[u][v] = inn[v][u] = (w, -1, e)
+
+        def shortcuts(v: int) -> List[Tuple[int, int, float]]:
+            found = []
+            for u, (wu, _, _) in inn[v].items():
+                limit = wu + max((x[0] for x in out[v].values()), default=0.0)
+                dist = {u: 0.0}
+                heap = [(0.0, u)]
+                settled = 0
+                while heap and settled < witness_settle:
+                    d, x = heapq.heappop(heap)
+                    if d > limit:
+                        break
+                    if d > dist[x]:
+                        continue
+                    settled += 1
+                    for y, (wy, _, _) in out[x].items():
+                        if y != v and d + wy < dist.get(y, math.inf):
+                            dist[y] = d + wy
+                            heapq.heappush(heap, (d + wy, y))
+                for w_node, (ww, _, _) in out[v].items():
+                    if w_node != u and dist.get(w_node, math.inf) > wu + ww:
+                        found.append((u, w_node, wu + ww))
+            return found
+
+        deleted = [0] * n
+
+        def priority(v: int) -> int:
+            return len(shortcuts(v)) - len(inn[v]) - len(out[v]) + deleted[v]
+
+        heap = [(priority(v), v) for v in range(n)]
+        heapq.heapify(heap)
+        up: List[list] = [[] for _ in range(n)]
+        down: List[list] = [[] for _ in range(n)]
+        contracted = [False] * n
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+            p = priority(v)
+            if heap and p > heap[0][0]:
+                heapq.heappush(heap, (p, v))
+                continue
+            for u, w_node, weight in shortcuts(v):
+                if w_node not in out[u] or weight < out[u][w_node][0]:
+                    out[u][w_node] = inn[w_node][u] = (weight, v, -1)
+            up[v] = [(x, *val) for x, val in out[v].items()]
+            down[v] = [(x, *val) for x, val in inn[v].items()]
+            for u in inn[v]:
+                del out[u][v]
+                deleted[u] += 1
+            for w_node in out[v]:
+                del inn[w_node][v]
+                deleted[w_node] += 1
+            out[v], inn[v] = {}, {}
+            contracted[v] = True
+
+        for side, rows in (("up", up), ("down", down)):
+            counts = np.fromiter((len(r) for r in rows), dtype=np.int64, count=n)
+            offs = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(counts, out=offs[1:])
+            flat = [x for r in rows for x in r]
+            cols = {
+                "offsets": offs,
+                "targets": np.asarray([x[0] for x in flat], dtype=np.int32),
+                "weight": np.asarray([x[1] for x in flat], dtype=np.float32),
+                "mid": np.asarray([x[2] for x in flat], dtype=np.int32),
+                "edge": np.asarray([x[3] for x in flat], dtype=np.int64),
+            }
+            for key, arr in cols.items():
+                np.save(os.path.join(self.directory, f"ch_{side}_{key}.npy"), arr)
+        self.meta.update(ch=True, ch_edges=sum(len(r) for r in up) + sum(len(r) for r in down))
+        with open(os.path.join(self.directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        return self.meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an offline routing graph from an OSM XML extract")
+    parser.add_argument("osm", help=".osm, .osm.gz or .osm.bz2 extract")
+    parser.add_argument("out", help="graph directory (MAP_AGENT_ROUTE_GRAPH); the profile is a subdirectory")
+    parser.add_argument("--profile", action="append", choices=sorted(PROFILES),
+                        help="profile(s) to build (default driving-car)")
+    parser.add_argument("--ch", action="store_true", help="add contraction hierarchies for faster queries")
+    args = parser.parse_args()
+    for profile in args.profile or ["driving-car"]:
+        path = os.path.join(args.out, profile)
+        t0 = time.monotonic()
+        meta = build(args.osm, path, profile)
+        print(f"{profile}: {meta['nodes']} nodes, {meta['edges']} edges ({time.monotonic() - t0:.1f}s)")
+        if args.ch:
+            t0 = time.monotonic()
+            meta = RoadGraph(path).contract()
+            print(f"{profile}: contraction hierarchy, {meta['ch_edges']} edges ({time.monotonic() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Local solver for the stop-ordering problem behind multi-stop routes.
+
+Nearest-neighbour construction followed by 2-opt improvement, bounded by a
+wall-clock budget. Works on asymmetric cost matrices (one-way streets make
+A->B and B->A differ), which is what the ORS matrix endpoint returns.
+"""
+import time
+from typing import List, Sequence
+
+
+def tour_cost(matrix: Sequence[Sequence[float]], order: Sequence[int], roundtrip: bool = False) -> float:
+    cost = sum(matrix[a][b] for a, b in zip(order, order[1:]))
+    if roundtrip and len(order) > 1:
+        cost += matrix[order[-1]][order[0]]
+    return cost
+
+
+def nearest_neighbour(matrix: Sequence[Sequence[float]], start: int = 0) -> List[int]:
+    n = len(matrix)
+    order = [start]
+    left = set(range(n)) - {start}
+    while left:
+        cur = order[-1]
+        nxt = min(left, key=lambda j: matrix[cur][j])
+        order.append(nxt)
+        left.remove(nxt)
+    return order
+
+
+def two_opt(matrix: Sequence[Sequence[float]], order: List[int], roundtrip: bool = False,
+            deadline: float = float("inf")) -> List[int]:
+    """Improve ``order`` by segment reversals until no gain or ``deadline`` (monotonic).
+
+    The first stop stays fixed. Reversal gains account for asymmetric costs
+    by comparing the segment's forward and backward travel cost.
+    """
+    t = list(order) + ([order[0]] if roundtrip else [])
+    n = len(t)
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        # prefix sums of forward / backward edge costs along the current tour
+        fwd = [0.0] * n
+        bwd = [0.0] * n
+        for a in range(1, n):
+            fwd[a] = fwd[a - 1] + matrix[t[a - 1]][t[a]]
+            bwd[a] = bwd[a - 1] + matrix[t[a]][t[a - 1]]
+        last = n - 1 if roundtrip else n
+        for i in range(1, last - 1):
+            if time.monotonic() >= deadline:
+                break
+            for j in range(i + 1, last):
+                before = matrix[t[i - 1]][t[i]] + (fwd[j] - fwd[i])
+                after = matrix[t[i - 1]][t[j]] + (bwd[j] - bwd[i])
+                if j + 1 < n:
+                    before += matrix[t[j]][t[j + 1]]
+                    after += matrix[t[i]][t[j + 1]]
+                if after + 1e-9 < before:
+                    t[i:j + 1] = reversed(t[i:j + 1])
+                    improved = True
+                    break
+            if improved:
+                break
+    return t[:-1] if roundtrip else t
+
+
+def solve(matrix: Sequence[Sequence[float]], start: int = 0, roundtrip: bool = False,
+          time_budget_s: float = 1.0) -> List[int]:
+    """Visiting order over all stops beginning at ``start``."""
+    deadline = time.monotonic() + max(0.0, time_budget_s)
+    return two_opt(matrix, nearest_neighbour(matrix, start), roundtrip, deadline)
@@ -0,0 +1,100 @@
+"""Shared HTTP plumbing for the map servers.
+
+``requests`` is blocking, so calls are pushed to a worker thread to let
+many lookups overlap on one event loop. ``RateLimiter`` spaces request
+starts so concurrent fan-out still respects upstream usage policies. All
+calls share one pooled ``requests.Session`` so keep-alive connections are
+reused across tools, prompts and providers.
+"""
+import asyncio
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session() -> requests.Session:
+    """Process-wide pooled session (created on first use)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                from part2_implementation.settings import get_settings
+
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=get_settings().http_pool_size)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+class RateLimiter:
+    """Async limiter that spaces request starts at least ``min_interval`` seconds apart."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = max(0.0, float(min_interval))
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        start = max(now, self._next)
+        self._next = start + self.min_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class SharedRateLimiter:
+    """Cross-process variant of :class:`RateLimiter`.
+
+    Created once by the coordinating process and handed to pool workers; the
+    next free start time lives in shared memory behind a process lock, so the
+    spacing holds globally no matter how many workers call the upstream.
+    """
+
+    def __init__(self, min_interval: float, ctx=None):
+        import multiprocessing
+
+        ctx = ctx or multiprocessing.get_context()
+        self.min_interval = max(0.0, float(min_interval))
+        self._lock = ctx.Lock()
+        self._next = ctx.Value("d", 0.0, lock=False)
+
+    async def acquire(self) -> None:
+        with self._lock:
+            # CLOCK_MONOTONIC is system-wide, so it is comparable across processes
+            now = time.monotonic()
+            start = max(now, self._next.value)
+            self._next.value = start + self.min_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def request(method: str, url: str, limiter=None, upstream: Optional[str] = None,
+                  idempotent: bool = False, **kwargs) -> requests.Response:
+    """Run a pooled ``session().request`` in a worker thread, after waiting on ``limiter``.
+
+    With ``upstream`` set the call goes through that upstream's
+    :class:`~part2_implementation.servers.resilience.UpstreamPolicy`:
+    adaptive timeout (``timeout=`` becomes the ceiling), circuit breaker,
+    and for ``idempotent`` calls jittered retries and optional hedging.
+    """
+    if upstream is None:
+        if limiter is not None:
+            await limiter.acquire()
+        return await asyncio.to_thread(session().request, method, url, **kwargs)
+
+    from part2_implementation.servers.resilience import policy_for
+
+    ceiling = kwargs.pop("timeout", None)
+    return await policy_for(upstream).call(
+        lambda timeout: session().request(method, url, timeout=timeout, **kwargs),
+        idempotent=idempotent,
+        ceiling_s=ceiling,
+        acquire=limiter.acquire if limiter is not None else None,
+    )
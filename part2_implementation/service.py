@@ -0,0 +1,354 @@
+"""Long-running HTTP front-end for AgentsSDKMapAssistant (stdlib asyncio only).
+
+One assistant (and therefore one set of warm caches and pooled connections)
+serves every request. Endpoints:
+
+- ``POST /run``         body ``{"prompt": "..."}`` -> run() result as JSON
+- ``POST /run_stream``  same body -> NDJSON events from run_stream(), chunked
+- ``GET  /healthz``     liveness plus queue/in-flight counts
+- ``GET  /metrics``     Prometheus text format counters and gauges
+- ``GET  /autocomplete?q=bei&k=5``  place suggestions, answered inline (no worker)
+- ``POST /reload``      re-read ``.env``/environment settings (also on SIGHUP)
+
+Work is executed by a fixed pool of worker tasks. When all workers are busy
+and the wait queue is full the service answers 429 instead of piling up
+requests. SIGINT/SIGTERM stop accepting connections, drain queued work and
+flush the assistant's persistent caches before exiting.
+
+Run with:
+    python -m part2_implementation.service --port 8080 --workers 8 --queue 64
+"""
+import argparse
+import asyncio
+import json
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 429: "Too Many Requests", 503: "Service Unavailable"}
+MAX_BODY_BYTES = 1 << 20
+
+
+class PayloadTooLarge(ValueError):
+    """Request body above ``MAX_BODY_BYTES`` (answered with 413)."""
+
+
+class AssistantService:
+    """Worker pool + backpressure around one shared assistant."""
+
+    def __init__(self, agent=None, workers: int = 8, queue_size: int = 64, drain_timeout_s: float = 30.0):
+        if agent is None:
+            from part2_implementation.agent_sdk_app import AgentsSDKMapAssistant
+
+            agent = AgentsSDKMapAssistant()
+        self.agent = agent
+        self.workers = max(1, int(workers))
+        self.queue_size = max(0, int(queue_size))
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.drain_timeout_s = drain_timeout_s
+        self.in_flight = 0
+        self.admitted = 0  # running + waiting jobs
+        self.accepting = True
+        self.started = time.time()
+        self.metrics: Dict[str, float] = {
+            "requests_total": 0, "rejected_total": 0, "errors_total": 0,
+            "completed_total": 0, "latency_seconds_sum": 0.0, "autocomplete_total": 0,
+        }
+        self._tasks = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Ollama model load started by start(), if any
+        self._warmup: Optional[asyncio.Task] = None
+
+    # -- worker pool -------------------------------------------------------
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            if job is None:
+                self.queue.task_done()
+                return
+            prompt, stream, sink = job
+            self.in_flight += 1
+            t0 = time.monotonic()
+            try:
+                if stream:
+                    async for ev in self.agent.run_stream(prompt):
+                        await sink.put(ev)
+                    await sink.put(None)
+                else:
+                    sink.set_result(await self.agent.run(prompt))
+            except Exception as e:
+                self.metrics["errors_total"] += 1
+                if stream:
+                    await sink.put({"event": "error", "error": str(e)})
+                    await sink.put(None)
+                elif not sink.done():
+                    sink.set_exception(e)
+            finally:
+                self.in_flight -= 1
+                self.admitted -= 1
+                self.metrics["completed_total"] += 1
+                self.metrics["latency_seconds_sum"] += time.monotonic() - t0
+                self.queue.task_done()
+
+    def _submit(self, prompt: str, stream: bool):
+        """Queue a job; returns its future/event queue, or None when saturated."""
+        if not self.accepting or self.admitted >= self.workers + self.queue_size:
+            return None
+        loop = asyncio.get_running_loop()
+        sink = asyncio.Queue() if stream else loop.create_future()
+        self.admitted += 1
+        self.queue.put_nowait((prompt, stream, sink))
+        return sink
+
+    # -- HTTP --------------------------------------------------------------
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, str, Dict[str, str], bytes]:
+        line = (await reader.readline()).decode("latin-1").strip()
+        method, path, _ = (line.split(" ", 2) + ["", ""])[:3]
+        headers: Dict[str, str] = {}
+        while True:
+            h = (await reader.readline()).decode("latin-1")
+            if h in ("\r\n", "\n", ""):
+                break
+            k, _, v = h.partition(":")
+            headers[k.strip().lower()] = v.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise PayloadTooLarge("body too large")
+        body = await reader.readexactly(length) if length else b""
+        path, _, query = path.partition("?")
+        return method.upper(), path, query, headers, body
+
+    @staticmethod
+    def _head(status: int, content_type: str, extra: str = "") -> bytes:
+        return (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\nConnection: close\r\n{extra}").encode("latin-1")
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Any, extra: str = "") -> None:
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        writer.write(self._head(status, "application/json", f"Content-Length: {len(data)}\r\n{extra}\r\n") + data)
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, path, query, _headers, body = await self._read_request(reader)
+            except PayloadTooLarge:
+                await self._send_json(writer, 413, {"error": f"body larger than {MAX_BODY_BYTES} bytes"})
+                return
+            except (ValueError, asyncio.IncompleteReadError):
+                await self._send_json(writer, 400, {"error": "malformed request"})
+                return
+
+            if path == "/healthz":
+                await self._send_json(writer, 200, {
+                    "status": "ok" if self.accepting else "draining",
+                    "in_flight": self.in_flight,
+                    "queued": self.admitted - self.in_flight,
+                    "uptime_s": round(time.time() - self.started, 1),
+                })
+                return
+            if path == "/metrics":
+                data = self.render_metrics().encode("utf-8")
+                writer.write(self._head(200, "text/plain; version=0.0.4",
+                                        f"Content-Length: {len(data)}\r\n\r\n") + data)
+                await writer.drain()
+                return
+            if path == "/autocomplete":
+                params = parse_qs(query)
+                try:
+                    k = int(params.get("k", ["5"])[0])
+                except ValueError:
+                    k = 5
+                self.metrics["autocomplete_total"] += 1
+                try:
+                    result = await self.agent.autocomplete(params.get("q", [""])[0], k)
+                except Exception as e:
+                    self.metrics["errors_total"] += 1
+                    await self._send_json(writer, 200, {"error": str(e)})
+                    return
+                await self._send_json(writer, 200, result)
+                return
+            if path == "/reload" and method == "POST":
+                from part2_implementation.settings import reload_settings
+
+                await self._send_json(writer, 200, {"reloaded": True, "settings": reload_settings().redacted()})
+                return
+            if path not in ("/run", "/run_stream"):
+                await self._send_json(writer, 404, {"error": f"unknown path {path}"})
+                return
+            if method != "POST":
+                await self._send_json(writer, 405, {"error": "use POST"})
+                return
+
+            self.metrics["requests_total"] += 1
+            try:
+                prompt = str(json.loads(body or b"{}")["prompt"])
+            except (ValueError, KeyError, TypeError):
+                await self._send_json(writer, 400, {"error": 'expected JSON body {"prompt": "..."}'})
+                return
+
+            stream = path == "/run_stream"
+            sink = self._submit(prompt, stream)
+            if sink is None:
+                self.metrics["rejected_total"] += 1
+                await self._send_json(writer, 429 if self.accepting else 503, {"error": "server busy, retry later"}, "Retry-After: 1\r\n")
+                return
+
+            if not stream:
+                try:
+                    result = await sink
+                except Exception as e:
+                    await self._send_json(writer, 200, {"error": str(e)})
+                    return
+                await self._send_json(writer, 200, result)
+                return
+
+            writer.write(self._head(200, "application/x-ndjson", "Transfer-Encoding: chunked\r\n\r\n"))
+            while True:
+                ev = await sink.get()
+                if ev is None:
+                    break
+                chunk = (json.dumps(ev, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                writer.write(f"{len(chunk):x}\r\n".encode("latin-1") + chunk + b"\r\n")
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    def render_metrics(self) -> str:
+        m = dict(self.metrics)
+        m["in_flight"] = self.in_flight
+        m["queue_depth"] = self.admitted - self.in_flight
+        m["workers"] = self.workers
+        m["place_cache_entries"] = len(getattr(self.agent, "place_cache", {}))
+        ors = getattr(self.agent, "ors", None)
+        osm = getattr(self.agent, "osm", None)
+        for server, names in ((ors, ("routes", "poi_tiles", "isochrones")), (osm, ("geocodes", "reverses", "pois"))):
+            for name in names:
+                cache = getattr(server, name, None)
+                if cache is not None:
+                    m[f"{name}_cache_hits"] = cache.hits
+                    m[f"{name}_cache_stale_hits"] = cache.stale_hits
+                    m[f"{name}_cache_misses"] = cache.misses
+        geo = getattr(osm, "geocode_stats", None)
+        if geo is not None:
+            # Hit rate with normalized keys vs. what plain strip().lower() keys would have hit
+            m["geocode_lookups"] = geo["lookups"]
+            m["geocode_key_hits"] = geo["hits"]
+            m["geocode_raw_key_hits"] = geo["raw_hits"]
+            m["place_aliases"] = len(osm.place_names.aliases)
+            m["autocomplete_places"] = len(osm.suggestions)
+        factors = getattr(ors, "road_factors", None)
+        if factors is not None:
+            m["road_factor_samples"] = factors.samples
+            m["road_factor_regions"] = len(factors.regions)
+            m["distance_estimates_total"] = factors.estimates
+        lines = [f"map_agent_{k} {v}\n" for k, v in m.items()]
+        from part2_implementation.servers.resilience import all_policies
+
+        for up, pol in all_policies().items():
+            for k, v in pol.stats.items():
+                lines.append(f'map_agent_upstream_{k}_total{{upstream="{up}"}} {v}\n')
+            lines.append(f'map_agent_upstream_circuit_open{{upstream="{up}"}} {int(pol.state == "open")}\n')
+            p95 = pol.percentile(0.95)
+            if p95 is not None:
+                lines.append(f'map_agent_upstream_latency_p95_seconds{{upstream="{up}"}} {p95:.4f}\n')
+        from part2_implementation.llm_cache import get_llm_cache
+        from part2_implementation.prompt_layout import USAGE
+
+        llm = get_llm_cache()
+        if llm is not None:
+            lines.append(f"map_agent_llm_cache_hits {llm.hits}\n")
+            lines.append(f"map_agent_llm_cache_misses {llm.misses}\n")
+
+        for prov, c in USAGE.snapshot().items():
+            lines.append(f'map_agent_llm_prompt_tokens_total{{provider="{prov}"}} {c["prompt_tokens"]}\n')
+            lines.append(f'map_agent_llm_cached_tokens_total{{provider="{prov}"}} {c["cached_tokens"]}\n')
+        ollama = getattr(self.agent, "_ollama", None)
+        if ollama is not None:
+            for k in ("prompt_tokens", "completion_tokens", "trimmed_results"):
+                lines.append(f"map_agent_ollama_{k}_total {ollama.stats[k]}\n")
+            for size, n in sorted(ollama.ctx_sizes.items()):
+                lines.append(f'map_agent_ollama_calls_total{{num_ctx="{size}"}} {n}\n')
+        router = getattr(self.agent, "_router", None)
+        for prov, h in (router.snapshot() if router is not None else {}).items():
+            lines.append(f'map_agent_provider_error_rate{{provider="{prov}"}} {h["error_rate"]}\n')
+            if h["p95_s"] is not None:
+                lines.append(f'map_agent_provider_latency_p95_seconds{{provider="{prov}"}} {h["p95_s"]}\n')
+        return "".join(lines)
+
+    # -- lifecycle ---------------------------------------------------------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        # Blocking HTTP/LLM calls run in threads; size the pool to the worker count
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max(8, self.workers * 2)))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        cfg = getattr(self.agent, "settings", None)
+        if cfg is not None and (cfg.provider == "ollama" or (
+                cfg.provider in ("auto", "race") and "ollama" in cfg.route_providers)):
+            # Load the local model now rather than on the first prompt
+            self._warmup = asyncio.create_task(self.agent.ollama.warm())
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def shutdown(self) -> None:
+        """Stop accepting, let queued work finish (bounded), then flush caches."""
+        self.accepting = False
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for _ in self._tasks:
+            await self.queue.put(None)
+        try:
+            await asyncio.wait_for(asyncio.gather(*self._tasks), self.drain_timeout_s)
+        except asyncio.TimeoutError:
+            for t in self._tasks:
+                t.cancel()
+        flush = getattr(self.agent, "flush_caches", None)
+        if flush is not None:
+            flush()
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        await self.start(host, port)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):  # e.g. Windows
+                pass
+        from part2_implementation.settings import install_reload_signal
+
+        install_reload_signal(loop)
+        try:
+            await stop.wait()
+        finally:
+            await self.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP service for the map assistant")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8, help="Max prompts processed concurrently")
+    parser.add_argument("--queue", type=int, default=64, help="Max prompts waiting before 429")
+    args = parser.parse_args()
+    service = AssistantService(workers=args.workers, queue_size=args.queue)
+    print(f"Serving map assistant on http://{args.host}:{args.port}")
+    asyncio.run(service.serve_forever(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Environment configuration, resolved once and reloadable on demand.
+
+``.env`` files (``part2_implementation/.env`` first, then one in the current
+directory) are read by :func:`load_env`; :func:`get_settings` returns a
+cached, typed :class:`Settings` snapshot built from the environment. Hot
+paths read attributes of that snapshot instead of calling ``os.getenv``.
+
+:func:`reload_settings` re-reads ``.env`` and the environment and swaps in
+a new snapshot; :func:`install_reload_signal` wires it to ``SIGHUP``.
+Variables set in the real process environment always win over ``.env``.
+Nothing here runs at import time, so importing the package stays cheap.
+"""
+import os
+import threading
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, List, Optional
+
+_BASE_DIR = os.path.dirname(__file__)
+_lock = threading.RLock()
+_env_loaded = False
+_settings: Optional["Settings"] = None
+# Keys present before any .env was applied; .env never overrides these
+_process_env_keys: Optional[set] = None
+# Values the last load_env() took from .env, so a forced reload can drop removed keys
+_env_applied: Dict[str, str] = {}
+_listeners: List[Callable[["Settings"], None]] = []
+
+
+def _read_env_files() -> Dict[str, str]:
+    try:
+        from dotenv import dotenv_values
+    except ImportError:  # python-dotenv is optional at runtime
+        return {}
+    merged: Dict[str, str] = {}
+    # Earlier files win, matching successive load_dotenv() calls
+    for path in (os.path.join(_BASE_DIR, ".env"), os.path.join(os.getcwd(), ".env")):
+        if os.path.exists(path):
+            for k, v in dotenv_values(path).items():
+                if v is not None:
+                    merged.setdefault(k, v)
+    return merged
+
+
+def load_env(force: bool = False) -> None:
+    """Apply ``.env`` files to ``os.environ`` (process variables win). Idempotent unless ``force``.
+
+    A forced reload also unsets keys an earlier call took from ``.env`` that
+    are no longer there (unless something else changed them since).
+    """
+    global _env_loaded, _process_env_keys
+    if _env_loaded and not force:
+        return
+    with _lock:
+        if _env_loaded and not force:
+            return
+        if _process_env_keys is None:
+            _process_env_keys = set(os.environ)
+        values = {k: v for k, v in _read_env_files().items() if k not in _process_env_keys}
+        for k, v in _env_applied.items():
+            if k not in values and os.environ.get(k) == v:
+                del os.environ[k]
+        os.environ.update(values)
+        _env_applied.clear()
+        _env_applied.update(values)
+        _env_loaded = True
+
+
+def _str(name: str, default: Optional[str] = None) -> Optional[str]:
+    v = os.getenv(name)
+    v = v.strip() if v is not None else None
+    return v if v else default
+
+
+def _int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _bool(name: str, default: bool = False) -> bool:
+    v = (os.getenv(name) or "").strip().lower()
+    if not v:
+        return default
+    return v not in ("0", "false", "no", "off")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Typed snapshot of the environment-derived configuration."""
+    # Provider routing
+    provider: str = "openai"
+    disable_openai: bool = False
+    openai_api_key: Optional[str] = None
+    openai_model: str = "gpt-4o"
+    gemini_api_key: Optional[str] = None
+    gemini_model: str = "gemini-2.0-flash"
+    # Serve the system/tools prefix from an explicit cachedContents resource
+    gemini_cached_content: bool = False
+    gemini_cache_ttl_s: float = 3600.0
+    ollama_url: str = "http://localhost:11434"
+    ollama_model: str = "llama3.1:8b-instruct"
+    # Context window is sized per call in power-of-two steps from
+    # ollama_min_ctx up to ollama_num_ctx (equal values disable sizing)
+    ollama_num_ctx: int = 8192
+    ollama_min_ctx: int = 2048
+    ollama_keep_alive: str = "30m"
+    ollama_batch_max: int = 8
+    ollama_batch_window_ms: float = 15.0
+    # Multi-round tool loop: model calls per prompt (incl. the final answer),
+    # wall-clock deadline and total token budget (0 = unlimited)
+    max_tool_rounds: int = 4
+    run_deadline_s: float = 60.0
+    run_token_budget: int = 0
+    # Require a tool call in the selection round (OpenAI "required", Gemini "ANY")
+    force_tool_call: bool = True
+    # Providers considered by MAP_AGENT_PROVIDER=auto|race, in preference order
+    route_providers: str = "openai,gemini,ollama"
+    # OpenStreetMap / Nominatim
+    osm_countrycodes: Optional[str] = None
+    osm_user_agent: str = "C5-MapAgent (educational)"
+    osm_min_interval_s: float = 1.0
+    # Geocode/reverse/POI-search answers
+    osm_cache_ttl_s: float = 86400.0
+    # OpenRouteService
+    ors_api_key: Optional[str] = None
+    ors_min_interval_s: float = 1.5
+    ors_route_ttl_s: float = 3600.0
+    ors_poi_tile_zoom: int = 15
+    ors_poi_tile_ttl_s: float = 86400.0
+    ors_isochrone_decimals: int = 3
+    ors_isochrone_ttl_s: float = 86400.0
+    # Directory of graphs built by servers/road_graph.py (one subdirectory per
+    # profile); routes are answered offline when set, ORS is the fallback
+    route_graph: Optional[str] = None
+    # OSM XML extract whose place=* nodes seed autocomplete (besides geocoded places)
+    autocomplete_extract: Optional[str] = None
+    # ors_distance: "auto" estimates locally once the region's road factor is
+    # calibrated, "approximate" always estimates, "exact" always routes
+    distance_mode: str = "auto"
+    road_factor_min_samples: int = 5
+    # Profiles routed by ors_compare_routes when the caller names none
+    compare_profiles: str = "driving-car,foot-walking,cycling-regular"
+    # Caches and transport
+    place_cache_path: Optional[str] = None
+    shared_cache_path: Optional[str] = None
+    shared_cache_ttl_s: float = 86400.0
+    http_pool_size: int = 32
+    # Map lookups: expired entries are served this long while being refreshed,
+    # and "no results" answers are cached for negative_cache_ttl_s
+    cache_stale_ttl_s: float = 3600.0
+    negative_cache_ttl_s: float = 300.0
+    # Content-addressed LLM response cache (opt-in)
+    llm_cache: bool = False
+    llm_cache_ttl_s: float = 3600.0
+    llm_cache_path: Optional[str] = None
+    # Upstream resilience (see servers/resilience.py)
+    upstream_retries: int = 2
+    hedge_upstreams: str = ""
+    breaker_failures: int = 5
+    breaker_cooldown_s: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        load_env()
+        d = cls()
+        return cls(
+            provider=(_str("MAP_AGENT_PROVIDER", d.provider)).lower(),
+            disable_openai=_bool("MAP_AGENT_DISABLE_OPENAI"),
+            openai_api_key=_str("OPENAI_API_KEY"),
+            openai_model=_str("MAP_AGENT_MODEL", d.openai_model),
+            gemini_api_key=_str("GEMINI_API_KEY"),
+            gemini_model=_str("GEMINI_MODEL", d.gemini_model),
+            gemini_cached_content=_bool("GEMINI_CACHED_CONTENT", d.gemini_cached_content),
+            gemini_cache_ttl_s=_float("GEMINI_CACHE_TTL_S", d.gemini_cache_ttl_s),
+            ollama_url=_str("OLLAMA_URL", d.ollama_url).rstrip("/"),
+            ollama_model=_str("OLLAMA_MODEL", d.ollama_model),
+            ollama_num_ctx=_int("OLLAMA_NUM_CTX", d.ollama_num_ctx),
+            ollama_min_ctx=_int("OLLAMA_MIN_CTX", d.ollama_min_ctx),
+            ollama_keep_alive=_str("OLLAMA_KEEP_ALIVE", d.ollama_keep_alive),
+            ollama_batch_max=_int("OLLAMA_BATCH_MAX", d.ollama_batch_max),
+            ollama_batch_window_ms=_float("OLLAMA_BATCH_WINDOW_MS", d.ollama_batch_window_ms),
+            max_tool_rounds=_int("MAP_AGENT_MAX_ROUNDS", d.max_tool_rounds),
+            run_deadline_s=_float("MAP_AGENT_DEADLINE_S", d.run_deadline_s),
+            run_token_budget=_int("MAP_AGENT_TOKEN_BUDGET", d.run_token_budget),
+            force_tool_call=_bool("MAP_AGENT_FORCE_TOOLS", d.force_tool_call),
+            route_providers=_str("MAP_AGENT_ROUTE_PROVIDERS", d.route_providers),
+            osm_countrycodes=_str("OSM_COUNTRYCODES"),
+            osm_user_agent=_str("OSM_USER_AGENT", d.osm_user_agent),
+            osm_min_interval_s=_float("OSM_MIN_INTERVAL_S", d.osm_min_interval_s),
+            osm_cache_ttl_s=_float("OSM_CACHE_TTL_S", d.osm_cache_ttl_s),
+            ors_api_key=_str("ORS_API_KEY"),
+            ors_min_interval_s=_float("ORS_MIN_INTERVAL_S", d.ors_min_interval_s),
+            ors_route_ttl_s=_float("ORS_ROUTE_TTL_S", d.ors_route_ttl_s),
+            ors_poi_tile_zoom=_int("ORS_POI_TILE_ZOOM", d.ors_poi_tile_zoom),
+            ors_poi_tile_ttl_s=_float("ORS_POI_TILE_TTL_S", d.ors_poi_tile_ttl_s),
+            ors_isochrone_decimals=_int("ORS_ISOCHRONE_DECIMALS", d.ors_isochrone_decimals),
+            ors_isochrone_ttl_s=_float("ORS_ISOCHRONE_TTL_S", d.ors_isochrone_ttl_s),
+            route_graph=_str("MAP_AGENT_ROUTE_GRAPH"),
+            autocomplete_extract=_str("MAP_AGENT_AUTOCOMPLETE_EXTRACT"),
+            distance_mode=_str("MAP_AGENT_DISTANCE_MODE", d.distance_mode).lower(),
+            road_factor_min_samples=_int("MAP_AGENT_ROAD_FACTOR_MIN_SAMPLES", d.road_factor_min_samples),
+            compare_profiles=_str("MAP_AGENT_COMPARE_PROFILES", d.compare_profiles),
+            place_cache_path=_str("MAP_AGENT_PLACE_CACHE"),
+            shared_cache_path=_str("MAP_AGENT_SHARED_CACHE"),
+            shared_cache_ttl_s=_float("MAP_AGENT_SHARED_CACHE_TTL_S", d.shared_cache_ttl_s),
+            http_pool_size=_int("MAP_AGENT_HTTP_POOL", d.http_pool_size),
+            cache_stale_ttl_s=_float("MAP_AGENT_CACHE_STALE_S", d.cache_stale_ttl_s),
+            negative_cache_ttl_s=_float("MAP_AGENT_NEGATIVE_TTL_S", d.negative_cache_ttl_s),
+            llm_cache=_bool("MAP_AGENT_LLM_CACHE", d.llm_cache),
+            llm_cache_ttl_s=_float("MAP_AGENT_LLM_CACHE_TTL_S", d.llm_cache_ttl_s),
+            llm_cache_path=_str("MAP_AGENT_LLM_CACHE_PATH"),
+            upstream_retries=_int("MAP_AGENT_UPSTREAM_RETRIES", d.upstream_retries),
+            hedge_upstreams=_str("MAP_AGENT_HEDGE", d.hedge_upstreams).lower(),
+            breaker_failures=_int("MAP_AGENT_BREAKER_FAILURES", d.breaker_failures),
+            breaker_cooldown_s=_float("MAP_AGENT_BREAKER_COOLDOWN_S", d.breaker_cooldown_s),
+        )
+
+    def redacted(self) -> Dict[str, object]:
+        """Settings as a dict with API keys masked (for logs and admin endpoints)."""
+        out = {}
+        for f in fields(self):
+            v = getattr(self, f.name)
+            out[f.name] = ("set" if v else None) if f.name.endswith("_api_key") else v
+        return out
+
+
+def get_settings() -> Settings:
+    """The current process-wide settings, resolved on first call."""
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                _settings = Settings.from_env()
+    return _settings
+
+
+def reload_settings() -> Settings:
+    """Re-read ``.env`` and the environment, publish a new snapshot and notify listeners."""
+    global _settings
+    with _lock:
+        load_env(force=True)
+        _settings = Settings.from_env()
+        listeners = list(_listeners)
+    for cb in listeners:
+        try:
+            cb(_settings)
+        except Exception:
+            pass
+    return _settings
+
+
+def on_reload(callback: Callable[[Settings], None]) -> None:
+    """Register ``callback(new_settings)`` to run after each reload."""
+    with _lock:
+        _listeners.append(callback)
+
+
+def install_reload_signal(loop=None) -> bool:
+    """Reload settings on ``SIGHUP`` (POSIX only). Returns False where unsupported."""
+    import signal
+
+    sig = getattr(signal, "SIGHUP", None)
+    if sig is None:
+        return False
+    try:
+        if loop is not None:
+            loop.add_signal_handler(sig, reload_settings)
+        else:
+            signal.signal(sig, lambda *_: reload_settings())
+    except (NotImplementedError, RuntimeError, ValueError):
+        return False
+    return True
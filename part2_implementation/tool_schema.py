@@ -0,0 +1,140 @@
+"""Validation and constrained-output schemas for tool calls.
+
+Each tool's ``parameters`` schema is compiled once into a nested closure
+that checks the JSON-schema subset used by ``TOOLS`` (type, properties,
+required, items, enum, minItems/maxItems, minimum/maximum). Providers'
+tool calls are checked before they reach Nominatim/ORS, so bad arguments
+cost nothing upstream.
+
+:func:`selection_schema` builds the JSON schema that constrains Ollama's
+output (``format``) to exactly one of the declared tools with valid
+arguments.
+"""
+from typing import Any, Callable, Dict, List, Optional
+
+# A compiled check: returns None if ``value`` is valid, else an error message
+Check = Callable[[Any, str], Optional[str]]
+
+_TYPES = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "boolean": lambda v: isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+}
+
+
+def compile_schema(schema: Dict[str, Any]) -> Check:
+    """Compile ``schema`` into a function ``check(value, path) -> error | None``."""
+    checks: List[Check] = []
+
+    typ = schema.get("type")
+    if typ in _TYPES:
+        is_type = _TYPES[typ]
+        checks.append(lambda v, p: None if is_type(v) else f"{p}: expected {typ}")
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        checks.append(lambda v, p: None if v in allowed else f"{p}: must be one of {allowed}")
+
+    lo, hi = schema.get("minimum"), schema.get("maximum")
+    if lo is not None or hi is not None:
+        def _range(v, p):
+            if not _TYPES["number"](v):
+                return None
+            if lo is not None and v < lo:
+                return f"{p}: must be >= {lo}"
+            if hi is not None and v > hi:
+                return f"{p}: must be <= {hi}"
+            return None
+        checks.append(_range)
+
+    if typ == "array":
+        min_n, max_n = schema.get("minItems"), schema.get("maxItems")
+        item_check = compile_schema(schema["items"]) if "items" in schema else None
+
+        def _array(v, p):
+            if min_n is not None and len(v) < min_n:
+                return f"{p}: needs at least {min_n} items"
+            if max_n is not None and len(v) > max_n:
+                return f"{p}: allows at most {max_n} items"
+            if item_check is not None:
+                for i, item in enumerate(v):
+                    err = item_check(item, f"{p}[{i}]")
+                    if err:
+                        return err
+            return None
+        checks.append(_array)
+
+    if typ == "object":
+        props = {k: compile_schema(s) for k, s in (schema.get("properties") or {}).items()}
+        required = list(schema.get("required") or [])
+
+        def _object(v, p):
+            for k in required:
+                if k not in v:
+                    return f"{p}.{k}: required"
+            for k, check in props.items():
+                if k in v:
+                    err = check(v[k], f"{p}.{k}")
+                    if err:
+                        return err
+            return None
+        checks.append(_object)
+
+    def check(value: Any, path: str = "arguments") -> Optional[str]:
+        # Type check runs first, so later checks can rely on the value's type
+        for c in checks:
+            err = c(value, path)
+            if err:
+                return err
+        return None
+
+    return check
+
+
+class ToolValidator:
+    """Precompiled argument validators for a list of function-calling tools."""
+
+    def __init__(self, tools: List[Dict[str, Any]]):
+        self.tools = tools
+        self._checks = {
+            t["function"]["name"]: compile_schema(t["function"].get("parameters") or {"type": "object"})
+            for t in tools
+        }
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._checks)
+
+    def validate(self, name: str, args: Any) -> Optional[str]:
+        """None if ``name(**args)`` is a valid call, else a short error message."""
+        check = self._checks.get(name)
+        if check is None:
+            return f"unknown tool {name!r}"
+        return check(args, "arguments")
+
+    def selection_schema(self) -> Dict[str, Any]:
+        """JSON schema for ``{"tool": <name>, "arguments": {...}}`` matching one declared tool."""
+        return {
+            "anyOf": [
+                {
+                    "type": "object",
+                    "properties": {
+                        "tool": {"type": "string", "enum": [t["function"]["name"]]},
+                        "arguments": t["function"].get("parameters") or {"type": "object"},
+                    },
+                    "required": ["tool", "arguments"],
+                }
+                for t in self.tools
+            ]
+        }
+
+    def batch_schema(self) -> Dict[str, Any]:
+        """JSON schema for ``{"choices": [selection, ...]}``."""
+        return {
+            "type": "object",
+            "properties": {"choices": {"type": "array", "items": self.selection_schema()}},
+            "required": ["choices"],
+        }
@@ -0,0 +1,127 @@
+"""Process-pool deployment mode for AgentsSDKMapAssistant.
+
+The coordinating (parent) process owns the global upstream rate limiters
+and the path of a shared cache file. Each of the N worker processes builds
+one assistant whose place/geocode and route caches are backed by that
+memory-mapped file, and whose Nominatim/ORS calls go through the shared
+limiters. Workers therefore scale JSON parsing, heuristic routing and
+report rendering across cores without multiplying upstream traffic.
+
+Usage (also available as ``demo_runner --batch ... --processes N``):
+    pool = AssistantProcessPool(processes=4)
+    result = pool.run("Distance from Beirut to Tripoli")
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterable, Optional, TextIO, Tuple
+
+from part2_implementation.servers.transport import SharedRateLimiter
+from part2_implementation.settings import get_settings
+
+# Per-worker state, set by _init_worker
+_AGENT = None
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker(cache_path: str, osm_limiter: SharedRateLimiter, ors_limiter: SharedRateLimiter) -> None:
+    global _AGENT, _LOOP
+    from part2_implementation.agent_sdk_app import AgentsSDKMapAssistant
+    from part2_implementation.servers.cache import SharedCache
+
+    agent = AgentsSDKMapAssistant()
+    cfg = agent.settings
+    ttl = cfg.shared_cache_ttl_s
+    policy = dict(stale_ttl=cfg.cache_stale_ttl_s, negative_ttl=cfg.negative_cache_ttl_s)
+    agent.osm.limiter = osm_limiter
+    agent.ors.limiter = ors_limiter
+    agent.place_cache = SharedCache(cache_path, "place", ttl)
+    agent.osm.geocodes = SharedCache(cache_path, "geocode", cfg.osm_cache_ttl_s, **policy)
+    agent.ors.routes = SharedCache(cache_path, "route", ttl, **policy)
+    # Routes cached by earlier runs calibrate approximate distances from the start
+    agent.ors.road_factors.calibrate_from(agent.ors.routes)
+    _AGENT = agent
+    # One long-lived loop per worker keeps its thread pool warm between prompts
+    _LOOP = asyncio.new_event_loop()
+    asyncio.set_event_loop(_LOOP)
+
+
+def _run_prompt(prompt: str) -> Dict[str, Any]:
+    return _LOOP.run_until_complete(_AGENT.run(prompt))
+
+
+class AssistantProcessPool:
+    """N worker processes sharing caches and globally rate-limited upstreams."""
+
+    def __init__(self, processes: Optional[int] = None, cache_path: Optional[str] = None,
+                 osm_interval_s: Optional[float] = None, ors_interval_s: Optional[float] = None):
+        cfg = get_settings()
+        ctx = multiprocessing.get_context("spawn")
+        self.processes = processes or os.cpu_count() or 1
+        self.cache_path = cache_path or cfg.shared_cache_path or os.path.join(
+            tempfile.gettempdir(), "map_agent_shared_cache.sqlite3"
+        )
+        self.osm_limiter = SharedRateLimiter(
+            cfg.osm_min_interval_s if osm_interval_s is None else osm_interval_s, ctx
+        )
+        # ORS free tier: 40 directions/minute -> one request every 1.5 s by default
+        self.ors_limiter = SharedRateLimiter(
+            cfg.ors_min_interval_s if ors_interval_s is None else ors_interval_s, ctx
+        )
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self.cache_path, self.osm_limiter, self.ors_limiter),
+        )
+
+    def submit(self, prompt: str):
+        return self.executor.submit(_run_prompt, prompt)
+
+    def run(self, prompt: str) -> Dict[str, Any]:
+        return self.submit(prompt).result()
+
+    def run_batch(self, prompts: Iterable[Tuple[Any, str]], out: TextIO) -> Dict[str, Any]:
+        """Stream ``(id, prompt)`` pairs through the pool, writing JSONL results as they finish."""
+        stats = {"ok": 0, "failed": 0}
+        started = time.monotonic()
+        pending: Dict[Any, Tuple[Any, str, float]] = {}
+
+        def _drain(block_until_one: bool) -> None:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED) if block_until_one else (
+                [f for f in pending if f.done()], None)
+            for fut in done:
+                pid, prompt, t0 = pending.pop(fut)
+                try:
+                    rec = {"id": pid, "prompt": prompt, "result": fut.result()}
+                    stats["ok"] += 1
+                except Exception as e:
+                    rec = {"id": pid, "prompt": prompt, "error": str(e)}
+                    stats["failed"] += 1
+                rec["elapsed_s"] = round(time.monotonic() - t0, 3)
+                out.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+
+        for pid, prompt in prompts:
+            # Keep a couple of prompts queued per worker, but never the whole input
+            while len(pending) >= self.processes * 2:
+                _drain(True)
+            pending[self.submit(prompt)] = (pid, prompt, time.monotonic())
+            _drain(False)
+        while pending:
+            _drain(True)
+        stats["elapsed_s"] = round(time.monotonic() - started, 3)
+        return stats
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self) -> "AssistantProcessPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
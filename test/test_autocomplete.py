@@ -0,0 +1,36 @@
+import asyncio
+
+from part2_implementation.servers.autocomplete import PlaceIndex
+from part2_implementation.servers.osm_server import OSMServer
+from part2_implementation.settings import Settings
+
+EXTRACT = """<?xml version="1.0"?><osm version="0.6">
+<node id="1" lat="33.89" lon="35.50"><tag k="place" v="city"/><tag k="name" v="Beirut"/>
+<tag k="name:ar" v="بيروت"/><tag k="population" v="2000000"/></node>
+<node id="2" lat="33.87" lon="35.56"><tag k="place" v="village"/><tag k="name" v="Beit Mery"/></node>
+</osm>"""
+
+
+def test_extract_that_appears_later_is_loaded(tmp_path):
+    path = tmp_path / "places.osm"
+    osm = OSMServer(settings=Settings(autocomplete_extract=str(path)))
+
+    async def scenario():
+        missing = await osm.autocomplete("bei")
+        path.write_text(EXTRACT, encoding="utf-8")
+        return missing, await osm.autocomplete("bei")
+
+    missing, found = asyncio.run(scenario())
+    assert missing["error"] == "Could not read autocomplete extract"
+    assert [s.name for s in found] == ["Beirut", "Beit Mery"]
+
+
+def test_short_and_long_prefixes_rank_by_popularity():
+    index = PlaceIndex(top_k=3)
+    index.add("a", "Hamra Street", 33.9, 35.48, popularity=1.0)
+    index.add("b", "Hamza Mosque", 33.9, 35.49, popularity=1.0)
+    index.add("b", "Hamza Mosque", 33.9, 35.49, popularity=2.0)
+    assert [s.name for s in index.complete("ham")] == ["Hamza Mosque", "Hamra Street"]
+    assert [s.name for s in index.complete("hamr")] == ["Hamra Street"]
+    # Later words are indexed too, labelled with the full name
+    assert [s.name for s in index.complete("street")] == ["Hamra Street"]
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from part2_implementation.servers.cache import SharedCache, TTLCache, classify_result
+
+
+@pytest.fixture(params=["ttl", "shared"])
+def make_cache(request, tmp_path):
+    def make(ttl, stale_ttl=0.0, negative_ttl=300.0):
+        if request.param == "ttl":
+            return TTLCache(ttl, stale_ttl=stale_ttl, negative_ttl=negative_ttl)
+        return SharedCache(str(tmp_path / "shared.sqlite3"), "test", ttl, stale_ttl=stale_ttl,
+                           negative_ttl=negative_ttl)
+    return make
+
+
+class _Loader:
+    def __init__(self, *values, delay_s=0.0):
+        self.values = list(values)
+        self.delay_s = delay_s
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay_s)
+        return self.values[min(self.calls, len(self.values)) - 1]
+
+
+def test_classify_result():
+    assert classify_result({"lat": 1}) == "ok"
+    assert classify_result([]) == "negative"
+    assert classify_result({"error": "No results", "not_found": True}) == "negative"
+    assert classify_result({"error": "ORS HTTP 503", "transient": True}) == "skip"
+
+
+def test_stale_entry_is_served_while_it_revalidates(make_cache):
+    cache = make_cache(0.05, stale_ttl=60.0)
+    load = _Loader({"v": 1}, {"v": 2})
+
+    async def scenario():
+        first = await cache.fetch("k", load)
+        await asyncio.sleep(0.06)
+        stale = await cache.fetch("k", load)  # answered at once; refresh runs in the background
+        await asyncio.sleep(0.01)
+        return first, stale, await cache.fetch("k", load)
+
+    assert asyncio.run(scenario()) == ({"v": 1}, {"v": 1}, {"v": 2})
+    assert load.calls == 2
+    assert cache.stale_hits == 1
+
+
+def test_concurrent_misses_share_one_load(make_cache):
+    cache = make_cache(60.0)
+    load = _Loader({"v": 1}, delay_s=0.02)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.fetch("k", load) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [{"v": 1}] * 5
+    assert load.calls == 1
+
+
+def test_not_found_is_cached_for_the_negative_ttl_only(make_cache):
+    cache = make_cache(60.0, negative_ttl=0.05)
+    load = _Loader({"error": "No results", "not_found": True}, {"v": 1})
+
+    async def scenario():
+        a = await cache.fetch("k", load)
+        b = await cache.fetch("k", load)
+        await asyncio.sleep(0.06)
+        return a, b, await cache.fetch("k", load)
+
+    a, b, c = asyncio.run(scenario())
+    assert a == b == {"error": "No results", "not_found": True}
+    assert c == {"v": 1}
+    assert load.calls == 2
+
+
+def test_errors_are_never_cached_and_keep_the_stale_entry(make_cache):
+    cache = make_cache(0.05, stale_ttl=60.0)
+    load = _Loader({"v": 1}, {"error": "ORS HTTP 503", "transient": True}, {"v": 2})
+
+    async def scenario():
+        await cache.fetch("k", load)
+        await asyncio.sleep(0.06)
+        await cache.fetch("k", load)  # background refresh fails
+        await asyncio.sleep(0.01)
+        return await cache.fetch("k", load)  # still stale: served, refreshed again
+
+    assert asyncio.run(scenario()) == {"v": 1}
+    assert load.calls == 3
+    miss = make_cache(60.0)
+    fail = _Loader({"error": "timeout", "transient": True}, {"v": 3})
+    assert asyncio.run(miss.fetch("x", fail))["error"] == "timeout"
+    assert asyncio.run(miss.fetch("x", fail)) == {"v": 3}
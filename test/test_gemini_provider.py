@@ -0,0 +1,37 @@
+import asyncio
+
+from part2_implementation import gemini_provider
+from part2_implementation.settings import Settings
+
+TOOLS = [{"type": "function", "function": {
+    "name": "osm_geocode", "description": "Geocode a place",
+    "parameters": {"type": "object", "properties": {"place": {"type": "string"}}, "required": ["place"]},
+}}]
+
+
+def _fake_generate(calls, reply):
+    async def _agenerate(contents, tools=None, auto=True, generation_config=None, settings=None, system=None,
+                         mode=None):
+        calls.append({"contents": contents, "tools": tools, "system": system, "mode": mode, "auto": auto})
+        return reply
+    return _agenerate
+
+
+def test_summarize_shares_the_selection_prefix(monkeypatch):
+    calls = []
+    reply = {"candidates": [{"content": {"parts": [{"text": "Beirut is at 33.89, 35.50."}]}}]}
+    monkeypatch.setattr(gemini_provider, "_agenerate", _fake_generate(calls, reply))
+    cfg = Settings(gemini_api_key="k")
+
+    async def scenario():
+        await gemini_provider.select_tools("where is Beirut", TOOLS, settings=cfg)
+        return await gemini_provider.summarize("where is Beirut", [{"tool": "osm_geocode", "content": {}}], TOOLS,
+                                               settings=cfg)
+
+    assert asyncio.run(scenario()) == "Beirut is at 33.89, 35.50."
+    select, summary = calls
+    assert summary["mode"] == "NONE"
+    assert summary["tools"] is select["tools"]
+    assert summary["tools"][0]["functionDeclarations"][0]["name"] == "osm_geocode"
+    assert summary["system"] == select["system"]
+    assert "Tool results JSON" in summary["contents"][0]["parts"][0]["text"]
@@ -0,0 +1,20 @@
+import importlib.util
+import os
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    "importtime_check", Path(__file__).resolve().parents[1] / "tools" / "importtime_check.py")
+importtime_check = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(importtime_check)
+
+MODULE = "part2_implementation.agent_sdk_app"
+
+
+def test_agent_import_is_within_budget_and_lazy():
+    budget_ms = float(os.getenv("MAP_AGENT_IMPORT_BUDGET_MS", "150"))
+    # Best of three, as the script does, to smooth out a cold disk cache
+    runs = [importtime_check.measure(MODULE) for _ in range(3)]
+    best = min(runs, key=lambda times: times.get(MODULE, 0))
+    assert MODULE in best
+    assert best[MODULE] / 1000 <= budget_ms
+    assert [m for m in importtime_check.LAZY if m in best] == []
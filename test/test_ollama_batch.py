@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import pytest
+
+from part2_implementation.ollama_client import OllamaClient
+from part2_implementation.settings import Settings
+from part2_implementation.tool_schema import ToolValidator
+
+TOOLS = [{"type": "function", "function": {
+    "name": "osm_geocode", "description": "Geocode a place",
+    "parameters": {"type": "object", "properties": {"place": {"type": "string"}}, "required": ["place"]},
+}}]
+
+
+def _client():
+    return OllamaClient(ToolValidator(TOOLS), settings=Settings(ollama_batch_max=8, ollama_batch_window_ms=5))
+
+
+def _choice(place):
+    return {"tool": "osm_geocode", "arguments": {"place": place}}
+
+
+def test_invalid_batch_entry_is_retried_alone():
+    client = _client()
+    singles = []
+
+    async def chat(system, user, fmt=None, reserve=0):
+        if system == client.batch_system:
+            # The second entry misses its required argument
+            return json.dumps({"choices": [_choice("Beirut"), {"tool": "osm_geocode", "arguments": {}}]})
+        singles.append(user)
+        return json.dumps(_choice("Tripoli"))
+
+    client.chat = chat
+
+    async def scenario():
+        return await asyncio.gather(client.choose_tool("where is Beirut"), client.choose_tool("where is Tripoli"))
+
+    assert asyncio.run(scenario()) == [_choice("Beirut"), _choice("Tripoli")]
+    assert singles == ["Prompt: where is Tripoli"]
+    assert client.stats["batches"] == 1
+    assert client.stats["parse_failures"] == 1
+
+
+@pytest.mark.parametrize("error", [RuntimeError("boom"), asyncio.CancelledError()])
+def test_failed_batch_does_not_leave_callers_waiting(error):
+    client = _client()
+
+    async def choose_many(prompts):
+        raise error
+
+    client._choose_many = choose_many
+
+    async def scenario():
+        return await asyncio.wait_for(
+            asyncio.gather(client.choose_tool("a"), client.choose_tool("b")), timeout=1.0)
+
+    assert asyncio.run(scenario()) == [None, None]
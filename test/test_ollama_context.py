@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from part2_implementation.ollama_client import compact_json, ctx_bucket, estimate_tokens
+
+
+@pytest.mark.parametrize("tokens, size", [
+    (0, 2048), (2048, 2048), (2049, 4096), (5000, 8192), (8192, 8192), (9000, 8192), (10 ** 6, 8192),
+])
+def test_context_is_a_power_of_two_multiple_of_the_minimum(tokens, size):
+    assert ctx_bucket(tokens, 2048, 8192) == size
+
+
+def test_cap_below_the_minimum_wins():
+    assert ctx_bucket(100, 4096, 2048) == 2048
+    assert ctx_bucket(5000, 3000, 10000) == 6000
+
+
+def test_estimate_counts_words_digits_and_punctuation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Beirut") == 2
+    assert estimate_tokens("33.8938") == 4
+    assert estimate_tokens('{"a":1}') == 7
+
+
+def test_small_results_are_sent_whole():
+    result = {"distance_km": 12.345678901, "names": ["Beirut", "Byblos"]}
+    text, trimmed = compact_json(result, 100)
+    assert not trimmed
+    assert json.loads(text) == result
+    assert " " not in text
+
+
+def test_large_results_are_shortened_to_fit():
+    route = {"summary": {"distance": 86012.123456789},
+             "geometry": [[35.5 + i / 1e4, 33.9 + i / 1e4] for i in range(2000)]}
+    text, trimmed = compact_json(route, 300)
+    assert trimmed
+    assert estimate_tokens(text) <= 300
+    data = json.loads(text)
+    assert data["summary"] == {"distance": 86012.12346}
+    assert data["geometry"][-1] == f"... {2000 - (len(data['geometry']) - 1)} more"
+
+
+def test_unshrinkable_text_is_cut():
+    text, trimmed = compact_json({"note": "word " * 500}, 20)
+    assert trimmed
+    assert text.endswith("...") and len(text) == 43
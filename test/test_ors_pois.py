@@ -0,0 +1,87 @@
+import asyncio
+
+from part2_implementation.servers import resilience, transport
+from part2_implementation.servers.geo import bbox_area_m2, bbox_around, tile_chunks, tile_range_bbox, tiles_for_bbox
+from part2_implementation.servers.ors_server import ORSServer
+from part2_implementation.settings import Settings
+
+ZOOM = 15
+MAX_AREA_M2 = 45e6
+
+
+class _Response:
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+
+class _ORS:
+    """Stands in for the pooled requests session; ``answer(bbox)`` builds each /pois response."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.bboxes = []
+
+    def request(self, method, url, json=None, **kwargs):
+        (west, south), (east, north) = json["geometry"]["bbox"]
+        self.bboxes.append((west, south, east, north))
+        return self.answer((west, south, east, north))
+
+
+def _features(n, lon, lat):
+    return [{"geometry": {"coordinates": [lon, lat]},
+             "properties": {"osm_id": i, "osm_tags": {"name": f"Shop {i}"},
+                            "category_ids": {"1": {"category_name": "pharmacy", "category_group": "healthcare"}}}}
+            for i in range(n)]
+
+
+def _covered(chunks):
+    return [(x, y) for x0, y0, x1, y1 in chunks for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def test_tile_chunks_cover_a_large_radius_within_the_area_limit():
+    tiles = list(tiles_for_bbox(bbox_around(35.5, 33.89, 5000), ZOOM))
+    chunks = tile_chunks(tiles, ZOOM, MAX_AREA_M2)
+    assert len(chunks) > 1
+    assert all(bbox_area_m2(tile_range_bbox(*c, ZOOM)) <= MAX_AREA_M2 for c in chunks)
+    covered = _covered(chunks)
+    assert sorted(covered) == sorted(tiles)  # every tile exactly once
+
+
+def test_tile_chunks_only_cover_missing_tiles():
+    tiles = [(100, 100), (101, 100), (100, 101), (103, 100)]
+    chunks = tile_chunks(tiles, ZOOM, MAX_AREA_M2)
+    assert sorted(_covered(chunks)) == sorted(tiles)
+    assert (100, 100, 101, 100) in chunks
+
+
+def _nearby(monkeypatch, answer, **kwargs):
+    monkeypatch.setattr(resilience, "_policies", {})
+    upstream = _ORS(answer)
+    monkeypatch.setattr(transport, "_session", upstream)
+    ors = ORSServer(settings=Settings(ors_api_key="k"))
+    return ors, upstream, asyncio.run(ors.nearby(33.89, 35.5, **kwargs))
+
+
+def test_nearby_surfaces_the_ors_http_error(monkeypatch):
+    _, _, out = _nearby(monkeypatch, lambda bbox: _Response({"error": "Access denied"}, 403))
+    assert out == {"error": "ORS HTTP 403", "detail": {"error": "Access denied"}}
+
+
+def test_dense_tile_is_kept_as_partial(monkeypatch):
+    def answer(bbox):
+        # Every rectangle is "full": 2000 POIs at its centre
+        return _Response({"features": _features(2000, (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)})
+
+    ors, upstream, out = _nearby(monkeypatch, answer, radius_m=1500, k=5)
+    assert isinstance(out, list) and len(out) == 5
+    tiles = set(tiles_for_bbox(bbox_around(35.5, 33.89, 1500), ZOOM))
+    assert len(tiles) > 1
+    # Rectangles were halved down to single tiles, each cached as partial
+    assert ors.partial_poi_tiles == tiles
+    assert len(upstream.bboxes) == 2 * len(tiles) - 1
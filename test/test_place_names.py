@@ -0,0 +1,71 @@
+import asyncio
+
+from part2_implementation.servers import transport
+from part2_implementation.servers.osm_server import OSMServer
+from part2_implementation.servers.place_names import PlaceNames
+from part2_implementation.settings import Settings
+
+PARIS_TX = {"lat": "33.66", "lon": "-95.55", "osm_type": "relation", "osm_id": 115357,
+            "display_name": "Paris, Lamar County, Texas, United States", "namedetails": {"name": "Paris"}}
+PARIS_FR = {"lat": "48.85", "lon": "2.35", "osm_type": "relation", "osm_id": 7444,
+            "display_name": "Paris, Île-de-France, France",
+            "namedetails": {"name": "Paris", "name:it": "Parigi", "name:ar": "باريس"}}
+
+
+class _Response:
+    ok = True
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class _Nominatim:
+    """Stands in for the pooled requests session; answers /search by query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def request(self, method, url, params=None, **kwargs):
+        self.queries.append(params["q"])
+        return _Response([PARIS_TX if "texas" in params["q"].lower() else PARIS_FR])
+
+
+def test_qualified_query_does_not_alias_bare_name():
+    names = PlaceNames()
+    assert names.learn(names.key("Paris, Texas")[0], PARIS_TX) == 0
+    assert names.key("Paris")[0] == "paris"
+
+
+def test_names_of_the_hit_become_aliases():
+    names = PlaceNames()
+    assert names.learn(names.key("Paris")[0], PARIS_FR) == 2
+    assert names.key("Parigi")[0] == "paris"
+    assert names.key("باريس")[0] == "paris"
+
+
+def test_canonical_key_is_never_aliased():
+    names = PlaceNames()
+    names.learn("parigi", {"display_name": "Parigi", "namedetails": {"name": "Parigi"}})
+    names.learn("paris", PARIS_FR)
+    assert names.key("Parigi")[0] == "parigi"
+
+
+def test_paris_after_paris_texas(monkeypatch):
+    upstream = _Nominatim()
+    monkeypatch.setattr(transport, "_session", upstream)
+    osm = OSMServer(settings=Settings(osm_min_interval_s=0.0))
+
+    async def scenario():
+        texas = await osm.geocode("Paris, Texas")
+        paris = await osm.geocode("Paris")
+        return texas, paris, await osm.autocomplete("par")
+
+    texas, paris, suggestions = asyncio.run(scenario())
+    assert (texas.lat, texas.lon) == (33.66, -95.55)
+    assert (paris.lat, paris.lon) == (48.85, 2.35)
+    assert upstream.queries == ["Paris, Texas", "Paris"]
+    assert {(s.lat, s.lon) for s in suggestions} == {(33.66, -95.55), (48.85, 2.35)}
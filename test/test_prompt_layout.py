@@ -0,0 +1,36 @@
+import json
+from types import SimpleNamespace
+
+from part2_implementation.agent_sdk_app import TOOLS
+from part2_implementation.prompt_layout import PromptCacheStats, canonical, canonical_tools
+
+
+def test_canonical_sorts_keys_at_every_level_but_keeps_list_order():
+    a = canonical({"b": [{"y": 1, "x": 2}, 3], "a": {"d": 1, "c": 2}})
+    assert json.dumps(a) == '{"a": {"c": 2, "d": 1}, "b": [{"x": 2, "y": 1}, 3]}'
+
+
+def test_canonical_tools_are_byte_stable_and_built_once():
+    first = canonical_tools(TOOLS)
+    assert canonical_tools(TOOLS) is first
+    names = [t["function"]["name"] for t in first]
+    assert names == sorted(t["function"]["name"] for t in TOOLS)
+    # A copy declared in another order (and key order) serialises to the same bytes
+    shuffled = [{k: t[k] for k in reversed(list(t))} for t in reversed(TOOLS)]
+    again = canonical_tools(shuffled)
+    assert again is not first
+    assert json.dumps(again) == json.dumps(first)
+    # The declared list is left as it was
+    assert TOOLS[0]["function"]["name"] == "osm_geocode"
+
+
+def test_cached_prompt_tokens_are_counted_per_provider():
+    stats = PromptCacheStats()
+    details = SimpleNamespace(cached_tokens=1024)
+    stats.record_openai(SimpleNamespace(usage=SimpleNamespace(prompt_tokens=1500, prompt_tokens_details=details)))
+    stats.record_openai(SimpleNamespace(usage=None))
+    stats.record_gemini({"usageMetadata": {"promptTokenCount": 800}})
+    assert stats.snapshot() == {
+        "openai": {"requests": 1, "prompt_tokens": 1500, "cached_tokens": 1024},
+        "gemini": {"requests": 1, "prompt_tokens": 800, "cached_tokens": 0},
+    }
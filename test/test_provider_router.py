@@ -0,0 +1,78 @@
+import asyncio
+
+from part2_implementation.provider_router import ProviderRouter
+
+
+def _router(**latencies):
+    """Router with a history per provider: a latency in seconds per success, None per failure."""
+    router = ProviderRouter()
+    for name, calls in latencies.items():
+        for lat in calls:
+            router._h(name).record(lat is not None, lat or 0.0)
+    return router
+
+
+def test_ranking_prefers_untried_then_fast_then_healthy():
+    router = _router(
+        openai=[0.9] * 5,
+        gemini=[0.3] * 5,
+        flaky=[0.1, None, None, None, None],  # fastest, but 80% errors
+        down=[None, None],
+    )
+    assert router.ranked(["openai", "down", "flaky", "gemini", "ollama"]) == [
+        "ollama", "gemini", "openai", "down", "flaky"]
+    # Too few samples to call it unhealthy: only the lack of successes counts against it
+    assert router.healthy("down") and not router.healthy("flaky")
+
+
+def test_ties_keep_the_configured_order():
+    router = _router(a=[0.2], b=[0.2])
+    assert router.ranked(["b", "a"]) == ["b", "a"]
+    assert router.ranked(["c", "d"]) == ["c", "d"]
+
+
+def test_race_returns_the_first_success_and_cancels_the_rest():
+    router = ProviderRouter()
+    cleaned_up = []
+
+    async def fn(name):
+        try:
+            await asyncio.sleep({"fast": 0.01, "slow": 1.0}[name])
+        finally:
+            cleaned_up.append(name)
+        return f"{name} answer"
+
+    assert asyncio.run(router.race(["slow", "fast"], fn)) == ("fast", "fast answer")
+    # The loser was cancelled and its cleanup ran before race returned
+    assert sorted(cleaned_up) == ["fast", "slow"]
+    assert router.health["fast"].samples == 1
+    assert "slow" not in router.health
+
+
+def test_race_skips_failures_and_none():
+    router = ProviderRouter()
+
+    async def fn(name):
+        await asyncio.sleep({"boom": 0.0, "empty": 0.01, "ok": 0.02}[name])
+        if name == "boom":
+            raise RuntimeError("upstream 500")
+        return None if name == "empty" else "answer"
+
+    assert asyncio.run(router.race(["boom", "empty", "ok"], fn)) == ("ok", "answer")
+    assert router.health["boom"].error_rate == 1.0
+    assert router.health["empty"].error_rate == 1.0
+    assert asyncio.run(router.race(["boom", "empty"], fn)) == (None, None)
+
+
+def test_first_falls_through_to_the_next_provider():
+    router = ProviderRouter()
+    tried = []
+
+    async def fn(name):
+        tried.append(name)
+        if name == "openai":
+            raise RuntimeError("quota")
+        return None if name == "gemini" else "answer"
+
+    assert asyncio.run(router.first(["openai", "gemini", "ollama"], fn)) == ("ollama", "answer")
+    assert tried == ["openai", "gemini", "ollama"]
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+from part2_implementation.servers.resilience import CircuitOpenError, UpstreamPolicy
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _Upstream:
+    """Blocking ``fn(timeout)`` that plays back ``outcomes`` (status codes, exceptions or delays)."""
+
+    def __init__(self, *outcomes, delay_s=0.0):
+        self.outcomes = list(outcomes)
+        self.delay_s = delay_s
+        self.calls = 0
+
+    def __call__(self, timeout):
+        self.calls += 1
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        out = self.outcomes[min(self.calls, len(self.outcomes)) - 1]
+        if isinstance(out, BaseException):
+            raise out
+        return _Response(out)
+
+
+def _policy(**kwargs):
+    return UpstreamPolicy("test", **{"retries": 0, "backoff_s": 0.0, "failure_threshold": 3,
+                                     "cooldown_s": 60.0, **kwargs})
+
+
+def _open(pol):
+    down = _Upstream(requests.ConnectionError("down"))
+    for _ in range(pol.failure_threshold):
+        with pytest.raises(requests.ConnectionError):
+            asyncio.run(pol.call(down, idempotent=True))
+    return down
+
+
+def test_breaker_opens_after_threshold_and_short_circuits():
+    pol = _policy()
+    down = _open(pol)
+    assert pol.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(pol.call(down, idempotent=True))
+    assert down.calls == pol.failure_threshold
+    assert pol.stats["short_circuited"] == 1
+
+
+def test_exactly_one_half_open_probe():
+    pol = _policy(cooldown_s=0.05)
+    _open(pol)
+    time.sleep(0.06)
+    up = _Upstream(200, delay_s=0.1)
+
+    async def scenario():
+        return await asyncio.gather(pol.call(up), pol.call(up), return_exceptions=True)
+
+    first, second = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert isinstance(second, CircuitOpenError)
+    assert up.calls == 1
+    assert pol.state == "closed"
+
+
+def test_cancelled_probe_frees_its_slot():
+    pol = _policy(cooldown_s=0.05)
+    _open(pol)
+    time.sleep(0.06)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pol.call(_Upstream(200, delay_s=0.3)), 0.05)
+        # Neither success nor failure: still half-open, and the next call is let through
+        assert pol.state == "half_open"
+        return await pol.call(_Upstream(200))
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert pol.state == "closed"
+
+
+def test_5xx_is_retried():
+    pol = _policy(retries=2)
+    up = _Upstream(503, 200)
+    assert asyncio.run(pol.call(up, idempotent=True)).status_code == 200
+    assert up.calls == 2
+    assert pol.stats["retries"] == 1
+    assert pol.state == "closed"
+
+
+def test_retries_stop_once_the_breaker_opens():
+    pol = _policy(retries=5, failure_threshold=2)
+    up = _Upstream(503)
+    assert asyncio.run(pol.call(up, idempotent=True)).status_code == 503
+    assert up.calls == 2
+    assert pol.state == "open"
+
+
+def test_latest_network_error_wins_over_earlier_5xx():
+    pol = _policy(retries=1)
+    up = _Upstream(503, requests.ConnectionError("reset"))
+    with pytest.raises(requests.ConnectionError):
+        asyncio.run(pol.call(up, idempotent=True))
+    assert up.calls == 2
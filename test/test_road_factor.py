@@ -0,0 +1,75 @@
+import pytest
+
+from part2_implementation.servers.geo import haversine_pairs_m
+from part2_implementation.servers.records import RouteSummary
+from part2_implementation.servers.road_factor import PRIOR_FACTOR, RoadFactorModel
+
+BEIRUT = [35.5018, 33.8938]
+# ~10-20 km trips out of Beirut (same band, same zoom-6 region)
+NEARBY = [[35.60, 33.95], [35.58, 33.82], [35.62, 33.90], [35.55, 34.00], [35.65, 33.98]]
+# ~8000 km away: another region, same trip-length band
+FAR = [[-73.98, 40.75], [-73.90, 40.85]]
+
+
+def _gc_km(a, b):
+    return float(haversine_pairs_m([a[0]], [a[1]], [b[0]], [b[1]])[0]) / 1000
+
+
+def _learned(factors, min_samples=5):
+    model = RoadFactorModel(min_samples)
+    for dest, f in zip(NEARBY, factors):
+        assert model.observe(BEIRUT, dest, _gc_km(BEIRUT, dest) * f)
+    return model
+
+
+def test_prior_until_enough_samples():
+    model = _learned([1.5] * 4)
+    assert model.factor(BEIRUT, NEARBY[0]) == (PRIOR_FACTOR, 0.18, "prior")
+    assert not model.calibrated(BEIRUT, NEARBY[0])
+    model.observe(BEIRUT, NEARBY[4], _gc_km(BEIRUT, NEARBY[4]) * 1.5)
+    f, std, source = model.factor(BEIRUT, NEARBY[0])
+    assert source == "region" and f == pytest.approx(1.5)
+    assert std == pytest.approx(0.03)  # identical samples: the floor applies
+    assert model.calibrated(BEIRUT, NEARBY[0])
+
+
+def test_other_regions_fall_back_to_the_band_mean():
+    model = _learned([1.2, 1.3, 1.4, 1.5, 1.6])
+    f, std, source = model.factor(FAR[0], FAR[1])
+    assert source == "global"
+    assert f == pytest.approx(1.4)
+    assert std == pytest.approx(0.1581, abs=1e-3)
+    assert model.estimate(FAR[0], FAR[1]).approximate
+
+
+def test_estimate_scales_the_great_circle_with_a_range():
+    model = _learned([1.4] * 5)
+    gc = _gc_km(BEIRUT, NEARBY[2])
+    est = model.estimate(BEIRUT, NEARBY[2])
+    assert est.distance_km == pytest.approx(gc * 1.4, abs=0.01)
+    low, high = est.distance_range_km
+    assert gc <= low < est.distance_km < high
+    assert model.estimates == 1
+
+
+@pytest.mark.parametrize("dest, road_km", [
+    ([35.5019, 33.8939], 0.5),  # too short to measure a detour
+    (NEARBY[0], 1.0),  # shorter than the straight line
+    (NEARBY[0], 500.0),  # implausible detour
+])
+def test_inconsistent_samples_are_rejected(dest, road_km):
+    model = RoadFactorModel()
+    assert not model.observe(BEIRUT, dest, road_km)
+    assert model.samples == 0
+
+
+def test_calibrates_from_exact_two_point_routes_only():
+    routes = {
+        ("driving-car", (tuple(BEIRUT), tuple(d))): RouteSummary(distance_km=_gc_km(BEIRUT, d) * 1.3)
+        for d in NEARBY
+    }
+    routes[("driving-car", (tuple(BEIRUT), tuple(NEARBY[0]), tuple(NEARBY[1])))] = RouteSummary(distance_km=40.0)
+    routes[("driving-car", (tuple(FAR[0]), tuple(FAR[1])))] = RouteSummary(distance_km=20.0, approximate=True)
+    model = RoadFactorModel()
+    assert model.calibrate_from(routes) == 5
+    assert model.calibrated(BEIRUT, NEARBY[0])
@@ -0,0 +1,85 @@
+import math
+import shutil
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from part2_implementation.servers.road_graph import RoadGraph, build  # noqa: E402
+
+# A jittered 4x4 street grid (ids 1-16), a one-way row, a one-way spur into
+# a dead end (17) and a separate two-node island (18, 19)
+_GRID = [(r, c) for r in range(4) for c in range(4)]
+_JITTER = [0.0, 0.00031, -0.00017, 0.00023, -0.00029, 0.00011, 0.00037, -0.00007,
+           0.00019, -0.00033, 0.00005, 0.00027, -0.00013, 0.00041, -0.00021, 0.00009]
+
+
+def _node(i, lat, lon):
+    return f'<node id="{i}" lat="{lat:.6f}" lon="{lon:.6f}"/>'
+
+
+def _way(i, refs, **tags):
+    nds = "".join(f'<nd ref="{r}"/>' for r in refs)
+    tags = {"highway": "residential", **tags}
+    return f'<way id="{i}">{nds}' + "".join(f'<tag k="{k}" v="{v}"/>' for k, v in tags.items()) + "</way>"
+
+
+def _extract(path):
+    nodes = [_node(r * 4 + c + 1, 33.89 + r * 0.004 + _JITTER[r * 4 + c], 35.50 + c * 0.005 - _JITTER[c * 4 + r])
+             for r, c in _GRID]
+    nodes += [_node(17, 33.8865, 35.5005), _node(18, 33.95, 35.60), _node(19, 33.952, 35.603)]
+    ways = [_way(100 + r, [r * 4 + c + 1 for c in range(4)], name=f"Row {r}",
+                 **({"oneway": "yes"} if r == 1 else {})) for r in range(4)]
+    ways += [_way(200 + c, [r * 4 + c + 1 for r in range(4)], name=f"Column {c}") for c in range(4)]
+    ways += [_way(300, [1, 17], oneway="yes"), _way(301, [18, 19], highway="primary")]
+    path.write_text('<?xml version="1.0"?><osm version="0.6">' + "".join(nodes + ways) + "</osm>")
+
+
+@pytest.fixture(scope="module")
+def graphs(tmp_path_factory):
+    root = tmp_path_factory.mktemp("graph")
+    _extract(root / "tiny.osm")
+    build(str(root / "tiny.osm"), str(root / "plain"))
+    shutil.copytree(root / "plain", root / "ch")
+    RoadGraph(str(root / "ch")).contract()
+    return RoadGraph(str(root / "plain")), RoadGraph(str(root / "ch"))
+
+
+def _nodes(g, s, edges):
+    return [s] + [int(g.targets[e]) for e in edges]
+
+
+def _at(g, lat, lon):
+    return g.snap(lon, lat)
+
+
+def test_ch_matches_astar_on_every_pair(graphs):
+    plain, ch = graphs
+    assert plain.ch is None and ch.ch is not None
+    # The hierarchy has shortcuts, so the query has to unpack them
+    assert (ch.ch["up"][3] >= 0).any() or (ch.ch["down"][3] >= 0).any()
+    for s in range(plain.n):
+        for t in range(plain.n):
+            a, c = plain.path(s, t), ch.path(s, t)
+            assert (a is None) == (c is None), (s, t)
+            if a is None:
+                continue
+            assert _nodes(plain, s, a) == _nodes(ch, s, c), (s, t)
+            assert math.isclose(float(plain.duration[a].sum()) if a else 0.0,
+                                float(ch.duration[c].sum()) if c else 0.0, rel_tol=1e-6)
+            # Unpacked edges chain from s to t
+            assert all(int(ch.targets[e]) == v for e, v in zip(c, _nodes(ch, s, c)[1:]))
+
+
+def test_oneway_and_unreachable(graphs):
+    for g in graphs:
+        start, spur = _at(g, 33.89, 35.50), _at(g, 33.8865, 35.5005)
+        island = _at(g, 33.95, 35.60)
+        assert g.path(start, spur) is not None
+        assert g.path(spur, start) is None
+        assert g.path(start, island) is None
+        assert g.route([[35.50, 33.89], [35.60, 33.95]]) is None
+        # Row 1 is one-way eastbound: going west uses other streets
+        west, east = _at(g, 33.894, 35.50), _at(g, 33.894, 35.515)
+        assert len(g.path(west, east)) == 3
+        assert len(g.path(east, west)) > 3
@@ -0,0 +1,55 @@
+from part2_implementation.run_budget import RunBudget
+from part2_implementation.settings import Settings
+
+
+def test_last_allowed_round_is_final():
+    budget = RunBudget(max_rounds=3, deadline_s=60)
+    assert [budget.final_round(i) for i in range(4)] == [False, False, True, True]
+    assert RunBudget(max_rounds=0).final_round(0)
+
+
+def test_spent_token_budget_ends_the_loop():
+    budget = RunBudget(max_rounds=10, token_budget=1000)
+    budget.record(0.01, tokens=600)
+    assert not budget.final_round(1)
+    budget.record(0.01, tokens=400)
+    assert budget.final_round(2)
+    # 0 disables the limit
+    unlimited = RunBudget(max_rounds=10)
+    unlimited.record(0.01, tokens=10 ** 6)
+    assert not unlimited.final_round(1)
+
+
+def test_round_that_would_overrun_the_deadline_is_final(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("part2_implementation.run_budget.time.monotonic", lambda: now[0])
+    budget = RunBudget(max_rounds=10, deadline_s=30)
+    budget.record(llm_s=4.0, tools_s=6.0)  # slowest round so far: 10 s
+    now[0] += 10
+    # 20 s left: one more round as slow plus the answer still fits
+    assert not budget.final_round(1)
+    budget.record(llm_s=0.5, tools_s=0.5)
+    now[0] += 1
+    assert budget.final_round(2)
+
+
+def test_rounds_are_reported(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("part2_implementation.run_budget.time.monotonic", lambda: now[0])
+    budget = RunBudget()
+    budget.record(0.25, 0.5, ["osm_geocode", "ors_route"], tokens=120)
+    budget.record(0.1234, tokens=30)
+    now[0] = 1.5
+    assert budget.to_json() == {
+        "rounds": [
+            {"round": 1, "llm_ms": 250.0, "tools_ms": 500.0, "tools": ["osm_geocode", "ors_route"], "tokens": 120},
+            {"round": 2, "llm_ms": 123.4, "tools_ms": 0.0, "tools": [], "tokens": 30},
+        ],
+        "total_tokens": 150,
+        "elapsed_ms": 1500.0,
+    }
+
+
+def test_limits_come_from_settings():
+    budget = RunBudget.from_settings(Settings(max_tool_rounds=2, run_deadline_s=5.0, run_token_budget=300))
+    assert (budget.max_rounds, budget.deadline_s, budget.token_budget) == (2, 5.0, 300)
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+from part2_implementation.service import MAX_BODY_BYTES, AssistantService
+
+
+class _SlowAgent:
+    """Answers each prompt once ``release`` is set."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.prompts = []
+
+    async def run(self, prompt):
+        self.prompts.append(prompt)
+        await self.release.wait()
+        return {"final_output": prompt.upper()}
+
+    def flush_caches(self):
+        pass
+
+
+async def _send(port, raw):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, body = data.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    return int(lines[0].split()[1]), lines[1:], json.loads(body)
+
+
+def _run(prompt):
+    body = json.dumps({"prompt": prompt}).encode()
+    return b"POST /run HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+
+
+async def _serve(scenario, **kw):
+    agent = _SlowAgent()
+    svc = AssistantService(agent=agent, **kw)
+    server = await svc.start("127.0.0.1", 0)
+    try:
+        return await scenario(svc, agent, server.sockets[0].getsockname()[1])
+    finally:
+        agent.release.set()
+        await svc.shutdown()
+
+
+def test_full_queue_is_answered_with_429():
+    async def scenario(svc, agent, port):
+        # One prompt running, one waiting: the third is turned away at once
+        admitted = [asyncio.ensure_future(_send(port, _run(p))) for p in ("a", "b")]
+        while svc.admitted < 2:
+            await asyncio.sleep(0.01)
+        status, headers, body = await asyncio.wait_for(_send(port, _run("c")), 1.0)
+        agent.release.set()
+        return status, headers, body, await asyncio.gather(*admitted), svc.metrics["rejected_total"]
+
+    status, headers, body, admitted, rejected = asyncio.run(_serve(scenario, workers=1, queue_size=1))
+    assert status == 429
+    assert "Retry-After: 1" in headers
+    assert body == {"error": "server busy, retry later"}
+    assert [(s, b) for s, _, b in admitted] == [(200, {"final_output": "A"}), (200, {"final_output": "B"})]
+    assert rejected == 1
+
+
+def test_oversized_and_malformed_bodies_are_rejected_unread():
+    async def scenario(svc, agent, port):
+        too_big = b"POST /run HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (MAX_BODY_BYTES + 1)
+        no_prompt = b'POST /run HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}'
+        return await _send(port, too_big), await _send(port, no_prompt), agent.prompts
+
+    (big_status, _, big_body), (bad_status, _, _), prompts = asyncio.run(_serve(scenario))
+    assert big_status == 413
+    assert big_body == {"error": f"body larger than {MAX_BODY_BYTES} bytes"}
+    assert bad_status == 400
+    assert prompts == []
+
+
+def test_draining_service_admits_nothing():
+    async def scenario(svc, agent, port):
+        svc.accepting = False
+        return svc._submit("late", stream=False), svc.admitted
+
+    assert asyncio.run(_serve(scenario)) == (None, 0)
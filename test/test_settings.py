@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from part2_implementation import settings  # noqa: E402
+from part2_implementation.servers import resilience  # noqa: E402
+from part2_implementation.servers.osm_server import OSMServer  # noqa: E402
+
+KEYS = ("MAP_AGENT_UPSTREAM_RETRIES", "MAP_AGENT_BREAKER_FAILURES", "OSM_MIN_INTERVAL_S")
+
+
+@pytest.fixture
+def fresh(monkeypatch, tmp_path):
+    """Process state as if nothing was loaded yet, with ``.env`` in ``tmp_path``."""
+    for key in KEYS:
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "_BASE_DIR", str(tmp_path / "none"))
+    monkeypatch.setattr(settings, "_env_loaded", False)
+    monkeypatch.setattr(settings, "_process_env_keys", None)
+    monkeypatch.setattr(settings, "_env_applied", {})
+    monkeypatch.setattr(settings, "_settings", None)
+    monkeypatch.setattr(settings, "_listeners", [])
+    monkeypatch.setattr(resilience, "_policies", {})
+    monkeypatch.setattr(resilience, "_listening", False)
+    yield tmp_path / ".env"
+    for key in KEYS:
+        os.environ.pop(key, None)
+
+
+def test_reload_reconfigures_policies_and_limiter(fresh):
+    fresh.write_text("MAP_AGENT_UPSTREAM_RETRIES=4\nMAP_AGENT_BREAKER_FAILURES=2\nOSM_MIN_INTERVAL_S=0.5\n")
+    settings.load_env()
+    pol = resilience.policy_for("nominatim")
+    osm = OSMServer()
+    assert (pol.retries, pol.failure_threshold, osm.limiter.min_interval) == (4, 2, 0.5)
+
+    fresh.write_text("MAP_AGENT_BREAKER_FAILURES=3\nOSM_MIN_INTERVAL_S=0.25\n")
+    settings.reload_settings()
+    assert "MAP_AGENT_UPSTREAM_RETRIES" not in os.environ
+    assert resilience.policy_for("nominatim") is pol
+    assert (pol.retries, pol.failure_threshold, osm.limiter.min_interval) == (2, 3, 0.25)
+
+
+def test_process_environment_wins_over_env_file(fresh, monkeypatch):
+    monkeypatch.setenv("MAP_AGENT_BREAKER_FAILURES", "9")
+    fresh.write_text("MAP_AGENT_BREAKER_FAILURES=3\n")
+    assert settings.reload_settings().breaker_failures == 9
+    fresh.write_text("")
+    settings.reload_settings()
+    assert os.environ["MAP_AGENT_BREAKER_FAILURES"] == "9"
@@ -0,0 +1,59 @@
+import pytest
+
+from part2_implementation.agent_sdk_app import TOOLS
+from part2_implementation.tool_schema import ToolValidator, compile_schema
+
+BEIRUT = [35.5018, 33.8938]
+BYBLOS = [35.6478, 34.1236]
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return ToolValidator(TOOLS)
+
+
+def test_every_declared_tool_is_known(validator):
+    assert validator.names == [t["function"]["name"] for t in TOOLS]
+    assert validator.validate("ors_route", {"origin": BEIRUT, "destination": BYBLOS}) is None
+    assert validator.validate("osm_geocode", {"place": "Beirut"}) is None
+
+
+@pytest.mark.parametrize("args, error", [
+    ({"origin": BEIRUT}, "arguments.destination: required"),
+    ({"origin": "Beirut", "destination": BYBLOS}, "arguments.origin: expected array"),
+    ({"origin": [35.5], "destination": BYBLOS}, "arguments.origin: needs at least 2 items"),
+    ({"origin": BEIRUT, "destination": [35.6, "34.1"]}, "arguments.destination[1]: expected number"),
+    ({"origin": BEIRUT, "destination": BYBLOS, "profile": 3}, "arguments.profile: expected string"),
+    (None, "arguments: expected object"),
+])
+def test_invalid_route_arguments_are_reported(validator, args, error):
+    assert validator.validate("ors_route", args) == error
+
+
+def test_unknown_tool(validator):
+    assert validator.validate("ors_teleport", {}) == "unknown tool 'ors_teleport'"
+    assert validator.validate(None, {}) == "unknown tool None"
+
+
+def test_enum_range_and_bool_checks():
+    check = compile_schema({"type": "object", "properties": {
+        "mode": {"type": "string", "enum": ["walk", "drive"]},
+        "limit": {"type": "integer", "minimum": 1, "maximum": 50},
+    }})
+    assert check({"mode": "walk", "limit": 50}) is None
+    assert check({"mode": "fly"}) == "arguments.mode: must be one of ['walk', 'drive']"
+    assert check({"limit": 0}) == "arguments.limit: must be >= 1"
+    assert check({"limit": 51}) == "arguments.limit: must be <= 50"
+    # JSON true is not a number, even though Python's bool is an int
+    assert check({"limit": True}) == "arguments.limit: expected integer"
+
+
+def test_output_schemas_cover_each_tool_once(validator):
+    selection = validator.selection_schema()
+    assert [s["properties"]["tool"]["enum"] for s in selection["anyOf"]] == [[n] for n in validator.names]
+    route = selection["anyOf"][validator.names.index("ors_route")]
+    assert route["properties"]["arguments"]["required"] == ["origin", "destination"]
+    assert route["required"] == ["tool", "arguments"]
+    batch = validator.batch_schema()
+    assert batch["required"] == ["choices"]
+    assert batch["properties"]["choices"] == {"type": "array", "items": selection}
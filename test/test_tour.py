@@ -0,0 +1,52 @@
+import itertools
+import random
+
+import pytest
+
+from part2_implementation.servers.tour import nearest_neighbour, solve, tour_cost, two_opt
+
+
+def _matrix(n, seed):
+    rng = random.Random(seed)
+    # One-way streets: A->B and B->A differ
+    return [[0.0 if a == b else rng.uniform(1, 100) for b in range(n)] for a in range(n)]
+
+
+def _reversals(order):
+    for i in range(1, len(order) - 1):
+        for j in range(i + 1, len(order)):
+            yield order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+
+
+@pytest.mark.parametrize("roundtrip", [False, True])
+@pytest.mark.parametrize("seed", range(20))
+def test_two_opt_reaches_an_asymmetric_local_optimum(seed, roundtrip):
+    m = _matrix(7, seed)
+    start = nearest_neighbour(m)
+    order = two_opt(m, start, roundtrip)
+    assert order[0] == 0 and sorted(order) == list(range(7))
+    cost = tour_cost(m, order, roundtrip)
+    assert cost <= tour_cost(m, start, roundtrip) + 1e-9
+    # With the true (direction-aware) costs, no single reversal improves the result
+    assert all(tour_cost(m, r, roundtrip) >= cost - 1e-9 for r in _reversals(order))
+
+
+def test_reversal_is_rejected_when_only_the_other_direction_is_cheap():
+    # 0 -> 2 -> 1 -> 3 looks far shorter if 2->1 cost the same as 1->2, but 2->1 is a long detour
+    big = 50.0
+    m = [
+        [0, 10, 1, big],
+        [big, 0, 1, 1],
+        [big, big, 0, 10],
+        [big, big, big, 0],
+    ]
+    assert two_opt(m, [0, 1, 2, 3]) == [0, 1, 2, 3]
+
+
+def test_solve_improves_on_nearest_neighbour():
+    for seed in range(10):
+        m = _matrix(6, seed)
+        best = min(tour_cost(m, (0, *p), True) for p in itertools.permutations(range(1, 6)))
+        # 2-opt is a heuristic: never better than optimal, never worse than its starting tour
+        got = tour_cost(m, solve(m, roundtrip=True), True)
+        assert best <= got <= tour_cost(m, nearest_neighbour(m), True) + 1e-9
@@ -0,0 +1,83 @@
+"""Import-time budget check for the agent module.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter,
+reports the cumulative import time and fails (exit code 1) when it exceeds
+the budget or when heavy optional dependencies are imported eagerly.
+
+Usage:
+    python tools/importtime_check.py [--budget-ms 150] [--module part2_implementation.agent_sdk_app]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Modules that must only load on first use
+LAZY = (
+    "requests",
+    "dotenv",
+    "openai",
+    "numpy",
+    "part2_implementation.gemini_provider",
+    "part2_implementation.llm_cache",
+    "part2_implementation.ollama_client",
+    "part2_implementation.provider_router",
+    "part2_implementation.tool_schema",
+    "part2_implementation.servers.osm_server",
+    "part2_implementation.servers.ors_server",
+    "part2_implementation.servers.road_graph",
+)
+
+
+def measure(module: str) -> dict:
+    """Map of imported module name -> cumulative microseconds."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=str(ROOT),
+    )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr)
+    out = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            out[parts[2].strip()] = int(parts[1])
+        except ValueError:  # header line
+            continue
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="part2_implementation.agent_sdk_app")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("MAP_AGENT_IMPORT_BUDGET_MS", "150")))
+    parser.add_argument("--runs", type=int, default=3, help="Best-of-N to smooth out noise")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(max(1, args.runs)):
+        times = measure(args.module)
+        if best is None or times.get(args.module, 0) < best.get(args.module, 0):
+            best = times
+    total_ms = best.get(args.module, 0) / 1000
+    eager = [m for m in LAZY if m in best]
+
+    print(f"{args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    ok = True
+    if total_ms > args.budget_ms:
+        print("FAIL: import time over budget")
+        ok = False
+    if eager:
+        print("FAIL: imported eagerly: " + ", ".join(eager))
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())